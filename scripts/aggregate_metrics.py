@@ -1,74 +1,148 @@
 """
 Aggregate outputs from Fairlearn and AIF360 into a concise Markdown summary for papers.
+
+The backend sections are read from the run history (scripts.run_history): the latest run of each
+backend, plus a trend of the fairness measures over recent runs. Results that are not recorded there
+(Colab TFMA/WIT exports, dataset profile, counterfactual flips, mitigation, slices, stage timings) are read from their files.
+The model comparison is read from its file too; its runs are recorded under the "compare" backend.
 """
 from pathlib import Path
 import json
 import pandas as pd
 
+from scripts import manifest, profiling, run_history
+
+BACKENDS = (("fairlearn", "Fairlearn"), ("aif360", "AIF360"), ("google_local", "Google (local fallback)"))
+TREND_RUNS = 10
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def markdown_table(df):
+    """Render a DataFrame as a GitHub Markdown table."""
+    lines = ["| " + " | ".join(str(c) for c in df.columns) + " |", "|" + " --- |" * len(df.columns)]
+    lines += ["| " + " | ".join(_cell(v) for v in row) + " |" for row in df.itertuples(index=False)]
+    return "\n".join(lines)
+
+
+def _backend_section(backend, title, run):
+    rows = run_history.query(run=run, backend=backend)
+    first = rows.iloc[0]
+    parts = [f"## {title}\n\nRun `{run}`, model `{first['model']}`, dataset `{first['dataset']}`."]
+    by_group = rows[rows["kind"] == "group"]
+    if len(by_group):
+        table = by_group.pivot_table(index="group", columns="metric", values="value", aggfunc="last", sort=False)
+        parts.append("### By group\n\n" + markdown_table(table.reset_index()))
+    overall = rows[rows["kind"] == "overall"]
+    if len(overall):
+        parts.append("### Overall\n\n" + markdown_table(overall[["metric", "value"]]))
+    fairness = rows[rows["kind"] == "fairness"]
+    if len(fairness):
+        cols = ["group", "metric", "value"] + [c for c in ("ci_low", "ci_high") if fairness[c].notna().any()]
+        calibrated = fairness["metric"].str.startswith(("ece_", "mce_", "brier_", "calibration_", "max_bin_")).any()
+        title = "SPD/DI/EOD/AOD and calibration differences" if calibrated else "SPD/DI/EOD/AOD"
+        parts.append(f"### Fairness measures ({title})\n\n" + markdown_table(fairness[cols]))
+    return "\n\n".join(parts)
+
+
+def _trend_section():
+    # Backend runs only: a comparison run holds one row per model
+    trend = run_history.trend("statistical_parity_difference", backend=[b for b, _ in BACKENDS], kind="fairness",
+                              last=TREND_RUNS)
+    if trend["run_id"].nunique() < 2:
+        return None
+    table = trend.pivot_table(index="run_id", columns="backend", values="value", aggfunc="last", sort=False)
+    return (f"## Statistical parity difference, last {TREND_RUNS} runs\n\n"
+            + markdown_table(table.reset_index()))
 
-def main():
+
+def main(force=False):
     outdir = Path("outputs")
-    fairlearn_by = outdir / "fairlearn_by_group.csv"
-    fairlearn_overall = outdir / "fairlearn_overall.csv"
-    fairlearn_fairness = outdir / "fairlearn_fairness.json"
-    aif_json = outdir / "aif360_metrics.json"
-    # Google outputs (prefer TFMA/WIT if present, else local fallback)
+    # Google outputs exported from Colab (prefer TFMA/WIT if present); not recorded in the run history
     google_wit_by = outdir / "google_wit_by_group.csv"
     google_tfma_json = outdir / "google_tfma_metrics.json"  # optional placeholder if exported from Colab
-    google_local_by = outdir / "google_local_by_group.csv"
-    google_local_overall = outdir / "google_local_overall.csv"
-    google_local_fairness = outdir / "google_local_fairness.json"
+    slices = outdir / "slices.csv"  # from scripts.slice_finder, when it has been run
+    mitigation = outdir / "mitigation.csv"  # from scripts.mitigate
+    counterfactual = outdir / "counterfactual.csv"  # from scripts.counterfactual
+    dataset_groups = outdir / "dataset_groups.csv"  # from scripts.dataset_summary --profile
+    dataset_drift = outdir / "dataset_drift.csv"
+    comparison = outdir / "model_comparison.csv"  # from scripts.compare_models
+
+    # Re-render only when the history, an input file or this code changed since summary.md was last written
+    if profiling.SPANS_FILE.exists():
+        profiling.write_profile()
+    sources = [google_wit_by, google_tfma_json, slices, mitigation, counterfactual, dataset_groups, dataset_drift,
+               comparison, profiling.PROFILE_FILE]
+    inputs = {"code": manifest.code_digest("scripts.aggregate_metrics"), "history": run_history.state(),
+              "files": {str(p): manifest.file_digest(p) for p in sources}}
+    if not force and manifest.is_current("aggregate_metrics", inputs):
+        print("outputs/summary.md is up to date")
+        return
 
     parts = []
+    latest = run_history.latest_runs()
+    for backend, title in BACKENDS:
+        if backend in latest:
+            parts.append(_backend_section(backend, title, latest[backend]))
+        else:
+            parts.append(f"## {title}\n\nNot found.")
 
-    if fairlearn_by.exists():
-        df_by = pd.read_csv(fairlearn_by)
-        parts.append("## Fairlearn metrics by group (sex)\n\n" + df_by.to_csv(index=False))
-    else:
-        parts.append("## Fairlearn metrics by group\n\nNot found.")
-
-    if fairlearn_overall.exists():
-        df_overall = pd.read_csv(fairlearn_overall, index_col=0)
-        parts.append("\n\n## Fairlearn overall metrics\n\n" + df_overall.to_csv())
-    else:
-        parts.append("\n\n## Fairlearn overall metrics\n\nNot found.")
-
-    if aif_json.exists():
-        data = json.loads(aif_json.read_text())
-        # Flatten to two-column table
-        df_aif = pd.DataFrame(list(data.items()), columns=["metric", "value"])
-        parts.append("\n\n## AIF360 metrics\n\n" + df_aif.to_csv(index=False))
-    else:
-        parts.append("\n\n## AIF360 metrics\n\nNot found.")
-
-    # Fairlearn fairness measures if available
-    if fairlearn_fairness.exists():
-        data = json.loads(fairlearn_fairness.read_text())
-        df_ff = pd.DataFrame(list(data.items()), columns=["metric", "value"])
-        parts.append("\n\n## Fairlearn fairness measures (SPD/DI/EOD/AOD)\n\n" + df_ff.to_csv(index=False))
-
-    # Google metrics section
     if google_wit_by.exists():
-        df_gwit = pd.read_csv(google_wit_by)
-        parts.append("\n\n## Google What-If (by group)\n\n" + df_gwit.to_csv(index=False))
-    elif google_local_by.exists():
-        df_glocal = pd.read_csv(google_local_by)
-        parts.append("\n\n## Google (local fallback) by group\n\n" + df_glocal.to_csv(index=False))
-        if google_local_overall.exists():
-            df_gov = pd.read_csv(google_local_overall, index_col=0)
-            parts.append("\n\n### Google (local fallback) overall\n\n" + df_gov.to_csv())
-        if google_local_fairness.exists():
-            data = json.loads(google_local_fairness.read_text())
-            df_gfair = pd.DataFrame(list(data.items()), columns=["metric", "value"])
-            parts.append("\n\n### Google (local fallback) fairness measures (SPD/DI/EOD/AOD)\n\n" + df_gfair.to_csv(index=False))
-    elif google_tfma_json.exists():
-        df_gtfma = pd.read_json(google_tfma_json)
-        parts.append("\n\n## Google TFMA (summary)\n\n" + df_gtfma.to_csv(index=False))
-    else:
-        parts.append("\n\n## Google metrics\n\nNot found.")
+        parts.append("## Google What-If (by group)\n\n" + markdown_table(pd.read_csv(google_wit_by)))
+    if google_tfma_json.exists():
+        parts.append("## Google TFMA (summary)\n\n" + markdown_table(pd.read_json(google_tfma_json)))
+
+    if dataset_groups.exists():
+        parts.append("## Dataset: group representation (train vs eval)\n\n"
+                     + markdown_table(pd.read_csv(dataset_groups)))
+    if dataset_drift.exists():
+        drift = pd.read_csv(dataset_drift)
+        drift = drift[drift["group"] == "all"].drop(columns=["group"]).head(10)
+        parts.append("## Dataset: feature drift, eval vs train (top 10 by PSI)\n\n" + markdown_table(drift))
+
+    trend = _trend_section()
+    if trend is not None:
+        parts.append(trend)
+
+    if counterfactual.exists():
+        df_cf = pd.read_csv(counterfactual)
+        cols = ["group", "rows", "flip_rate", "positive_to_negative", "negative_to_positive", "mean_shift",
+                "shift_p05", "shift_p50", "shift_p95"]
+        parts.append(f"## Counterfactual flip test (`{df_cf['changed'].iloc[0]}` changed)\n\n"
+                     + markdown_table(df_cf[cols]))
+
+    if mitigation.exists():
+        df_mit = pd.read_csv(mitigation).drop(columns=["model"])
+        parts.append("## Mitigation (held-out split, Female vs Male)\n\n" + markdown_table(df_mit))
+
+    if comparison.exists():
+        cols = ["model", "rows", "accuracy", "roc_auc", "ece", "statistical_parity_difference", "disparate_impact",
+                "equal_opportunity_difference", "average_odds_difference"]
+        df_cmp = pd.read_csv(comparison)
+        parts.append("## Model comparison (same rows, Female vs Male)\n\n"
+                     + markdown_table(df_cmp[[c for c in cols if c in df_cmp.columns]]))
+
+    if slices.exists():
+        cols = ["slice", "count", "selection_rate", "tpr", "fpr", "effect_size"]
+        df_slices = pd.read_csv(slices).head(10)
+        parts.append("## Worst intersectional slices (vs complement)\n\n"
+                     + markdown_table(df_slices[[c for c in cols if c in df_slices.columns]]))
+
+    # Stage timings from scripts.profiling (only present for runs with FAIRNESS_PROFILE / --profile)
+    if profiling.PROFILE_FILE.exists():
+        profile = json.loads(profiling.PROFILE_FILE.read_text())
+        parts.append("## Performance (per stage)\n\n" + markdown_table(pd.DataFrame(profile["summary"])))
 
     summary = "\n\n".join(parts) + "\n"
+    outdir.mkdir(exist_ok=True)
     (outdir / "summary.md").write_text(summary)
+    manifest.record("aggregate_metrics", inputs, artifacts=[outdir / "summary.md"])
     print("Wrote outputs/summary.md")
 
 
@@ -0,0 +1,278 @@
+"""
+Scaling benchmark of the fairness pipeline on synthetic Adult-shaped data (scripts.synthetic_adult).
+
+For each size every stage is timed and memory-profiled on its own: load/encode (the load_adult cache
+build and memory-mapped read), train_model, scoring (the prediction store), the Fairlearn MetricFrame,
+AIF360 and Google-local backends, and aggregate_metrics. Stages run in a scratch directory, so the
+repository's outputs/, models/ and cache/ are left alone. Sizes above --max-in-memory only run the
+"stream" stage, which generates, encodes, scores and counts chunk by chunk and so scales to 10^8 rows.
+
+Peak memory is the tracemalloc peak of the stage (NumPy and Python allocations; memory-mapped files
+are not counted). process_peak_rss_mb is the process's RSS high-water mark so far, not the stage's own:
+it never goes down from one stage to the next. Results are written as JSON;
+--compare checks them against a stored baseline and flags stages that got slower or bigger.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from scripts.profiling import peak_rss_mb
+from scripts.synthetic_adult import iter_synthetic, synthetic_adult
+
+STAGES = ("load_encode", "train", "score", "fairlearn", "aif360", "google_local", "aggregate", "stream")
+IN_MEMORY_STAGES = STAGES[:-1]
+# Stages whose state a stage needs; the ones not selected run untimed first
+NEEDS = {
+    "train": ("load_encode",),
+    "score": ("load_encode", "train"),
+    "fairlearn": ("load_encode", "train", "score"),
+    "aif360": ("load_encode", "train", "score"),
+    "google_local": ("load_encode", "train", "score"),
+    "aggregate": ("load_encode", "train", "score", "fairlearn", "aif360", "google_local"),
+    "stream": (),
+}
+DEFAULT_SIZES = (10_000, 100_000)
+
+
+def measure(fn, memory=True, setup=None):
+    """Run fn() with its output captured; return (result, seconds, tracemalloc peak in MiB or None).
+
+    setup() runs first, untimed.
+    """
+    if setup is not None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup()
+    if memory:
+        tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn()
+            seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / (1 << 20) if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _stream(n_rows, model, seed, chunk_rows):
+    from scripts.group_metrics import GroupCounts
+    from scripts.load_adult import LABEL, encode_adult
+    from scripts.scoring import LinearScorer
+
+    features = list(model.feature_names_in_)
+    scorer = LinearScorer.from_model(model)
+    total = None
+    for chunk in iter_synthetic(n_rows, seed=seed, chunk_rows=chunk_rows):
+        df = encode_adult(chunk)
+        y_pred = scorer.predict(df.reindex(columns=features, fill_value=0))
+        counts = GroupCounts.from_arrays(np.where(df["sex_Male"] > 0, "Male", "Female"), df[LABEL], y_pred)
+        total = counts if total is None else total + counts
+    return total
+
+
+def _reference_model(seed):
+    """Small model for the stream stage when the in-memory stages are skipped."""
+    from sklearn.linear_model import LogisticRegression
+
+    from scripts.load_adult import LABEL, encode_adult
+
+    df = encode_adult(synthetic_adult(50_000, seed=seed + 1)).astype(np.float64)
+    return LogisticRegression(max_iter=1000).fit(df.drop(columns=[LABEL]), df[LABEL].astype(int))
+
+
+def run_size(n_rows, stages=STAGES, seed=0, memory=True, chunk_rows=1_000_000, repeat=1):
+    """Benchmark one dataset size; returns one record per stage that ran."""
+    from scripts import aggregate_metrics, run_aif360_test, run_fairlearn_test, run_google_local_metrics
+    from scripts.load_adult import LABEL, _build, _read, to_frame
+    from scripts.predictions import STORE_DIR, get_predictions
+    from scripts.train_model import train_and_save
+
+    raw = synthetic_adult(n_rows, seed=seed, chunk_rows=chunk_rows) if set(stages) & set(IN_MEMORY_STAGES) else None
+    state = {}
+
+    def load_encode():
+        path = Path("cache") / "adult" / f"synthetic-{n_rows}-{seed}"
+        _build(raw, path, None, True, 0)
+        state["df"] = to_frame(_read(path, path.name))
+
+    def train():
+        state["model"] = train_and_save(state["df"])
+
+    def score():
+        get_predictions(state["df"].drop(columns=[LABEL]), state["model"])
+
+    def stream():
+        _stream(n_rows, state["model"], seed, chunk_rows)
+
+    def clear_store():
+        shutil.rmtree(STORE_DIR, ignore_errors=True)
+
+    steps = {
+        "load_encode": load_encode,
+        "train": train,
+        "score": score,
+        "fairlearn": lambda: run_fairlearn_test.run_fairlearn_check(state["df"], state["model"]),
+        "aif360": lambda: run_aif360_test.run_aif360_check(state["df"], state["model"]),
+        "google_local": lambda: run_google_local_metrics.main(state["df"], state["model"]),
+        # force: otherwise repeats only check aggregate_metrics' manifest and return
+        "aggregate": lambda: aggregate_metrics.main(force=True),
+        "stream": stream,
+    }
+    # Every repeat of a cached stage starts cold, so --repeat does not report cache hits
+    setups = {"score": clear_store}
+    if "stream" in stages and "train" not in stages:
+        # Untimed: the stream stage only needs some fitted model with the encoded feature names
+        with contextlib.redirect_stdout(io.StringIO()):
+            state["model"] = _reference_model(seed)
+    records, done = [], set()
+    for stage in STAGES:
+        if stage not in stages:
+            continue
+        for need in NEEDS.get(stage, ()):
+            if need not in done:
+                measure(steps[need], memory=False)
+                done.add(need)
+        done.add(stage)
+        runs = [measure(steps[stage], memory=memory, setup=setups.get(stage))[1:] for _ in range(repeat)]
+        records.append({
+            "rows": int(n_rows),
+            "stage": stage,
+            "seconds": min(r[0] for r in runs),
+            "peak_mb": None if not memory else max(r[1] for r in runs),
+            "process_peak_rss_mb": peak_rss_mb(),
+        })
+        print(f"{int(n_rows):>11} {stage:<13} {records[-1]['seconds']:9.3f}s"
+              + ("" if not memory else f" {records[-1]['peak_mb']:10.1f} MiB"))
+    return records
+
+
+def environment():
+    import pandas as pd
+    import sklearn
+
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def run(sizes=DEFAULT_SIZES, stages=STAGES, seed=0, memory=True, max_in_memory=2_000_000, chunk_rows=1_000_000,
+        repeat=1):
+    """Benchmark every size in a scratch working directory; return the JSON-ready report."""
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="fairness-bench-") as scratch:
+        os.chdir(scratch)
+        try:
+            for n_rows in sizes:
+                (Path(scratch) / "models").mkdir(exist_ok=True)
+                selected = [s for s in stages if n_rows <= max_in_memory or s not in IN_MEMORY_STAGES]
+                if len(selected) < len(stages):
+                    print(f"{int(n_rows)} rows: only streaming stages run above --max-in-memory={max_in_memory}")
+                results.extend(run_size(int(n_rows), selected, seed=seed, memory=memory, chunk_rows=chunk_rows,
+                                        repeat=repeat))
+        finally:
+            os.chdir(cwd)
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": {"seed": seed, "memory": memory, "chunk_rows": chunk_rows, "repeat": repeat},
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.25, min_seconds=0.05, min_mb=1.0):
+    """Rows of (rows, stage) present in both reports, with regression flags for time and memory.
+
+    A stage regresses when it is more than `tolerance` (relative) slower or bigger than the baseline and
+    the absolute difference exceeds min_seconds / min_mb, so tiny stages don't flag on noise.
+    """
+    base = {(r["rows"], r["stage"]): r for r in baseline["results"]}
+    rows = []
+    for r in report["results"]:
+        b = base.get((r["rows"], r["stage"]))
+        if b is None:
+            continue
+        row = {"rows": r["rows"], "stage": r["stage"], "seconds": r["seconds"], "baseline_seconds": b["seconds"],
+               "time_ratio": r["seconds"] / b["seconds"] if b["seconds"] else None}
+        row["time_regression"] = (r["seconds"] > b["seconds"] * (1 + tolerance)
+                                  and r["seconds"] - b["seconds"] > min_seconds)
+        if r.get("peak_mb") is not None and b.get("peak_mb") is not None:
+            row["peak_mb"], row["baseline_peak_mb"] = r["peak_mb"], b["peak_mb"]
+            row["memory_regression"] = (r["peak_mb"] > b["peak_mb"] * (1 + tolerance)
+                                        and r["peak_mb"] - b["peak_mb"] > min_mb)
+        else:
+            row["memory_regression"] = False
+        rows.append(row)
+    return rows
+
+
+def _sizes(text):
+    return [int(float(s)) for s in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic Adult-shaped data")
+    parser.add_argument("--sizes", type=_sizes, default=list(DEFAULT_SIZES), help="comma-separated, e.g. 1e4,1e6")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="report the fastest of N runs per stage")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (lower timing overhead)")
+    parser.add_argument("--max-in-memory", type=float, default=2e6)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--out", default="outputs/benchmark.json")
+    parser.add_argument("--compare", default=None, help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", default=None, help="also write the results to this path")
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    report = run(args.sizes, stages, seed=args.seed, memory=not args.no_memory,
+                 max_in_memory=int(args.max_in_memory), chunk_rows=args.chunk_rows, repeat=args.repeat)
+
+    regressions = []
+    if args.compare:
+        comparison = compare(report, json.loads(Path(args.compare).read_text()), tolerance=args.tolerance)
+        report["comparison"] = {"baseline": args.compare, "tolerance": args.tolerance, "stages": comparison}
+        regressions = [r for r in comparison if r["time_regression"] or r["memory_regression"]]
+        for r in regressions:
+            kind = " and ".join(k for k in ("time", "memory") if r[f"{k}_regression"])
+            print(f"REGRESSION ({kind}): {r['stage']} at {r['rows']} rows: "
+                  f"{r['seconds']:.3f}s vs {r['baseline_seconds']:.3f}s")
+        if not regressions:
+            print(f"No regressions against {args.compare}")
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"Benchmark results saved to {out}")
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.save_baseline}")
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Bootstrap confidence intervals for the group fairness metrics, computed on counts.
+
+All metrics are functions of the per-group confusion counts, so resampling rows with replacement is
+equivalent to one multinomial draw over the (group, cell) counts: thousands of replicates cost a few
+milliseconds and never touch the rows again. Weighted data uses the Poisson bootstrap instead, where
+each replicate's counts are a sparse product of Poisson(1) weights with the row-to-cell one-hot matrix.
+Replicates are generated in fixed blocks, each with its own child seed, so results depend only on the
+seed (not on how many worker processes share the blocks).
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts.group_metrics import CELLS, fairness_from_counts
+
+BLOCK = 100
+
+
+def _blocks(n_resamples, seed):
+    seeds = np.random.SeedSequence(seed).spawn((n_resamples + BLOCK - 1) // BLOCK)
+    sizes = [BLOCK] * (n_resamples // BLOCK) + ([n_resamples % BLOCK] if n_resamples % BLOCK else [])
+    return list(zip(sizes, seeds))
+
+
+def _map(fn, tasks, n_jobs):
+    if n_jobs is None or n_jobs <= 1 or len(tasks) <= 1:
+        return [fn(*t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        return list(pool.map(fn, *zip(*tasks)))
+
+
+def _multinomial_block(size, seed, flat):
+    total = int(round(flat.sum()))
+    return np.random.default_rng(seed).multinomial(total, flat / flat.sum(), size=size).astype(np.float64)
+
+
+def resample_counts(counts, n_resamples=1000, seed=0, n_jobs=None):
+    """Return (n_resamples, groups, 4) bootstrap replicates of an unweighted (groups, 4) count array."""
+    counts = np.asarray(counts, dtype=np.float64)
+    flat = counts.ravel()
+    tasks = [(size, s, flat) for size, s in _blocks(n_resamples, seed)]
+    return np.concatenate(_map(_multinomial_block, tasks, n_jobs)).reshape((n_resamples,) + counts.shape)
+
+
+def _poisson_block(size, seed, onehot_t):
+    rng = np.random.default_rng(seed)
+    weights = rng.poisson(1.0, size=(onehot_t.shape[1], size)).astype(np.float64)
+    # (cells, rows) @ (rows, size): weighted cell counts for `size` replicates at once
+    return np.asarray(onehot_t @ weights).T
+
+
+def poisson_resample_counts(groups, y_true, y_pred, sample_weight=None, n_resamples=1000, seed=0, n_jobs=None):
+    """Poisson-bootstrap replicates from row data. Returns (labels, (n_resamples, groups, 4) counts)."""
+    if not isinstance(groups, (pd.Series, pd.Index, pd.Categorical)):
+        groups = np.asarray(groups)
+    codes, labels = pd.factorize(groups, sort=True)
+    cells = codes * 4 + 2 * np.asarray(y_true, dtype=np.int64) + np.asarray(y_pred, dtype=np.int64)
+    w = np.ones(len(cells)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    n_cells = len(labels) * len(CELLS)
+    from scipy import sparse
+
+    onehot_t = sparse.csr_matrix((w, (cells, np.arange(len(cells)))), shape=(n_cells, len(cells)))
+    tasks = [(size, s, onehot_t) for size, s in _blocks(n_resamples, seed)]
+    reps = np.concatenate(_map(_poisson_block, tasks, n_jobs))
+    return list(labels), reps.reshape(n_resamples, len(labels), len(CELLS))
+
+
+def intervals(replicates, groups, unprivileged, privileged, level=0.95, metrics=fairness_from_counts):
+    """Percentile intervals of each fairness metric over (n_resamples, groups, 4) replicates.
+
+    Returns {metric: (low, high)}; metrics is a count -> metric function such as fairness_from_counts.
+    """
+    groups = list(groups)
+    values = metrics(replicates[:, groups.index(unprivileged)], replicates[:, groups.index(privileged)])
+    tail = 100 * (1 - level) / 2
+    out = {}
+    for name, v in values.items():
+        if np.isnan(v).all():
+            out[name] = (None, None)
+            continue
+        low, high = np.nanpercentile(v, [tail, 100 - tail])
+        out[name] = (float(low), float(high))
+    return out
+
+
+def with_intervals(fairness, cis, n_resamples, level=0.95):
+    """Insert <metric>_ci_low / <metric>_ci_high right after each metric of a *_fairness.json dict."""
+    out = {}
+    for key, value in fairness.items():
+        out[key] = value
+        if key in cis:
+            out[f"{key}_ci_low"], out[f"{key}_ci_high"] = cis[key]
+    out["bootstrap_resamples"] = int(n_resamples)
+    out["ci_level"] = level
+    return out
+
+
+def bootstrap_fairness(counts, fairness, n_resamples=1000, seed=0, n_jobs=None, level=0.95,
+                       metrics=fairness_from_counts):
+    """Add percentile intervals to `fairness` (a *_fairness.json dict) from a GroupCounts."""
+    replicates = resample_counts(counts.counts, n_resamples=n_resamples, seed=seed, n_jobs=n_jobs)
+    cis = intervals(replicates, counts.groups, fairness["unprivileged_group"], fairness["privileged_group"],
+                    level=level, metrics=metrics)
+    return with_intervals(fairness, cis, n_resamples, level=level)
@@ -0,0 +1,121 @@
+"""
+Per-group calibration of predicted probabilities from fixed-bin histograms.
+
+Scores are bucketed into N_BINS equal-width bins on [0, 1] and every (group, bin) cell accumulates its
+weight, score sum, label sum and squared error in one np.bincount pass per statistic. Reliability
+curves, expected/maximum calibration error (ECE/MCE), Brier score and the between-group differences
+all derive from those sums, and sums from separate chunks or processes merge by adding them, as
+GroupCounts does for confusion counts.
+"""
+import numpy as np
+import pandas as pd
+
+N_BINS = 10
+# Statistics accumulated per (group, bin)
+STATS = ("weight", "score_sum", "label_sum", "squared_error")
+_CHUNK = 1 << 22
+
+
+def _ratio(num, den):
+    return np.divide(num, den, out=np.full(np.broadcast(num, den).shape, np.nan), where=den > 0)
+
+
+class CalibrationCounts:
+    """sums[i, b] holds STATS for rows of groups[i] whose score falls in bin b."""
+
+    def __init__(self, groups, sums, n_bins=N_BINS, name=None):
+        self.groups = list(groups)
+        self.n_bins = n_bins
+        self.sums = np.asarray(sums, dtype=np.float64).reshape(len(self.groups), n_bins, len(STATS))
+        self.name = name
+
+    @classmethod
+    def from_arrays(cls, groups, y_true, scores, n_bins=N_BINS, sample_weight=None):
+        """Accumulate (group, label, probability[, weight]) rows; groups may be any hashable labels."""
+        name = getattr(groups, "name", None)
+        if not isinstance(groups, (pd.Series, pd.Index, pd.Categorical)):
+            groups = np.asarray(groups)
+        codes, labels = pd.factorize(groups, sort=True)
+        if (codes < 0).any():
+            raise ValueError("groups contains missing values")
+        y_true = np.asarray(y_true)
+        scores = np.asarray(scores)
+        weights = None if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        n_cells = len(labels) * n_bins
+        total = np.zeros((len(STATS), n_cells))
+        for start in range(0, len(codes), _CHUNK):
+            stop = start + _CHUNK
+            p = scores[start:stop].astype(np.float64)
+            if p.size and (p.min() < 0 or p.max() > 1):
+                raise ValueError("scores must be probabilities in [0, 1]")
+            y = y_true[start:stop].astype(np.float64)
+            w = np.ones(len(p)) if weights is None else weights[start:stop]
+            # Bin b covers [b / n_bins, (b + 1) / n_bins); a score of exactly 1 goes in the last bin
+            idx = codes[start:stop].astype(np.int64) * n_bins + np.minimum((p * n_bins).astype(np.int64), n_bins - 1)
+            for k, values in enumerate((w, w * p, w * y, w * (p - y) ** 2)):
+                total[k] += np.bincount(idx, weights=values, minlength=n_cells)
+        return cls(labels, total.T, n_bins=n_bins, name=name)
+
+    def merge(self, other):
+        """Return the sum of two CalibrationCounts with the same bins, aligning groups by label."""
+        if other.n_bins != self.n_bins:
+            raise ValueError("Cannot merge calibration counts with different bins")
+        known = set(self.groups)
+        groups = list(self.groups) + [g for g in other.groups if g not in known]
+        position = {g: i for i, g in enumerate(groups)}
+        sums = np.zeros((len(groups), self.n_bins, len(STATS)))
+        sums[[position[g] for g in self.groups]] += self.sums
+        sums[[position[g] for g in other.groups]] += other.sums
+        return CalibrationCounts(groups, sums, n_bins=self.n_bins, name=self.name or other.name)
+
+    __add__ = merge
+
+    def reliability(self):
+        """Reliability curves: one row per (group, non-empty bin) with mean score, positive rate and gap."""
+        edges = np.linspace(0, 1, self.n_bins + 1)
+        frames = []
+        for i, group in enumerate(self.groups):
+            w, s, y, _ = self.sums[i].T
+            keep = w > 0
+            frames.append(pd.DataFrame({
+                "group": group, "bin_low": edges[:-1][keep], "bin_high": edges[1:][keep], "weight": w[keep],
+                "mean_score": s[keep] / w[keep], "positive_rate": y[keep] / w[keep],
+                "gap": (s[keep] - y[keep]) / w[keep],
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+    def metrics(self):
+        """Per-group (and overall) ECE, MCE, Brier score, mean score, positive rate and their gap."""
+        sums = np.concatenate([self.sums, self.sums.sum(axis=0, keepdims=True)])
+        w, s, y, se = (sums[..., k] for k in range(len(STATS)))
+        n = w.sum(axis=1)
+        gap = np.abs(_ratio(s - y, w))
+        return pd.DataFrame({
+            "weight": n,
+            "ece": _ratio((w * np.nan_to_num(gap)).sum(axis=1), n),
+            "mce": np.where(n > 0, np.nan_to_num(gap).max(axis=1), np.nan),
+            "brier": _ratio(se.sum(axis=1), n),
+            "mean_score": _ratio(s.sum(axis=1), n),
+            "positive_rate": _ratio(y.sum(axis=1), n),
+            "calibration_in_the_large": _ratio((s - y).sum(axis=1), n),
+        }, index=pd.Index(self.groups + ["all"], name=self.name))
+
+    def differences(self, unprivileged, privileged):
+        """Calibration differences of unprivileged minus privileged, for the *_fairness.json files.
+
+        max_bin_gap_difference is the largest |gap_u - gap_p| over bins populated in both groups.
+        """
+        m = self.metrics()
+        u, p = m.loc[unprivileged], m.loc[privileged]
+        # Per-bin gaps (mean score - positive rate); NaN in empty bins
+        (w_u, s_u, y_u, _), (w_p, s_p, y_p, _) = (self.sums[self.groups.index(g)].T for g in (unprivileged, privileged))
+        gaps = [_ratio(s_u - y_u, w_u), _ratio(s_p - y_p, w_p)]
+        both = (w_u > 0) & (w_p > 0)
+        values = {
+            "ece_difference": u["ece"] - p["ece"],
+            "mce_difference": u["mce"] - p["mce"],
+            "brier_score_difference": u["brier"] - p["brier"],
+            "calibration_in_the_large_difference": u["calibration_in_the_large"] - p["calibration_in_the_large"],
+            "max_bin_gap_difference": np.abs(gaps[0] - gaps[1])[both].max() if both.any() else np.nan,
+        }
+        return {k: (None if np.isnan(v) else float(v)) for k, v in values.items()}
@@ -0,0 +1,258 @@
+"""
+Single entry point for the workspace: python -m scripts.cli <command>.
+
+  train      fit the Adult model (--sparse, --sweep quick|full)
+  mitigate   fit Fairlearn mitigators (ExponentiatedGradient, GridSearch, ThresholdOptimizer)
+  evaluate   run one fairness backend (--backend fairlearn|aif360|google_local|all; --model for a mitigated one)
+  slices     rank the worst-disparity intersectional slices
+  counterfactual  count decisions that change when only the sensitive attribute changes
+  profile    stream per-group column sketches and train/eval drift
+  compare    accuracy and fairness of several saved models on the same rows
+  summarize  regenerate outputs/summary.md
+  env        write outputs/env_info.txt
+  imports    report how long each backend takes to import
+
+Only argparse is imported up front; each command imports its script when it runs, so e.g.
+`evaluate --backend google_local` never loads Fairlearn, AIF360 or scikit-learn. TensorFlow, TFMA and
+the What-If widget are only used by the Colab notebooks and are listed in requirements-google.txt.
+"""
+import argparse
+import importlib
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKENDS = {
+    "fairlearn": "scripts.run_fairlearn_test:run_fairlearn_check",
+    "aif360": "scripts.run_aif360_test:run_aif360_check",
+    "google_local": "scripts.run_google_local_metrics:main",
+}
+# Modules timed by `imports`: the scripts behind each command and the libraries they may pull in
+IMPORT_MODULES = (
+    "scripts.run_google_local_metrics",
+    "scripts.run_fairlearn_test",
+    "scripts.run_aif360_test",
+    "scripts.train_model",
+    "scripts.aggregate_metrics",
+    "scripts.collect_env_info",
+    "pandas",
+    "sklearn",
+    "fairlearn.metrics",
+    "aif360.metrics",
+)
+
+
+def _resolve(target):
+    module, func = target.split(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def train(args):
+    from scripts import train_model
+
+    if args.sweep:
+        grid = (train_model.FULL_GRID if args.sweep == "full" else train_model.QUICK_GRID)
+        grid = grid + (train_model.extra_grid() if args.extra else [])
+        train_model.sweep(grid=grid, jobs=args.jobs, time_budget=args.time_budget)
+    else:
+        train_model.train_and_save(sparse=args.sparse)
+
+
+def mitigate(args):
+    from scripts import mitigate
+
+    mitigate.mitigate(methods=args.methods.split(","), constraint=args.constraint, grid_size=args.grid_size,
+                      eps=args.eps, max_iter=args.max_iter, jobs=args.jobs)
+
+
+def evaluate(args):
+    backends = list(BACKENDS) if args.backend == "all" else [args.backend]
+    common = dict(bootstrap=args.bootstrap, seed=args.seed, jobs=args.jobs, sparse=args.sparse)
+    if args.model:
+        common["model_path"] = args.model
+    for backend in backends:
+        kwargs = dict(common)
+        if backend == "google_local":
+            kwargs.update(threshold=args.threshold, sweep=args.sweep, grid=args.grid,
+                          calibration_bins=args.calibration_bins)
+        elif backend == "fairlearn":
+            kwargs["engine"] = args.fairlearn_engine
+        else:
+            kwargs["engine"] = args.aif360_engine
+        _resolve(BACKENDS[backend])(**kwargs)
+
+
+def slices(args):
+    from scripts import slice_finder
+
+    slice_finder.main(attributes=args.attributes.split(",") if args.attributes else None,
+                      min_support=args.min_support, min_effect=args.min_effect, max_depth=args.max_depth,
+                      metric=args.metric, top=args.top, jobs=args.jobs)
+
+
+def counterfactual(args):
+    from scripts import counterfactual
+
+    counterfactual.main(column=args.column, group=args.group, to=args.to, jobs=args.jobs)
+
+
+def profile(args):
+    from scripts import dataset_summary
+
+    if args.inputs:
+        found = dataset_summary.profile_files(args.inputs, eval_paths=args.eval, group=args.group,
+                                              eval_fraction=args.eval_fraction, jobs=args.jobs)
+    else:
+        found = dataset_summary.profile_adult(group=args.group)
+    dataset_summary.write_profile(found)
+
+
+def compare(args):
+    from scripts import compare_models
+
+    compare_models.compare(args.models, split=args.split, jobs=args.jobs)
+
+
+def summarize(args):
+    from scripts import aggregate_metrics
+
+    aggregate_metrics.main(force=args.force)
+
+
+def env(args):
+    from scripts import collect_env_info
+
+    collect_env_info.main()
+
+
+def import_time(module):
+    """(total seconds, [(child, seconds), ...]) for a fresh `import module`, from python -X importtime."""
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True,
+                         text=True)
+    if res.returncode != 0:
+        return None, []
+    entries = []
+    for line in res.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if m:
+            entries.append((int(m.group(1)) / 1e6, len(m.group(2)) // 2, m.group(3)))
+    own = [i for i, (_, depth, name) in enumerate(entries) if depth == 0 and name == module]
+    if not own:
+        # Already imported during interpreter start-up (e.g. by sitecustomize)
+        return 0.0, []
+    # The module's own line comes after everything it imported; its direct imports are at depth 1
+    end = own[-1]
+    start = max([i for i, (_, depth, _) in enumerate(entries[:end]) if depth == 0], default=-1) + 1
+    children = sorted(((name, t) for t, depth, name in entries[start:end] if depth == 1), key=lambda c: -c[1])
+    return entries[end][0], children
+
+
+def imports(args):
+    report = []
+    for module in args.modules or IMPORT_MODULES:
+        total, children = import_time(module)
+        report.append({"module": module, "seconds": total, "heaviest": [{"module": n, "seconds": t}
+                                                                         for n, t in children[:args.top]]})
+        if total is None:
+            print(f"{module:<36} not importable")
+            continue
+        heaviest = ", ".join(f"{n} {t:.2f}s" for n, t in children[:args.top])
+        print(f"{module:<36} {total:6.2f}s  {heaviest}")
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"Import times saved to {args.out}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m scripts.cli", description="Adult fairness workspace")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("train", help="train the Adult model")
+    p.add_argument("--sparse", action="store_true", help="fit on the CSR encoding and save the encoder")
+    p.add_argument("--sweep", choices=["quick", "full"], default=None)
+    p.add_argument("--extra", action="store_true", help="add SGD and random forest chains to the sweep")
+    p.add_argument("--jobs", type=int, default=None)
+    p.add_argument("--time-budget", type=float, default=None)
+    p.set_defaults(func=train)
+
+    p = sub.add_parser("mitigate", help="fit fairness-mitigated models next to the Adult model")
+    p.add_argument("--methods", default="expgrad,gridsearch,threshold")
+    p.add_argument("--constraint", choices=["demographic_parity", "equalized_odds"], default="demographic_parity")
+    p.add_argument("--grid-size", type=int, default=20)
+    p.add_argument("--eps", type=float, default=0.01)
+    p.add_argument("--max-iter", type=int, default=50)
+    p.add_argument("--jobs", type=int, default=None)
+    p.set_defaults(func=mitigate)
+
+    p = sub.add_parser("evaluate", help="run a fairness backend on the trained model")
+    p.add_argument("--backend", choices=[*BACKENDS, "all"], default="google_local")
+    # Listed here rather than imported from the backends, which would load them up front
+    p.add_argument("--fairlearn-engine", choices=["metricframe", "counts"], default="metricframe")
+    p.add_argument("--aif360-engine", choices=["aif360", "numpy"], default="aif360")
+    p.add_argument("--bootstrap", type=int, default=0)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--jobs", type=int, default=None)
+    p.add_argument("--sparse", action="store_true")
+    p.add_argument("--model", default=None, help="model file (default models/logreg_adult.joblib)")
+    p.add_argument("--threshold", type=float, default=None, help="google_local: score cut-off")
+    p.add_argument("--sweep", action="store_true", help="google_local: sweep all thresholds")
+    p.add_argument("--grid", type=int, default=None, help="google_local: sweep a fixed grid")
+    p.add_argument("--calibration-bins", type=int, default=10, help="google_local: score bins for calibration")
+    p.set_defaults(func=evaluate)
+
+    p = sub.add_parser("slices", help="rank intersectional slices by disparity vs their complement")
+    p.add_argument("--attributes", default=None, help="comma-separated attributes (default: all)")
+    p.add_argument("--min-support", type=float, default=0.01)
+    p.add_argument("--min-effect", type=float, default=0.3)
+    p.add_argument("--max-depth", type=int, default=3)
+    p.add_argument("--metric", default="selection_rate", help="selection_rate|tpr|fpr|accuracy")
+    p.add_argument("--top", type=int, default=50)
+    p.add_argument("--jobs", type=int, default=None)
+    p.set_defaults(func=slices)
+
+    p = sub.add_parser("counterfactual", help="flip test of the sensitive attribute")
+    p.add_argument("--column", default="sex_Male", help="binary column to toggle")
+    p.add_argument("--group", default=None, help="one-hot prefix (e.g. race) to move instead")
+    p.add_argument("--to", default=None, help="category every row moves to (default: the dropped one)")
+    p.add_argument("--jobs", type=int, default=None)
+    p.set_defaults(func=counterfactual)
+
+    p = sub.add_parser("profile", help="streaming dataset profile with train/eval drift")
+    p.add_argument("inputs", nargs="*", help="CSV/Parquet files (default: the Adult data)")
+    p.add_argument("--eval", nargs="+", default=None, help="evaluation-split files (default: random rows)")
+    p.add_argument("--group", default="sex")
+    p.add_argument("--eval-fraction", type=float, default=0.2)
+    p.add_argument("--jobs", type=int, default=None)
+    p.set_defaults(func=profile)
+
+    p = sub.add_parser("compare", help="compare saved models side by side")
+    p.add_argument("models", nargs="*", help="model files or directories (default: models/)")
+    p.add_argument("--split", choices=["test", "all"], default="test")
+    p.add_argument("--jobs", type=int, default=None)
+    p.set_defaults(func=compare)
+
+    p = sub.add_parser("summarize", help="regenerate outputs/summary.md")
+    p.add_argument("--force", action="store_true", help="rewrite even if no input changed")
+    p.set_defaults(func=summarize)
+
+    p = sub.add_parser("env", help="write outputs/env_info.txt")
+    p.set_defaults(func=env)
+
+    p = sub.add_parser("imports", help="import time of each backend in a fresh interpreter")
+    p.add_argument("modules", nargs="*")
+    p.add_argument("--top", type=int, default=3, help="heaviest direct imports to list")
+    p.add_argument("--out", default=None, help="also write the report as JSON")
+    p.set_defaults(func=imports)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,86 @@
+"""
+Write outputs/env_info.txt: platform, Python and package versions in the layout of `pip list` / `pip show`.
+Versions are read through importlib.metadata rather than by running pip in subprocesses.
+"""
 import platform
-import subprocess
+import re
 import sys
+from importlib import metadata
 from pathlib import Path
 
+SHOW = ("aif360", "fairlearn", "witwidget", "tensorflow", "tensorflow-model-analysis")
+# Section titles used in env_info.txt for the packages in SHOW
+TITLES = {"tensorflow-model-analysis": "tfma"}
+
+
+def _canonical(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _requirement_name(req):
+    return re.match(r"[A-Za-z0-9._-]+", req).group(0)
+
+
+def _distributions():
+    dists = {}
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if name and _canonical(name) not in dists:
+            dists[_canonical(name)] = dist
+    return dists
+
+
+def pip_list(dists):
+    rows = sorted(((d.metadata["Name"], d.version) for d in dists.values()), key=lambda r: r[0].lower())
+    width = max([len("Package")] + [len(n) for n, _ in rows])
+    vwidth = max([len("Version")] + [len(v) for _, v in rows])
+    lines = [f"{'Package':<{width}} Version", f"{'-' * width} {'-' * vwidth}"]
+    lines += [f"{n:<{width}} {v}" for n, v in rows]
+    return "\n".join(lines) + "\n"
+
+
+def _requires(dist):
+    # Like pip show: unconditional requirements only (no extras)
+    return sorted({_requirement_name(r) for r in (dist.requires or []) if "extra ==" not in r}, key=str.lower)
+
+
+def pip_show(name, dists):
+    dist = dists.get(_canonical(name))
+    if dist is None:
+        return f"<{name} not found>\n"
+    meta = dist.metadata
+    required_by = sorted(
+        (d.metadata["Name"] for d in dists.values() if _canonical(name) in {_canonical(r) for r in _requires(d)}),
+        key=str.lower,
+    )
+    fields = [
+        ("Name", meta["Name"]),
+        ("Version", dist.version),
+        ("Summary", meta["Summary"]),
+        ("Home-page", meta["Home-page"]),
+        ("Author", meta["Author"]),
+        ("Author-email", meta["Author-email"]),
+        ("License", meta["License"]),
+        ("Location", str(dist.locate_file("")).rstrip("/")),
+        ("Requires", ", ".join(_requires(dist))),
+        ("Required-by", ", ".join(required_by)),
+    ]
+    return "".join(f"{k}: {v or ''}\n" for k, v in fields)
+
 
 def main():
     outdir = Path("outputs")
     outdir.mkdir(exist_ok=True)
+    dists = _distributions()
     with open(outdir / "env_info.txt", "w") as f:
         f.write("OS: " + platform.platform() + "\n")
         f.write("Python: " + sys.version.replace("\n", " ") + "\n")
-        # pip list filtered
-        try:
-            pkgs = subprocess.check_output([sys.executable, "-m", "pip", "list"]).decode()
-        except Exception:
-            pkgs = "<pip list failed>\n"
         f.write("\n[pip list]\n")
-        f.write(pkgs)
+        f.write(pip_list(dists))
         # versions of key libs
-        def pip_show(name):
-            try:
-                return subprocess.check_output([sys.executable, "-m", "pip", "show", name]).decode()
-            except Exception:
-                return f"<{name} not found>\n"
-        f.write("\n[aif360]\n" + pip_show("aif360"))
-        f.write("\n[fairlearn]\n" + pip_show("fairlearn"))
-        f.write("\n[witwidget]\n" + pip_show("witwidget"))
-        f.write("\n[tensorflow]\n" + pip_show("tensorflow"))
-        f.write("\n[tfma]\n" + pip_show("tensorflow-model-analysis"))
+        for name in SHOW:
+            f.write(f"\n[{TITLES.get(name, name)}]\n" + pip_show(name, dists))
+    print("Environment info saved to outputs/env_info.txt")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,186 @@
+"""
+Side-by-side fairness and accuracy of any number of saved models on the same cached Adult data.
+
+The data is loaded once (the memory-mapped load_adult cache) and the sex groups, label and per-group
+label counts are encoded once into a SharedGroups index. Models are scored on a thread pool through the
+prediction store (scripts.predictions), so every thread reads the same in-memory matrix. A model whose
+predictions are already stored (by the backends or an earlier comparison) is looked up by its file hash
+and not loaded at all. Each model then costs one weighted bincount of its predictions for its confusion
+counts, plus AUC and calibration from its scores.
+
+Predictions are always for every row, the store's unit, so they are shared with the backends; with
+split="test" only the held-out rows are then counted.
+
+Models trained on the sparse encoding (train_model --sparse, which sets encoding_ = "csr" on the model)
+are scored on the cached CSR matrix, which has the same rows in the same order, and stored under its
+dataset key; finding them there is what marks a model as sparse on later runs. Any other model is scored
+on the dense frame, and one fit on an unnamed array of a different width is an error.
+"""
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scripts import run_history
+from scripts.calibration import CalibrationCounts
+from scripts.group_metrics import GroupCounts
+from scripts.load_adult import LABEL, cache_key, load_adult, load_adult_arrays
+from scripts.predictions import data_key, get_predictions, model_key, stored_predictions
+from scripts.profiling import span
+from scripts.streaming_eval import group_labels
+
+MODELS_DIR = Path("models")
+OUT_FILE = Path("outputs") / "model_comparison.csv"
+
+
+class SharedGroups:
+    """Group codes, labels and per-group label counts of the evaluation rows, built once for all models."""
+
+    def __init__(self, groups, y_true):
+        self.codes, self.groups = pd.factorize(np.asarray(groups), sort=True)
+        self.y_true = np.asarray(y_true).astype(np.int64)
+        # Cell of each row: 2 * group + label, so one bincount splits any per-row quantity by both
+        self.cells = self.codes.astype(np.int64) * 2 + self.y_true
+        self.label_counts = np.bincount(self.cells, minlength=2 * len(self.groups)).reshape(-1, 2)
+        self.categorical = pd.Categorical.from_codes(self.codes, categories=self.groups)
+
+    def counts(self, y_pred):
+        """GroupCounts of one model's 0/1 predictions from a single weighted bincount."""
+        predicted = np.bincount(self.cells, weights=y_pred, minlength=2 * len(self.groups)).reshape(-1, 2)
+        fp, tp = predicted[:, 0], predicted[:, 1]
+        negatives, positives = self.label_counts[:, 0], self.label_counts[:, 1]
+        return GroupCounts(self.groups, np.stack([negatives - fp, fp, positives - tp, tp], axis=1), name="sex")
+
+
+def find_models(paths=None):
+    """Model files from paths (files or directories of *.joblib; default models/)."""
+    found = []
+    for path in map(Path, paths or [MODELS_DIR]):
+        found += sorted(path.glob("*.joblib")) if path.is_dir() else [path]
+    return found
+
+
+def _score(path, X, keys, sparse_data):
+    """(model hash, scores, labels) of one model file, read from or added to the prediction store.
+
+    keys are the dataset keys of the dense frame and of the CSR encoding; the model is only loaded when
+    neither has its predictions stored.
+    """
+    model_hash = model_key(None, path)
+    for key in keys:
+        stored = stored_predictions(model_hash, key)
+        if stored is not None:
+            return (model_hash, *stored)
+    model = joblib.load(path)
+    if not hasattr(model, "predict"):
+        return None
+    if getattr(model, "encoding_", None) == "csr":
+        # Set by train_model --sparse
+        data = sparse_data()
+        scores, labels = get_predictions(data.X, model, key=data.key, model_hash=model_hash)
+        return model_hash, scores, labels
+    width = getattr(model, "n_features_in_", None)
+    if getattr(model, "feature_names_in_", None) is None and width not in (None, X.shape[1]):
+        raise ValueError(f"{path} was fit on {width} unnamed features, not the {X.shape[1]} encoded Adult columns")
+    scores, labels = get_predictions(X, model, key=keys[0], model_hash=model_hash)
+    return model_hash, scores, labels
+
+
+def _metrics(shared, rows, scores, labels):
+    from sklearn.metrics import roc_auc_score
+
+    y_pred = (np.asarray(labels)[rows] == 1).astype(np.int64)
+    scores = np.asarray(scores)[rows]
+    counts = shared.counts(y_pred)
+    overall = counts.overall(columns=("accuracy", "selection_rate", "tpr", "fpr"))
+    fairness = counts.fairness()
+    try:
+        overall["roc_auc"] = float(roc_auc_score(shared.y_true, scores))
+    except ValueError:
+        overall["roc_auc"] = np.nan
+    if scores.min() >= 0 and scores.max() <= 1:
+        calibration = CalibrationCounts.from_arrays(shared.categorical, shared.y_true, scores)
+        overall.update(calibration.metrics().loc["all", ["ece", "brier"]].to_dict())
+        fairness.update(calibration.differences(fairness["unprivileged_group"], fairness["privileged_group"]))
+    return counts, overall, fairness
+
+
+def compare(paths=None, split="test", jobs=None, out_path=OUT_FILE, record=True):
+    """Evaluate every model on the same rows (split="test": train_model's held-out 20%; "all": every row)
+    and write one row per model to out_path."""
+    from sklearn.model_selection import train_test_split
+
+    files = find_models(paths)
+    if not files:
+        raise FileNotFoundError(f"No model files in {paths or [MODELS_DIR]}")
+    df = load_adult()
+    X = df.drop(columns=[LABEL])
+    y = df[LABEL].to_numpy()
+    rows = np.arange(len(y))
+    if split == "test":
+        _, rows = train_test_split(rows, test_size=0.2, random_state=42)
+    with span("shared_groups", rows=len(rows)):
+        shared = SharedGroups(group_labels(X["sex_Male"].iloc[rows], "sex_Male"), y[rows])
+
+    keys = (data_key(X), cache_key(sparse=True))
+    sparse, lock = {}, threading.Lock()
+
+    def sparse_data():
+        # Loaded at most once, and only when a sparse model is compared
+        with lock:
+            if "data" not in sparse:
+                sparse["data"] = load_adult_arrays(sparse=True)
+        return sparse["data"]
+
+    def evaluate(path):
+        scored = _score(path, X, keys, sparse_data)
+        if scored is None:
+            # Not a model (e.g. the saved encoder)
+            return None
+        model_hash, scores, labels = scored
+        return (path, model_hash, *_metrics(shared, rows, scores, labels))
+
+    with span("compare", rows=len(y)):
+        if jobs == 1 or len(files) == 1:
+            results = [evaluate(path) for path in files]
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(evaluate, files))
+
+    records = []
+    dataset_id = f"{df.attrs.get('cache_key', 'adult')}:{split}"
+    for path, model_hash, counts, overall, fairness in filter(None, results):
+        rates = counts.by_group()
+        records.append({
+            "model": Path(path).stem,
+            "model_hash": model_hash,
+            "rows": len(rows),
+            **overall,
+            **{k: v for k, v in fairness.items() if not k.endswith("_group")},
+            **{f"{metric}_{group}": rates.loc[group, metric] for group in rates.index for metric in rates.columns},
+        })
+        if record:
+            run_history.record("compare", model_hash, dataset_id, by_group=rates, overall=overall, fairness=fairness)
+    table = pd.DataFrame(records)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(exist_ok=True)
+    table.to_csv(out_path, index=False)
+    cols = ["model", "accuracy", "roc_auc", "statistical_parity_difference", "disparate_impact",
+            "equal_opportunity_difference", "average_odds_difference"]
+    print(table[[c for c in cols if c in table.columns]].to_string(index=False))
+    print(f"Saved comparison of {len(table)} models to {out_path}")
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare saved models side by side on the cached Adult data")
+    parser.add_argument("models", nargs="*", help="model files or directories (default: models/)")
+    parser.add_argument("--split", choices=["test", "all"], default="test",
+                        help="evaluate on train_model's held-out rows or on every row")
+    parser.add_argument("--jobs", type=int, default=None, help="models scored at once")
+    args = parser.parse_args()
+    compare(args.models, split=args.split, jobs=args.jobs)
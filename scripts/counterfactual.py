@@ -0,0 +1,290 @@
+"""
+Counterfactual flip test: how many decisions change when only the sensitive attribute is changed.
+
+Every row is moved to its counterfactual group, either by toggling a binary column (sex_Male by default)
+or by moving a one-hot group (e.g. race_*) to one chosen category, and rescored. For linear models the
+new decision value is the old one plus the closed-form delta sum_j coef_j * (x'_j - x_j), computed from
+the group's columns alone; other models are rescored on chunk-sized copies with the columns changed. The
+feature matrix itself is never copied.
+
+Results are accumulated per original group in FlipCounts (rows, flips in each direction, moments and a
+fixed-width histogram of the score shift), which merge by addition, so chunks, Parquet row groups and
+worker processes combine exactly as GroupCounts do in scripts.streaming_eval.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scripts.profiling import span
+
+# Score shifts are histogrammed on [-1, 1] in 0.001-wide bins centred on multiples of 0.001 (clipped at the
+# ends for decision values)
+SHIFT_STEP = 0.001
+SHIFT_BINS = 2 * round(1 / SHIFT_STEP) + 1
+QUANTILES = (0.01, 0.05, 0.5, 0.95, 0.99)
+CHUNK_ROWS = 1_000_000
+
+
+class FlipCounts:
+    """Per-group flip counts and score-shift distribution of a counterfactual change."""
+
+    def __init__(self, groups, counts, moments, max_abs, hist, name=None):
+        self.groups = list(groups)
+        n = len(self.groups)
+        # counts[i] = (rows, positive -> negative, negative -> positive); moments[i] = (sum, sum of squares)
+        self.counts = np.asarray(counts, dtype=np.float64).reshape(n, 3)
+        self.moments = np.asarray(moments, dtype=np.float64).reshape(n, 2)
+        self.max_abs = np.asarray(max_abs, dtype=np.float64).reshape(n)
+        self.hist = np.asarray(hist, dtype=np.float64).reshape(n, SHIFT_BINS)
+        self.name = name
+
+    @classmethod
+    def from_arrays(cls, groups, before, after, shift):
+        """Count rows by group: before/after are the 0/1 decisions, shift the score change."""
+        name = getattr(groups, "name", None)
+        codes, labels = pd.factorize(np.asarray(groups), sort=True)
+        n = len(labels)
+        before = np.asarray(before, dtype=np.int64)
+        after = np.asarray(after, dtype=np.int64)
+        shift = np.asarray(shift, dtype=np.float64)
+        counts = np.stack([np.bincount(codes, minlength=n),
+                           np.bincount(codes, weights=before & (after == 0), minlength=n),
+                           np.bincount(codes, weights=(before == 0) & after, minlength=n)], axis=1)
+        moments = np.stack([np.bincount(codes, weights=shift, minlength=n),
+                            np.bincount(codes, weights=shift * shift, minlength=n)], axis=1)
+        max_abs = np.zeros(n)
+        np.maximum.at(max_abs, codes, np.abs(shift))
+        bins = np.clip(np.rint(shift / SHIFT_STEP).astype(np.int64) + SHIFT_BINS // 2, 0, SHIFT_BINS - 1)
+        hist = np.bincount(codes * SHIFT_BINS + bins, minlength=n * SHIFT_BINS)
+        return cls(labels, counts, moments, max_abs, hist, name=name)
+
+    def merge(self, other):
+        """Return the sum of two FlipCounts, aligning groups by label."""
+        known = set(self.groups)
+        groups = list(self.groups) + [g for g in other.groups if g not in known]
+        position = {g: i for i, g in enumerate(groups)}
+        out = FlipCounts(groups, np.zeros((len(groups), 3)), np.zeros((len(groups), 2)), np.zeros(len(groups)),
+                         np.zeros((len(groups), SHIFT_BINS)), name=self.name or other.name)
+        for part in (self, other):
+            rows = [position[g] for g in part.groups]
+            out.counts[rows] += part.counts
+            out.moments[rows] += part.moments
+            out.hist[rows] += part.hist
+            out.max_abs[rows] = np.maximum(out.max_abs[rows], part.max_abs)
+        return out
+
+    __add__ = merge
+
+    def _quantiles(self, hist):
+        cumulative = np.cumsum(hist)
+        centers = (np.arange(SHIFT_BINS) - SHIFT_BINS // 2) * SHIFT_STEP
+        return [centers[min(np.searchsorted(cumulative, q * cumulative[-1]), SHIFT_BINS - 1)] for q in QUANTILES]
+
+    def summary(self):
+        """One row per group (plus "all"): flip rates and the mean, spread and quantiles of the shift."""
+        groups = self.groups + ["all"]
+        counts = np.vstack([self.counts, self.counts.sum(axis=0)])
+        moments = np.vstack([self.moments, self.moments.sum(axis=0)])
+        hist = np.vstack([self.hist, self.hist.sum(axis=0)])
+        rows = counts[:, 0]
+        flips = counts[:, 1] + counts[:, 2]
+        mean = np.divide(moments[:, 0], rows, out=np.zeros(len(rows)), where=rows > 0)
+        var = np.divide(moments[:, 1], rows, out=np.zeros(len(rows)), where=rows > 0) - mean ** 2
+        table = pd.DataFrame({
+            "group": groups,
+            "rows": rows.astype(np.int64),
+            "flips": flips.astype(np.int64),
+            "flip_rate": np.divide(flips, rows, out=np.zeros(len(rows)), where=rows > 0),
+            "positive_to_negative": counts[:, 1].astype(np.int64),
+            "negative_to_positive": counts[:, 2].astype(np.int64),
+            "mean_shift": mean,
+            "std_shift": np.sqrt(np.maximum(var, 0)),
+            "max_abs_shift": np.append(self.max_abs, self.max_abs.max(initial=0)),
+        })
+        quantiles = np.array([self._quantiles(h) if h.sum() else [np.nan] * len(QUANTILES) for h in hist])
+        for i, q in enumerate(QUANTILES):
+            table[f"shift_p{round(q * 100):02d}"] = quantiles[:, i]
+        return table
+
+
+def flip_design(features, column="sex_Male", group=None, to=None):
+    """Indices of the changed columns in features and the category every row moves to.
+
+    With group=None the binary column is toggled (to is ignored); with group="race" every row moves to the
+    one-hot column f"race_{to}", or to the dropped baseline category when to is None.
+    """
+    features = [str(f) for f in features]
+    if group is None:
+        if column not in features:
+            raise KeyError(f"{column} is not a model feature")
+        return [features.index(column)], None
+    members = [i for i, f in enumerate(features) if f.startswith(f"{group}_")]
+    if not members:
+        raise KeyError(f"No one-hot columns {group}_* among the model features")
+    if to is None:
+        return members, -1
+    target = f"{group}_{to}"
+    if target not in features:
+        raise KeyError(f"{target} is not a model feature")
+    return members, members.index(features.index(target))
+
+
+def _group_labels(block, features, members, target, group):
+    if target is None:
+        from scripts.streaming_eval import group_labels
+
+        column = features[members[0]]
+        return group_labels(pd.Series(block[:, 0]), column)
+    # The original category: the set one-hot column, or the dropped baseline when none is set
+    names = np.array([features[i].split(f"{group}_", 1)[1] for i in members] + ["(baseline)"], dtype=object)
+    hot = block.astype(bool)
+    return names[np.where(hot.any(axis=1), hot.argmax(axis=1), len(members))]
+
+
+def _counterfactual_block(block, target):
+    if target is None:
+        return 1 - block
+    moved = np.zeros_like(block)
+    if target >= 0:
+        moved[:, target] = 1
+    return moved
+
+
+def _columns(X, features, members, lo, hi):
+    if hasattr(X, "columns"):
+        return np.column_stack([X[features[i]].to_numpy()[lo:hi] for i in members]).astype(np.float64)
+    block = X[lo:hi][:, members]
+    return block.toarray() if hasattr(block, "toarray") else np.asarray(block, dtype=np.float64)
+
+
+def flip_test(X, model, column="sex_Male", group=None, to=None, chunk_rows=CHUNK_ROWS, jobs=None):
+    """FlipCounts of X (DataFrame, array or CSR) under the counterfactual described by flip_design."""
+    from scipy.special import expit
+
+    from scripts import scoring
+    from scripts.predictions import score_model
+
+    names = getattr(model, "feature_names_in_", None)
+    features = [str(f) for f in (names if names is not None else getattr(X, "columns", []))]
+    if not features:
+        raise ValueError("Feature names are needed: pass a DataFrame or a model fitted on one")
+    if hasattr(X, "columns"):
+        X = X[features] if list(X.columns) != features else X
+    members, target = flip_design(features, column=column, group=group, to=to)
+    scorer = scoring.LinearScorer.from_model(model) if scoring.supports(model) else None
+    classes = np.asarray(model.classes_)
+    total = None
+    n = X.shape[0]
+    with span("flip_test", rows=n):
+        for lo in range(0, n, chunk_rows):
+            hi = min(lo + chunk_rows, n)
+            chunk = X.iloc[lo:hi] if hasattr(X, "iloc") else X[lo:hi]
+            block = _columns(X, features, members, lo, hi)
+            moved = _counterfactual_block(block, target)
+            if scorer is not None:
+                # Closed form: only the changed columns enter the delta
+                d = scorer.decision_function(chunk, dtype=np.float64, jobs=jobs)
+                d_new = d + (moved - block) @ scorer.coef[members]
+                before, after = (d > 0).astype(np.int64), (d_new > 0).astype(np.int64)
+                shift = expit(d_new) - expit(d) if scorer.logistic else d_new - d
+            else:
+                changed = (chunk.copy() if hasattr(chunk, "copy") else np.array(chunk, dtype=np.float64))
+                if hasattr(changed, "columns"):
+                    changed[[features[i] for i in members]] = moved.astype(changed[features[members[0]]].dtype)
+                else:
+                    changed[:, members] = moved
+                scores, labels = score_model(model, chunk)
+                scores_new, labels_new = score_model(model, changed)
+                before = (np.asarray(labels) == classes[1]).astype(np.int64)
+                after = (np.asarray(labels_new) == classes[1]).astype(np.int64)
+                shift = np.asarray(scores_new, dtype=np.float64) - scores
+            counts = FlipCounts.from_arrays(_group_labels(block, features, members, target, group), before, after,
+                                            shift)
+            total = counts if total is None else total + counts
+    total.name = group or column
+    return total
+
+
+def flip_test_file(path, row_groups=None, model_path=None, column="sex_Male", group=None, to=None,
+                   chunksize=CHUNK_ROWS):
+    """FlipCounts over one CSV/Parquet file (or some of its row groups) of encoded feature columns."""
+    from scripts.streaming_eval import align_features, iter_chunks
+
+    model = joblib.load(model_path)
+    features = list(getattr(model, "feature_names_in_", []))
+    total = None
+    for chunk in iter_chunks(path, chunksize=chunksize, row_groups=row_groups):
+        # As in streaming_eval: only one-hot columns absent from the file are filled (with zeros)
+        X = align_features(chunk, features) if features else chunk
+        counts = flip_test(X, model, column=column, group=group, to=to, chunk_rows=chunksize, jobs=1)
+        total = counts if total is None else total + counts
+    return total
+
+
+def flip_test_files(paths, model_path, column="sex_Male", group=None, to=None, chunksize=CHUNK_ROWS, jobs=None):
+    """Merged FlipCounts over many files, spread over worker processes by file or Parquet row group."""
+    from scripts.streaming_eval import _tasks
+
+    tasks = _tasks(paths)
+    kwargs = dict(model_path=model_path, column=column, group=group, to=to, chunksize=chunksize)
+    if jobs == 1 or len(tasks) == 1:
+        parts = [flip_test_file(path, groups, **kwargs) for path, groups in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parts = [f.result() for f in [pool.submit(flip_test_file, path, groups, **kwargs)
+                                          for path, groups in tasks]]
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        raise ValueError("No rows found in the input")
+    total = parts[0]
+    for part in parts[1:]:
+        total = total + part
+    return total
+
+
+def main(df=None, model=None, column="sex_Male", group=None, to=None, chunk_rows=CHUNK_ROWS, jobs=None,
+         out_path=Path("outputs") / "counterfactual.csv"):
+    """Pipeline stage: flip test of the trained model on the Adult data, written to outputs/counterfactual.csv."""
+    from scripts.load_adult import LABEL, load_adult
+    from scripts.train_model import load_model
+
+    if df is None:
+        df = load_adult()
+    if model is None:
+        model = load_model()
+    X = df.drop(columns=[LABEL]) if LABEL in df.columns else df
+    table = flip_test(X, model, column=column, group=group, to=to, chunk_rows=chunk_rows, jobs=jobs).summary()
+    _write(table, group or column, out_path)
+    return table
+
+
+def _write(table, changed, out_path):
+    table.insert(0, "changed", changed)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(exist_ok=True)
+    table.to_csv(out_path, index=False)
+    print(table[["group", "rows", "flips", "flip_rate", "mean_shift", "shift_p05", "shift_p95"]].to_string(index=False))
+    print(f"Saved counterfactual flip rates to {out_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Counterfactual flip test of the sensitive attribute")
+    parser.add_argument("inputs", nargs="*", help="encoded CSV/Parquet files (default: the Adult data)")
+    parser.add_argument("--model", default="models/logreg_adult.joblib")
+    parser.add_argument("--column", default="sex_Male", help="binary column to toggle")
+    parser.add_argument("--group", default=None, help="one-hot prefix (e.g. race) to move instead")
+    parser.add_argument("--to", default=None, help="category every row moves to (default: the dropped one)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+    if args.inputs:
+        counts = flip_test_files(args.inputs, args.model, column=args.column, group=args.group, to=args.to,
+                                 chunksize=args.chunksize, jobs=args.jobs)
+        _write(counts.summary(), args.group or args.column, Path("outputs") / "counterfactual.csv")
+    else:
+        main(model=joblib.load(args.model), column=args.column, group=args.group, to=args.to,
+             chunk_rows=args.chunksize, jobs=args.jobs)
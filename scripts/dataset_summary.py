@@ -1,7 +1,31 @@
+"""
+Dataset summary (row/column counts, label and sex counts) of the encoded Adult frame.
+
+With --profile the data is instead streamed once, chunk by chunk, into per-(split, group, column)
+sketches (scripts.sketches): null rate, distinct count, approximate quantiles for numeric columns and
+category frequencies for the rest. Memory is bounded by the chunk size and the sketch sizes, not the
+number of rows, and partitions (files or Parquet row groups) are profiled in parallel and merged. The
+train and evaluation splits are compared for group representation and per-feature drift (PSI, and the
+largest CDF gap or total variation distance).
+"""
+import argparse
 import json
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+
+import numpy as np
 import pandas as pd
+
 from scripts.load_adult import load_adult
+from scripts.sketches import DistinctSketch, FrequencySketch, QuantileSketch
+
+QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+SPLITS = ("train", "eval")
+# Same split as train_model (test_size=0.2, random_state=42) when profiling the Adult data in memory
+EVAL_FRACTION = 0.2
+PSI_BINS = 10
+_EPS = 1e-6
 
 
 def main():
@@ -29,5 +53,239 @@ def main():
         grp_size.to_csv(outdir / "dataset_group_counts.csv", index=False)
 
 
+class ColumnProfile:
+    """Sketches of one column of one (split, group) subset."""
+
+    def __init__(self, numeric):
+        self.numeric = numeric
+        self.rows = 0
+        self.nulls = 0
+        self.distinct = DistinctSketch()
+        self.values = QuantileSketch() if numeric else FrequencySketch()
+
+    def update(self, values):
+        self.rows += len(values)
+        self.nulls += int(values.isna().sum())
+        self.distinct.update(values)
+        self.values.update(values.to_numpy(dtype=np.float64, na_value=np.nan) if self.numeric else values)
+        return self
+
+    def merge(self, other):
+        out = ColumnProfile(self.numeric)
+        out.rows, out.nulls = self.rows + other.rows, self.nulls + other.nulls
+        out.distinct, out.values = self.distinct + other.distinct, self.values + other.values
+        return out
+
+    __add__ = merge
+
+    def copy(self):
+        return ColumnProfile(self.numeric) + self
+
+    def summary(self):
+        out = {"kind": "numeric" if self.numeric else "categorical", "rows": self.rows,
+               "null_rate": self.nulls / self.rows if self.rows else np.nan, "distinct": round(self.distinct.estimate())}
+        if self.numeric:
+            out.update(min=self.values.min, max=self.values.max)
+            out.update({f"p{round(q * 100):02d}": v for q, v in zip(QUANTILES, self.values.quantiles(QUANTILES))})
+        else:
+            top = self.values.frequencies().head(5)
+            out["top"] = "; ".join(f"{v}: {f:.3f}" for v, f in top.items())
+        return out
+
+
+class DatasetProfile:
+    """ColumnProfiles keyed by (split, group, column); merges by adding the matching profiles."""
+
+    def __init__(self, profiles=None):
+        self.profiles = dict(profiles or {})
+
+    def update(self, chunk, groups, splits):
+        """Add a chunk; groups and splits are per-row labels."""
+        for (split, group), rows in pd.Series(np.arange(len(chunk))).groupby([splits, groups]).groups.items():
+            part = chunk.iloc[np.asarray(rows)]
+            for column in chunk.columns:
+                key = (split, group, column)
+                if key not in self.profiles:
+                    values = chunk[column]
+                    numeric = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+                    self.profiles[key] = ColumnProfile(numeric)
+                self.profiles[key].update(part[column])
+        return self
+
+    def _add(self, key, profile):
+        # Never store the caller's profile itself: update() would change it through this one
+        self.profiles[key] = self.profiles[key] + profile if key in self.profiles else profile.copy()
+
+    def merge(self, other):
+        out = DatasetProfile()
+        for profiles in (self.profiles, other.profiles):
+            for key, profile in profiles.items():
+                out._add(key, profile)
+        return out
+
+    __add__ = merge
+
+    def with_all_groups(self):
+        """Profiles plus a group "all" per split and column, merged from the per-group sketches."""
+        out = DatasetProfile()
+        for (split, group, column), profile in self.profiles.items():
+            out._add((split, group, column), profile)
+            out._add((split, "all", column), profile)
+        return out
+
+    def table(self):
+        rows = [{"split": s, "group": g, "column": c, **p.summary()} for (s, g, c), p in self.profiles.items()]
+        return pd.DataFrame(rows).sort_values(["column", "group", "split"], kind="stable").reset_index(drop=True)
+
+    def groups(self):
+        """Rows and share of each group in each split."""
+        first = next(iter(self.profiles))[2]
+        counts = pd.Series({(s, g): p.rows for (s, g, c), p in self.profiles.items() if c == first and g != "all"})
+        table = counts.unstack(0).reindex(columns=list(SPLITS)).fillna(0)
+        table.index.name = "group"
+        out = pd.DataFrame(index=table.index)
+        for split in SPLITS:
+            out[f"{split}_rows"] = table[split].astype(np.int64)
+            out[f"{split}_share"] = table[split] / table[split].sum() if table[split].sum() else np.nan
+        out["share_difference"] = out["eval_share"] - out["train_share"]
+        return out.reset_index()
+
+    def drift(self):
+        """Per (column, group): PSI of eval vs train, and the largest CDF gap (numeric) or total variation
+        distance (categorical)."""
+        rows = []
+        for (split, group, column), train in self.profiles.items():
+            evaluation = self.profiles.get(("eval", group, column))
+            if split != "train" or evaluation is None:
+                continue
+            rows.append({"column": column, "group": group, "kind": "numeric" if train.numeric else "categorical",
+                         **_drift(train, evaluation)})
+        table = pd.DataFrame(rows)
+        return table.sort_values("psi", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _psi(expected, actual):
+    expected, actual = np.maximum(expected, _EPS), np.maximum(actual, _EPS)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def _drift(train, evaluation):
+    if train.numeric:
+        a, b = train.values, evaluation.values
+        if not a.count or not b.count:
+            return {"psi": np.nan, "max_cdf_gap": np.nan, "tvd": np.nan}
+        # Bins at the train deciles (deduplicated for discrete columns)
+        edges = np.unique(a.quantiles(np.linspace(0, 1, PSI_BINS + 1)[1:-1]))
+        expected = np.diff(np.concatenate([[0], a.cdf(edges), [1]]))
+        actual = np.diff(np.concatenate([[0], b.cdf(edges), [1]]))
+        points = np.union1d(a.items(), b.items())
+        return {"psi": _psi(expected, actual), "max_cdf_gap": float(np.max(np.abs(a.cdf(points) - b.cdf(points)))),
+                "tvd": np.nan}
+    p, q = train.values.frequencies(), evaluation.values.frequencies()
+    p, q = p.align(q, fill_value=0)
+    return {"psi": _psi(p.to_numpy(), q.to_numpy()), "max_cdf_gap": np.nan,
+            "tvd": float(0.5 * np.abs(p - q).sum())}
+
+
+def _group_labels(chunk, group):
+    from scripts.streaming_eval import group_labels
+
+    values = chunk[group]
+    return group_labels(values, group) if group.startswith("sex_") else values.astype(str).str.strip().to_numpy()
+
+
+def profile_chunks(chunks, group="sex", eval_fraction=EVAL_FRACTION, seed=0, split=None):
+    """DatasetProfile of an iterable of frames. Rows go to the eval split with probability eval_fraction
+    (seeded per chunk) unless split names the split of every row."""
+    profile = DatasetProfile()
+    for i, chunk in enumerate(chunks):
+        if split is not None:
+            splits = np.full(len(chunk), split)
+        elif "_split" in chunk.columns:
+            splits = chunk.pop("_split").to_numpy()
+        else:
+            rng = np.random.default_rng([*np.ravel(seed), i])
+            splits = np.where(rng.random(len(chunk)) < eval_fraction, "eval", "train")
+        groups = _group_labels(chunk, group)
+        profile.update(chunk.drop(columns=[group]), groups, splits)
+    return profile
+
+
+def _profile_task(path, row_groups, group, eval_fraction, seed, split, chunksize):
+    from scripts.streaming_eval import iter_chunks
+
+    return profile_chunks(iter_chunks(path, chunksize=chunksize, row_groups=row_groups), group=group,
+                          eval_fraction=eval_fraction, seed=[seed, zlib.crc32(str(path).encode()), *(row_groups or [])],
+                          split=split)
+
+
+def profile_files(paths, eval_paths=None, group="sex", eval_fraction=EVAL_FRACTION, seed=0, chunksize=100_000,
+                  jobs=None):
+    """DatasetProfile of CSV/Parquet files, one task per file or Parquet row group, merged at the end.
+
+    With eval_paths, paths are the train split and eval_paths the evaluation split; otherwise rows of
+    paths are assigned at random with eval_fraction.
+    """
+    from scripts.streaming_eval import _tasks
+
+    tasks = [(p, g, None if eval_paths is None else "train") for p, g in _tasks(paths)]
+    tasks += [(p, g, "eval") for p, g in _tasks(eval_paths or [])]
+    args = [(p, g, group, eval_fraction, seed, split, chunksize) for p, g, split in tasks]
+    if jobs == 1 or len(tasks) == 1:
+        parts = [_profile_task(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parts = [f.result() for f in [pool.submit(_profile_task, *a) for a in args]]
+    total = parts[0]
+    for part in parts[1:]:
+        total = total + part
+    return total
+
+
+def profile_adult(group="sex", chunksize=100_000):
+    """DatasetProfile of the raw Adult data, split into train/eval rows exactly as train_model splits them."""
+    from sklearn.model_selection import train_test_split
+
+    from scripts.load_adult import load_raw
+
+    raw = load_raw().reset_index(drop=True)
+    _, eval_rows = train_test_split(np.arange(len(raw)), test_size=EVAL_FRACTION, random_state=42)
+    split = np.full(len(raw), "train", dtype=object)
+    split[eval_rows] = "eval"
+    raw["_split"] = split
+    return profile_chunks((raw.iloc[i:i + chunksize].copy() for i in range(0, len(raw), chunksize)), group=group)
+
+
+def write_profile(profile, outdir=Path("outputs")):
+    outdir = Path(outdir)
+    outdir.mkdir(exist_ok=True)
+    profile = profile.with_all_groups()
+    profile.table().to_csv(outdir / "dataset_profile.csv", index=False)
+    groups = profile.groups()
+    groups.to_csv(outdir / "dataset_groups.csv", index=False)
+    drift = profile.drift()
+    drift.to_csv(outdir / "dataset_drift.csv", index=False)
+    print(groups.to_string(index=False))
+    print(drift[drift["group"] == "all"].head(10).to_string(index=False))
+    print(f"Saved dataset profile to {outdir}/dataset_profile.csv, dataset_groups.csv and dataset_drift.csv")
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Adult dataset summary, or a streaming profile with --profile")
+    parser.add_argument("inputs", nargs="*", help="raw or encoded CSV/Parquet files to profile (default: Adult)")
+    parser.add_argument("--profile", action="store_true", help="stream per-group sketches and train/eval drift")
+    parser.add_argument("--eval", nargs="+", default=None, help="evaluation-split files (default: random rows)")
+    parser.add_argument("--group", default="sex", help="group column (raw, or a one-hot column such as sex_Male)")
+    parser.add_argument("--eval-fraction", type=float, default=EVAL_FRACTION)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+    if not args.profile:
+        main()
+    elif args.inputs:
+        write_profile(profile_files(args.inputs, eval_paths=args.eval, group=args.group,
+                                    eval_fraction=args.eval_fraction, seed=args.seed, chunksize=args.chunksize,
+                                    jobs=args.jobs))
+    else:
+        write_profile(profile_adult(group=args.group, chunksize=args.chunksize))
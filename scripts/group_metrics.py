@@ -0,0 +1,155 @@
+"""
+Vectorized per-group confusion counts and the fairness measures derived from them.
+
+Rows are encoded as group_code * 4 + 2 * y_true + y_pred and counted with a single np.bincount, so
+every group's TN/FP/FN/TP (optionally sample-weighted) comes from one linear pass regardless of the
+number of groups. Selection rate, TPR, FPR and SPD/DI/EOD/AOD are all computed from those counts, and
+counts from separate chunks or processes can be merged by adding them.
+"""
+import numpy as np
+import pandas as pd
+
+# Column order of GroupCounts.counts; the index of a cell is 2 * y_true + y_pred
+CELLS = ("tn", "fp", "fn", "tp")
+_CHUNK = 1 << 22
+
+
+def _binary(values, name):
+    values = np.asarray(values)
+    if values.dtype != bool and values.size and (values.min() < 0 or values.max() > 1):
+        raise ValueError(f"{name} must be binary 0/1")
+    return values.astype(np.int64, copy=False)
+
+
+def _ratio(num, den):
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    return np.divide(num, den, out=np.zeros(np.broadcast(num, den).shape), where=den > 0)
+
+
+class GroupCounts:
+    """Confusion counts per group: counts[i] holds (tn, fp, fn, tp) for groups[i]."""
+
+    def __init__(self, groups, counts, name=None):
+        self.groups = list(groups)
+        self.counts = np.asarray(counts, dtype=np.float64).reshape(len(self.groups), len(CELLS))
+        self.name = name
+
+    @classmethod
+    def from_arrays(cls, groups, y_true, y_pred, sample_weight=None):
+        """Count (group, y_true, y_pred[, weight]) rows in one pass. groups may be any hashable labels."""
+        name = getattr(groups, "name", None)
+        if not isinstance(groups, (pd.Series, pd.Index, pd.Categorical)):
+            groups = np.asarray(groups)
+        # Hash-based (linear) encoding; categoricals reuse their existing codes
+        codes, labels = pd.factorize(groups, sort=True)
+        if (codes < 0).any():
+            raise ValueError("groups contains missing values")
+        y_true = np.asarray(y_true)
+        y_pred = np.asarray(y_pred)
+        weights = None if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        n_cells = len(labels) * len(CELLS)
+        total = np.zeros(n_cells)
+        # Bounded temporaries: the combined index is built chunk by chunk
+        for start in range(0, len(codes), _CHUNK):
+            stop = start + _CHUNK
+            idx = codes[start:stop].astype(np.int64) * 4
+            idx += 2 * _binary(y_true[start:stop], "y_true")
+            idx += _binary(y_pred[start:stop], "y_pred")
+            w = None if weights is None else weights[start:stop]
+            total += np.bincount(idx, weights=w, minlength=n_cells)
+        return cls(labels, total, name=name)
+
+    def merge(self, other):
+        """Return the sum of two GroupCounts, aligning groups by label."""
+        known = set(self.groups)
+        groups = list(self.groups) + [g for g in other.groups if g not in known]
+        position = {g: i for i, g in enumerate(groups)}
+        counts = np.zeros((len(groups), len(CELLS)))
+        counts[[position[g] for g in self.groups]] += self.counts
+        counts[[position[g] for g in other.groups]] += other.counts
+        return GroupCounts(groups, counts, name=self.name or other.name)
+
+    __add__ = merge
+
+    def rates(self):
+        return rates_from_counts(self.counts)
+
+    def by_group(self, columns=("selection_rate", "tpr", "fpr")):
+        rates = self.rates()
+        return pd.DataFrame({c: rates[c] for c in columns}, index=pd.Index(self.groups, name=self.name))
+
+    def overall(self, columns=("selection_rate", "tpr", "fpr")):
+        rates = rates_from_counts(self.counts.sum(axis=0))
+        return {c: float(rates[c]) for c in columns}
+
+    def default_groups(self):
+        """Female/Male when present, otherwise the groups with the lowest/highest selection rate."""
+        sr = self.rates()["selection_rate"]
+        unpriv = "Female" if "Female" in self.groups else self.groups[int(np.argmin(sr))]
+        priv = "Male" if "Male" in self.groups else self.groups[int(np.argmax(sr))]
+        return unpriv, priv
+
+    def fairness(self, unprivileged=None, privileged=None):
+        """SPD, DI, EOD and AOD of unprivileged vs privileged, in the layout of the *_fairness.json files."""
+        default_u, default_p = self.default_groups()
+        unpriv = default_u if unprivileged is None else unprivileged
+        priv = default_p if privileged is None else privileged
+        values = fairness_from_counts(self.counts[self.groups.index(unpriv)], self.counts[self.groups.index(priv)])
+        return {
+            "unprivileged_group": unpriv,
+            "privileged_group": priv,
+            **{k: (None if np.isnan(v) else float(v)) for k, v in values.items()},
+        }
+
+
+def rates_from_counts(counts):
+    """Return dict of arrays (count, selection_rate, tpr, fpr, base_rate, accuracy) over the last axis of counts.
+
+    Rates with an empty denominator are 0.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    tn, fp, fn, tp = (counts[..., i] for i in range(len(CELLS)))
+    n = tn + fp + fn + tp
+    return {
+        "count": n,
+        "selection_rate": _ratio(tp + fp, n),
+        "tpr": _ratio(tp, tp + fn),
+        "fpr": _ratio(fp, fp + tn),
+        "base_rate": _ratio(tp + fn, n),
+        "accuracy": _ratio(tp + tn, n),
+    }
+
+
+def fairness_from_counts(unpriv, priv):
+    """SPD/DI/EOD/AOD from (..., 4) count arrays of the two groups; works on stacked replicates too.
+
+    DI is NaN where the privileged selection rate is zero.
+    """
+    u = rates_from_counts(unpriv)
+    p = rates_from_counts(priv)
+    sr_p = np.asarray(p["selection_rate"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        di = np.where(sr_p > 0, u["selection_rate"] / np.where(sr_p > 0, sr_p, 1.0), np.nan)
+    return {
+        "statistical_parity_difference": u["selection_rate"] - p["selection_rate"],
+        "disparate_impact": di,
+        "equal_opportunity_difference": u["tpr"] - p["tpr"],
+        "average_odds_difference": 0.5 * ((u["fpr"] - p["fpr"]) + (u["tpr"] - p["tpr"])),
+    }
+
+
+def label_fairness_from_counts(unpriv, priv):
+    """AIF360's layout: SPD/DI on true-label base rates (dataset metric), EOD/AOD on predictions."""
+    u = rates_from_counts(unpriv)
+    p = rates_from_counts(priv)
+    base_p = np.asarray(p["base_rate"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        di = np.where(base_p > 0, u["base_rate"] / np.where(base_p > 0, base_p, 1.0), np.nan)
+    predicted = fairness_from_counts(unpriv, priv)
+    return {
+        "disparate_impact": di,
+        "statistical_parity_difference": u["base_rate"] - p["base_rate"],
+        "equal_opportunity_difference": predicted["equal_opportunity_difference"],
+        "average_odds_difference": predicted["average_odds_difference"],
+    }
@@ -1,19 +1,67 @@
 """
 Simple loader/preprocessor for the UCI Adult dataset using sklearn's fetch_openml.
 Outputs a DataFrame with a binary label column 'income_binary' (0/1) and example protected attribute 'sex'.
+
+The encoded result is cached on disk under cache/adult/<key>/ as plain .npy arrays (one column-major
+feature matrix, the label, and the raw sensitive attributes as categorical codes). The key is a hash of
+the dataset version, the preprocessing options and sample_frac, so changing any of them rebuilds the
+cache, while warm loads memory-map the arrays instead of re-fetching and re-encoding. Delete cache/ (or
+pass refresh=True to load_adult_arrays) to force a rebuild.
+
+With sparse=True the features are instead one-hot encoded by a fitted sklearn encoder into a CSR matrix
+(stored as its data/indices/indptr arrays) and the encoder is cached next to it, so new raw data can be
+encoded with the same column layout.
 """
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import NamedTuple
+
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.datasets import fetch_openml
 
+from scripts.profiling import span
 
-def load_adult(as_frame=True, sample_frac=None):
-    """Return a preprocessed pandas DataFrame for the Adult dataset.
+# scipy.sparse and sklearn are imported where they are used: a warm dense cache load needs neither,
+# which keeps the start-up of the evaluation scripts short
 
-    Returns:
-        pd.DataFrame with features and 'income_binary' column (1 if >50K, else 0)
-    """
-    data = fetch_openml("adult", version=2, as_frame=as_frame)
-    df = data.frame.copy()
+DATASET_NAME = "adult"
+DATASET_VERSION = 2
+LABEL = "income_binary"
+# Raw (pre-encoding) attributes kept alongside the encoded matrix for group analyses
+SENSITIVE = ("sex", "race")
+
+CACHE_DIR = Path("cache") / DATASET_NAME
+# Bump whenever encode_adult/make_encoder or the on-disk layout changes so existing caches are rebuilt
+CACHE_FORMAT = 2
+
+
+class AdultArrays(NamedTuple):
+    X: np.ndarray  # (rows, features) float64, column-major, memory-mapped (CSR matrix when sparse)
+    y: np.ndarray  # (rows,) int64 label
+    feature_names: list
+    sensitive: dict  # raw attribute name -> pd.Categorical
+    key: str  # cache key identifying this exact encoded dataset
+    encoder: object = None  # fitted ColumnTransformer for the sparse encoding
+
+
+def _fetch_raw():
+    from sklearn.datasets import fetch_openml
+
+    data = fetch_openml(DATASET_NAME, version=DATASET_VERSION, as_frame=True)
+    return data.frame.copy()
+
+
+def load_raw():
+    """The raw Adult frame (OpenML column names and categories), as fetched before encode_adult; not cached."""
+    return _fetch_raw()
+
+
+def encode_adult(df, drop_first=True):
+    """Encode a raw Adult frame (OpenML column names) into the numeric frame used by the scripts."""
     # Standardize column names and target
     df = df.rename(columns={"class": "income"})
     # Create binary label
@@ -21,8 +69,172 @@ def load_adult(as_frame=True, sample_frac=None):
     # Keep a simple protected attribute 'sex'
     df["sex"] = df["sex"].str.strip()
     # Quick numeric encoding for simplicity (not for production use)
-    df_numeric = pd.get_dummies(df.drop(columns=["income"]), drop_first=True)
-    return df_numeric
+    return pd.get_dummies(df.drop(columns=["income"]), drop_first=drop_first)
+
+
+def raw_features(df):
+    """Feature columns of a raw Adult frame, cleaned as in encode_adult; the input of make_encoder."""
+    df = df.drop(columns=[c for c in ("class", "income", LABEL) if c in df.columns])
+    if "sex" in df.columns:
+        df["sex"] = df["sex"].astype(str).str.strip()
+    return df
+
+
+def make_encoder(features, drop_first=True):
+    """Unfitted sparse encoder: one-hot for categorical columns, numeric columns passed through."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder
+
+    categorical = [c for c in features.columns if not pd.api.types.is_numeric_dtype(features[c])]
+    onehot = OneHotEncoder(drop="first" if drop_first else None, handle_unknown="ignore", sparse_output=True)
+    return ColumnTransformer([("onehot", onehot, categorical)], remainder="passthrough", sparse_threshold=1.0,
+                             verbose_feature_names_out=False)
+
+
+def cache_key(sample_frac=None, drop_first=True, random_state=0, sparse=False):
+    """Return the cache key for the given dataset version and preprocessing options."""
+    spec = {
+        "dataset": DATASET_NAME,
+        "version": DATASET_VERSION,
+        "format": CACHE_FORMAT,
+        "drop_first": drop_first,
+        "sample_frac": sample_frac,
+        "random_state": random_state,
+        "sparse": sparse,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _build(raw, path, sample_frac, drop_first, random_state, sparse=False):
+    raw = raw.reset_index(drop=True)
+    tmp = path.parent / f".{path.name}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    if sparse:
+        from scipy import sparse as sp
+
+        y = (raw["class"].astype(str).str.strip() == ">50K").astype(np.int64)
+        # Fit on all rows so sampling does not change the column layout
+        encoder = make_encoder(raw_features(raw), drop_first=drop_first)
+        X = sp.csr_matrix(encoder.fit_transform(raw_features(raw)), dtype=np.float64)
+        rows = np.arange(len(raw))
+        if sample_frac is not None:
+            rows = raw.sample(frac=sample_frac, random_state=random_state).index.to_numpy()
+            X = X[rows]
+        features = list(encoder.get_feature_names_out())
+        X.sort_indices()
+        for part in ("data", "indices", "indptr"):
+            np.save(tmp / f"X_{part}.npy", getattr(X, part))
+        np.save(tmp / "y.npy", y.to_numpy()[rows])
+        joblib.dump(encoder, tmp / "encoder.joblib")
+    else:
+        df = encode_adult(raw, drop_first=drop_first)
+        if sample_frac is not None:
+            # Sample after encoding so the column layout matches the full dataset
+            df = df.sample(frac=sample_frac, random_state=random_state)
+        rows = df.index.to_numpy()
+        features = [c for c in df.columns if c != LABEL]
+        # Column-major so each feature is a contiguous column on disk
+        np.save(tmp / "X.npy", np.asfortranarray(df[features].to_numpy(dtype=np.float64)))
+        np.save(tmp / "y.npy", df[LABEL].to_numpy(dtype=np.int64))
+    categories = {}
+    for name in SENSITIVE:
+        if name not in raw.columns:
+            continue
+        col = pd.Categorical(raw[name].astype(str).str.strip())
+        np.save(tmp / f"sensitive_{name}.npy", col.codes[rows])
+        categories[name] = list(col.categories)
+    meta = {
+        "format": CACHE_FORMAT,
+        "dataset": DATASET_NAME,
+        "version": DATASET_VERSION,
+        "rows": int(len(rows)),
+        "sparse": sparse,
+        "features": features,
+        "sensitive": categories,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+    shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        # Another process finished the same build first; its arrays are identical
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _read(path, key):
+    meta = json.loads((path / "meta.json").read_text())
+    if meta.get("format") != CACHE_FORMAT:
+        raise ValueError(f"stale cache format in {path}")
+    encoder = None
+    if meta.get("sparse"):
+        from scipy import sparse as sp
+
+        parts = [np.load(path / f"X_{part}.npy", mmap_mode="r") for part in ("data", "indices", "indptr")]
+        X = sp.csr_matrix(tuple(parts), shape=(meta["rows"], len(meta["features"])), copy=False)
+        encoder = joblib.load(path / "encoder.joblib")
+    else:
+        X = np.load(path / "X.npy", mmap_mode="r")
+    y = np.load(path / "y.npy", mmap_mode="r")
+    sensitive = {
+        name: pd.Categorical.from_codes(np.load(path / f"sensitive_{name}.npy"), categories=cats)
+        for name, cats in meta["sensitive"].items()
+    }
+    return AdultArrays(X, y, meta["features"], sensitive, key, encoder)
+
+
+def load_adult_arrays(sample_frac=None, drop_first=True, random_state=0, cache_dir=None, refresh=False,
+                      sparse=False):
+    """Return the encoded Adult dataset as AdultArrays, building the on-disk cache if needed.
+
+    sparse=True returns a CSR feature matrix plus the fitted encoder (AdultArrays.encoder).
+    """
+    key = cache_key(sample_frac=sample_frac, drop_first=drop_first, random_state=random_state, sparse=sparse)
+    path = Path(cache_dir or CACHE_DIR) / key
+    with span("load") as record:
+        if not refresh:
+            try:
+                arrays = _read(path, key)
+                record["rows"] = arrays.X.shape[0]
+                return arrays
+            except (OSError, ValueError, KeyError):
+                pass
+        with span("fetch"):
+            raw = _fetch_raw()
+        with span("encode", rows=len(raw)):
+            _build(raw, path, sample_frac, drop_first, random_state, sparse=sparse)
+        arrays = _read(path, key)
+        record["rows"] = arrays.X.shape[0]
+        return arrays
+
+
+def to_frame(arrays):
+    """Wrap AdultArrays in the DataFrame layout returned by load_adult, without copying X."""
+    df = pd.DataFrame(arrays.X, columns=arrays.feature_names, copy=False)
+    df[LABEL] = np.asarray(arrays.y)
+    # Lets downstream caches (e.g. scripts.predictions) key on the dataset without hashing it
+    df.attrs["cache_key"] = arrays.key
+    df.attrs["cache_rows"] = len(df)
+    return df
+
+
+def load_adult(as_frame=True, sample_frac=None, use_cache=True):
+    """Return a preprocessed pandas DataFrame for the Adult dataset.
+
+    Features are float64 (one-hot columns are 0.0/1.0). With as_frame=False the cached
+    AdultArrays are returned instead; use_cache=False always re-fetches and re-encodes.
+
+    Returns:
+        pd.DataFrame with features and 'income_binary' column (1 if >50K, else 0)
+    """
+    if not use_cache:
+        df = encode_adult(_fetch_raw())
+        if sample_frac is not None:
+            df = df.sample(frac=sample_frac, random_state=0).reset_index(drop=True)
+        return df
+    arrays = load_adult_arrays(sample_frac=sample_frac)
+    return to_frame(arrays) if as_frame else arrays
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+"""
+Content-hashed manifests for skipping work whose inputs have not changed.
+
+A manifest records, for one named step, the digests of its inputs (dataset cache key, upstream
+fingerprints, parameters and the source of the code that runs it) and of the artifacts it wrote.
+The step is current when the recorded inputs equal the new ones and every artifact still exists
+with the recorded content; any change to an input, the code or an artifact makes it stale. Manifests
+live in cache/manifests/<name>.json.
+"""
+import ast
+import hashlib
+import importlib.util
+import json
+import pickle
+from pathlib import Path
+
+MANIFEST_DIR = Path("cache") / "manifests"
+_CHUNK = 1 << 20
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def file_digest(path):
+    """Content hash of a file, or None when it does not exist."""
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_CHUNK), b""):
+                h.update(block)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()[:16]
+
+
+def _local_imports(source, package):
+    """Modules of `package` imported by the given source code."""
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            if node.module == package:
+                names.update(f"{package}.{a.name}" for a in node.names)
+            elif node.module.startswith(package + "."):
+                names.add(node.module)
+        elif isinstance(node, ast.Import):
+            names.update(a.name for a in node.names if a.name.startswith(package + "."))
+    return names
+
+
+def _source_path(module):
+    try:
+        spec = importlib.util.find_spec(module)
+    except (ImportError, ValueError):
+        return None
+    origin = getattr(spec, "origin", None)
+    return Path(origin) if origin and origin.endswith(".py") else None
+
+
+def code_digest(module):
+    """Hash of a module's source and, recursively, of the modules of the same package it imports."""
+    package = module.split(".")[0]
+    sources, todo = {}, [module]
+    while todo:
+        name = todo.pop()
+        path = None if name in sources else _source_path(name)
+        if path is None:
+            continue
+        sources[name] = path.read_bytes()
+        todo.extend(_local_imports(sources[name], package))
+    h = hashlib.sha256()
+    for name in sorted(sources):
+        h.update(name.encode())
+        h.update(sources[name])
+    return h.hexdigest()[:16]
+
+
+def value_digest(value):
+    """Digest of a stage parameter: the cache key / content hash for frames, JSON or pickle otherwise."""
+    if hasattr(value, "attrs") and hasattr(value, "columns"):
+        from scripts.predictions import data_key
+
+        return data_key(value)
+    try:
+        return _digest(json.dumps(value, sort_keys=True).encode())
+    except TypeError:
+        return _digest(pickle.dumps(value))
+
+
+def _path(name, directory):
+    return Path(directory or MANIFEST_DIR) / f"{name}.json"
+
+
+def load(name, directory=None):
+    try:
+        return json.loads(_path(name, directory).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(name, inputs, directory=None):
+    """True when the manifest's inputs equal `inputs` and all its artifacts are unchanged on disk."""
+    manifest = load(name, directory)
+    if manifest is None or manifest["inputs"] != inputs:
+        return False
+    return all(file_digest(path) == digest for path, digest in manifest["artifacts"].items())
+
+
+def record(name, inputs, artifacts=(), directory=None):
+    """Write the manifest for a completed step; returns it."""
+    manifest = {"inputs": inputs, "artifacts": {str(p): file_digest(p) for p in artifacts}}
+    manifest["fingerprint"] = _digest(json.dumps(manifest, sort_keys=True).encode())
+    path = _path(name, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def invalidate(name, directory=None):
+    _path(name, directory).unlink(missing_ok=True)
+
+
+def fingerprint(name, directory=None):
+    manifest = load(name, directory)
+    return None if manifest is None else manifest["fingerprint"]
@@ -0,0 +1,300 @@
+"""
+Fairness mitigation for the Adult model with Fairlearn: ExponentiatedGradient and GridSearch reductions
+and ThresholdOptimizer post-processing.
+
+The reductions refit the train_model LogisticRegression many times on reweighted labels. Here every
+refit warm-starts from the coefficients of the previous refit of the same mitigator (starting from the
+unmitigated model), so each inner fit only takes a few solver iterations. GridSearch's Lagrange
+multipliers are independent: the grid is cut into contiguous chunks (neighbouring multipliers give
+similar models, which keeps warm starts effective) fitted in parallel worker processes, and the
+results are assembled into one GridSearch. ExponentiatedGradient's iterations depend on each other, so
+it runs as a single task next to the grid chunks and ThresholdOptimizer. Workers attach to the
+training split in shared memory instead of receiving a pickled copy.
+
+Mitigated models are saved next to models/logreg_adult.joblib, wrapped so the evaluation backends can
+score them like the base model (--model models/logreg_adult_<method>.joblib), and compared on the
+held-out split in outputs/mitigation.csv.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+from scripts.group_metrics import GroupCounts
+from scripts.load_adult import LABEL, load_adult
+from scripts.pipeline import attach_array, share_array
+from scripts.predictions import MODEL_FILE
+from scripts.profiling import span
+
+METHODS = ("expgrad", "gridsearch", "threshold")
+SENSITIVE = "sex_Male"
+# reductions moment class name -> ThresholdOptimizer constraint
+CONSTRAINTS = {"demographic_parity": "DemographicParity", "equalized_odds": "EqualizedOdds"}
+
+
+def model_file(method):
+    return MODEL_FILE.with_name(f"{MODEL_FILE.stem}_{method}.joblib")
+
+
+class WarmStart:
+    """Coefficients of the last fit, shared by every copy of the WarmStartClassifier holding it.
+
+    The reductions clone or deepcopy their estimator for every inner fit, which drops a fitted model's
+    coefficients; copies of this holder are the holder itself, so the warm start survives those copies
+    while staying local to the mitigator it was created for.
+    """
+
+    def __init__(self, coef=None, intercept=None):
+        self.coef = coef
+        self.intercept = intercept
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class WarmStartClassifier(BaseEstimator, ClassifierMixin):
+    """Fits a fresh clone of `estimator` starting from the coefficients held by `warm` (a WarmStart)."""
+
+    def __init__(self, estimator=None, warm=None):
+        self.estimator = estimator
+        self.warm = warm
+
+    def fit(self, X, y, sample_weight=None):
+        est = clone(self.estimator)
+        if self.warm is not None and self.warm.coef is not None:
+            est.set_params(warm_start=True)
+            est.coef_, est.intercept_ = self.warm.coef.copy(), self.warm.intercept.copy()
+        est.fit(X, y, sample_weight=sample_weight)
+        if self.warm is not None:
+            self.warm.coef, self.warm.intercept = est.coef_, est.intercept_
+        self.estimator_ = est
+        self.classes_ = est.classes_
+        return self
+
+    def predict(self, X):
+        return self.estimator_.predict(X)
+
+    def predict_proba(self, X):
+        return self.estimator_.predict_proba(X)
+
+
+class MitigatedModel:
+    """predict/predict_proba on a feature frame for a Fairlearn mitigator, as the backends expect.
+
+    ThresholdOptimizer also needs the sensitive feature at prediction time; it is read from the
+    `sensitive` column of X. Randomized predictions use a fixed random_state so they are reproducible.
+    """
+
+    def __init__(self, mitigator, sensitive=SENSITIVE, random_state=0):
+        self.mitigator = mitigator
+        self.sensitive = sensitive
+        self.random_state = random_state
+
+    def _kwargs(self, X):
+        from fairlearn.postprocessing import ThresholdOptimizer
+
+        if isinstance(self.mitigator, ThresholdOptimizer):
+            return {"sensitive_features": np.asarray(X[self.sensitive])}
+        return {}
+
+    def predict(self, X):
+        if hasattr(self.mitigator, "predict_proba"):
+            return self.mitigator.predict(X)
+        return self.mitigator.predict(X, random_state=self.random_state, **self._kwargs(X))
+
+    def predict_proba(self, X):
+        if hasattr(self.mitigator, "predict_proba"):
+            return self.mitigator.predict_proba(X)
+        # Probability of each label under the randomized classifier (private API; fairlearn is pinned)
+        return self.mitigator._pmf_predict(X, **self._kwargs(X))
+
+
+def _moment(constraint):
+    from fairlearn import reductions
+
+    return getattr(reductions, CONSTRAINTS[constraint])()
+
+
+def _warm_estimator(base):
+    warm = WarmStart(base.coef_, base.intercept_)
+    return WarmStartClassifier(LogisticRegression(max_iter=base.max_iter, C=base.C), warm=warm)
+
+
+def _attach(specs):
+    handles, arrays = [], {}
+    for key, spec in specs.items():
+        shm, arrays[key] = attach_array(spec)
+        handles.append(shm)
+    return handles, arrays
+
+
+def _fit(task, arrays, base, constraint, columns, kwargs):
+    X = pd.DataFrame(arrays["X"], columns=columns, copy=False)
+    y, sensitive = arrays["y"], arrays["sensitive"]
+    if task == "gridsearch":
+        from fairlearn.reductions import GridSearch
+
+        gs = GridSearch(_warm_estimator(base), _moment(constraint), grid=kwargs["grid"])
+        gs.fit(X, y, sensitive_features=sensitive)
+        # Only what is needed to assemble the full search; constraints_ holds the training data
+        return {k: getattr(gs, k) for k in ("predictors_", "lambda_vecs_", "objectives_", "gammas_",
+                                            "oracle_execution_times_")}
+    if task == "expgrad":
+        from fairlearn.reductions import ExponentiatedGradient
+
+        eg = ExponentiatedGradient(_warm_estimator(base), _moment(constraint), eps=kwargs["eps"],
+                                   max_iter=kwargs["max_iter"])
+        eg.fit(X, y, sensitive_features=sensitive)
+        # constraints_ references the (shared-memory) training data and is not used for prediction
+        eg.constraints_ = None
+        return eg
+    from fairlearn.postprocessing import ThresholdOptimizer
+
+    to = ThresholdOptimizer(estimator=base, constraints=constraint, prefit=True, predict_method="predict_proba")
+    return to.fit(X, y, sensitive_features=sensitive)
+
+
+def _run(task, specs, base, constraint, columns, kwargs):
+    """One worker task on the shared training split: a GridSearch chunk, ExponentiatedGradient or ThresholdOptimizer."""
+    handles, arrays = _attach(specs)
+    try:
+        start = time.perf_counter()
+        with span(task, rows=specs["y"]["shape"][0]):
+            result = _fit(task, arrays, base, constraint, columns, kwargs)
+        return result, time.perf_counter() - start
+    finally:
+        del arrays
+        for shm in handles:
+            shm.close()
+
+
+def _grid(X, y, sensitive, constraint, grid_size, grid_limit):
+    """The multipliers GridSearch(grid_size, grid_limit) generates, read from a search over a constant model."""
+    from fairlearn.reductions import GridSearch
+    from sklearn.dummy import DummyClassifier
+
+    gs = GridSearch(DummyClassifier(), _moment(constraint), grid_size=grid_size, grid_limit=grid_limit)
+    return gs.fit(X, y, sensitive_features=sensitive).lambda_vecs_
+
+
+def _assemble(chunks, grid, constraint, constraint_weight=0.5):
+    """A fitted GridSearch over the full grid from the chunk results, selecting the best as GridSearch does."""
+    from fairlearn.reductions import GridSearch
+
+    gs = GridSearch(None, _moment(constraint), constraint_weight=constraint_weight, grid=grid)
+    gs.predictors_ = [p for c in chunks for p in c["predictors_"]]
+    gs.objectives_ = [o for c in chunks for o in c["objectives_"]]
+    gs.oracle_execution_times_ = [t for c in chunks for t in c["oracle_execution_times_"]]
+    gs.lambda_vecs_ = pd.concat([c["lambda_vecs_"] for c in chunks], axis=1)
+    gs.gammas_ = pd.concat([c["gammas_"] for c in chunks], axis=1)
+    losses = [gs.objective_weight * o + gs.constraint_weight * gs.gammas_.iloc[:, i].max()
+              for i, o in enumerate(gs.objectives_)]
+    gs.best_idx_ = int(np.argmin(losses))
+    return gs
+
+
+def mitigate(df=None, methods=METHODS, constraint="demographic_parity", grid_size=20, grid_limit=2.0, eps=0.01,
+             max_iter=50, jobs=None, out_path=Path("outputs") / "mitigation.csv"):
+    """Fit the mitigators, save each to models/logreg_adult_<method>.joblib and compare them on the test split."""
+    if constraint not in CONSTRAINTS:
+        raise ValueError(f"constraint must be one of {list(CONSTRAINTS)}")
+    if df is None:
+        df = load_adult()
+    X = df.drop(columns=[LABEL])
+    y = df[LABEL].to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    if MODEL_FILE.exists():
+        base = joblib.load(MODEL_FILE)
+    else:
+        from scripts.train_model import train_and_save
+
+        MODEL_FILE.parent.mkdir(exist_ok=True)
+        base = train_and_save(df)
+    s_train = X_train[SENSITIVE].to_numpy()
+
+    tasks = []
+    if "gridsearch" in methods:
+        grid = _grid(X_train, y_train, s_train, constraint, grid_size, grid_limit)
+        # Contiguous chunks of the multiplier path, one per worker
+        n_chunks = max(1, min(jobs or os.cpu_count() or 1, grid.shape[1]))
+        tasks += [("gridsearch", {"grid": grid[cols]}) for cols in np.array_split(grid.columns, n_chunks)]
+    if "expgrad" in methods:
+        tasks.append(("expgrad", {"eps": eps, "max_iter": max_iter}))
+    if "threshold" in methods:
+        tasks.append(("threshold", {}))
+
+    handles, specs = [], {}
+    try:
+        for key, arr in (("X", X_train.to_numpy(dtype=np.float64)), ("y", y_train), ("sensitive", s_train)):
+            shm, specs[key] = share_array(arr)
+            handles.append(shm)
+        args = (specs, base, constraint, list(X.columns))
+        if jobs == 1:
+            results = [_run(task, *args, kwargs) for task, kwargs in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = [pool.submit(_run, task, *args, kwargs) for task, kwargs in tasks]
+                results = [f.result() for f in futures]
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+    fitted, seconds = {}, {}
+    for (task, _), (result, elapsed) in zip(tasks, results):
+        fitted.setdefault(task, []).append(result)
+        # Chunks run side by side: the slowest one is the wall time
+        seconds[task] = max(seconds.get(task, 0.0), elapsed)
+    if "gridsearch" in fitted:
+        fitted["gridsearch"] = [_assemble(fitted["gridsearch"], grid, constraint)]
+
+    groups = np.where(X_test[SENSITIVE] > 0, "Male", "Female")
+    records = [_evaluate("baseline", base, X_test, y_test, groups, MODEL_FILE, 0.0)]
+    for method in (m for m in METHODS if m in fitted):
+        model = MitigatedModel(fitted[method][0])
+        path = model_file(method)
+        joblib.dump(model, path)
+        print(f"Saved {method} model to {path}")
+        records.append(_evaluate(method, model, X_test, y_test, groups, path, seconds[method]))
+    table = pd.DataFrame(records)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(exist_ok=True)
+    table.to_csv(out_path, index=False)
+    print(table.round(4).to_string(index=False))
+    print(f"Mitigation results saved to {out_path}")
+    return table
+
+
+def _evaluate(method, model, X, y, groups, path, fit_seconds):
+    preds = np.asarray(model.predict(X)).astype(int)
+    fairness = GroupCounts.from_arrays(groups, y, preds).fairness("Female", "Male")
+    return {"method": method, "model": str(path), "accuracy": float((preds == y).mean()),
+            "fit_seconds": fit_seconds, **{k: v for k, v in fairness.items() if not k.endswith("_group")}}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    # Saved models must reference scripts.mitigate.MitigatedModel, not __main__.MitigatedModel
+    from scripts import mitigate as module
+
+    parser = argparse.ArgumentParser(description="Fairness mitigation of the Adult model with Fairlearn")
+    parser.add_argument("--methods", default=",".join(METHODS), help=f"comma-separated subset of {','.join(METHODS)}")
+    parser.add_argument("--constraint", choices=list(CONSTRAINTS), default="demographic_parity")
+    parser.add_argument("--grid-size", type=int, default=20, help="GridSearch Lagrange multipliers")
+    parser.add_argument("--eps", type=float, default=0.01, help="ExponentiatedGradient constraint slack")
+    parser.add_argument("--max-iter", type=int, default=50, help="ExponentiatedGradient iterations")
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+    module.mitigate(methods=args.methods.split(","), constraint=args.constraint, grid_size=args.grid_size, eps=args.eps,
+                    max_iter=args.max_iter, jobs=args.jobs)
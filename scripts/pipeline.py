@@ -0,0 +1,238 @@
+"""
+Minimal in-process DAG runner for the fairness pipeline.
+
+Stages declare their dependencies; stages marked parallel run in a process pool as soon as their
+dependencies finish, others run in the parent process. The encoded dataset is placed in shared memory
+once and every worker attaches to it instead of receiving a pickled copy. A failing stage is reported
+with its captured output, its dependents are skipped, and the run exits non-zero at the end.
+
+With a manifest directory each finished stage records a manifest (scripts.manifest) of its inputs: the
+stage's code, its parameters (the dataset by cache key), the fingerprints of the stages it depends on,
+and the content hashes of the artifacts it wrote. On the next run a stage whose manifest still matches is
+skipped; a dependent is only rerun when an upstream artifact actually changed.
+"""
+import contextlib
+import importlib
+import io
+import sys
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from scripts import manifest
+from scripts.profiling import span
+
+
+class Stage(NamedTuple):
+    target: str  # "package.module:function"; called as function(**inputs)
+    deps: tuple = ()
+    parallel: bool = False
+    # Names from the shared context to pass as keyword arguments ("df", "model", ...)
+    inputs: tuple = ()
+    # Context name to store the stage's return value under (serial stages only)
+    output: str = None
+    # Files the stage writes; their hashes make up its fingerprint for dependents
+    artifacts: tuple = ()
+    # "module:function" returning the stage's output when the stage is skipped as unchanged
+    restore: str = None
+    # False for stages that read more than their declared inputs and decide for themselves whether to rerun
+    memoize: bool = True
+
+
+def share_array(arr):
+    """Copy arr into a new shared memory block; return (handle, spec) where spec is picklable."""
+    arr = np.asarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    order = "F" if arr.flags.f_contiguous and not arr.flags.c_contiguous else "C"
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, order=order)
+    view[...] = arr
+    return shm, {"name": shm.name, "shape": arr.shape, "dtype": arr.dtype.str, "order": order}
+
+
+def attach_array(spec):
+    """Attach to an array created by share_array; keep the returned handle alive while using it."""
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    arr = np.ndarray(spec["shape"], dtype=spec["dtype"], buffer=shm.buf, order=spec["order"])
+    arr.flags.writeable = False
+    return shm, arr
+
+
+class SharedFrame:
+    """A numeric DataFrame split into a shared feature matrix and a shared label column."""
+
+    def __init__(self, df, label):
+        features = [c for c in df.columns if c != label]
+        self._handles = []
+        self.spec = {"columns": features, "label": label, "attrs": dict(df.attrs), "arrays": {}}
+        X = df[features].to_numpy(dtype=np.float64, copy=False)
+        for key, values in (("X", X), ("y", df[label].to_numpy())):
+            shm, spec = share_array(values)
+            self._handles.append(shm)
+            self.spec["arrays"][key] = spec
+
+    def close(self):
+        for shm in self._handles:
+            shm.close()
+            shm.unlink()
+        self._handles = []
+
+
+@contextlib.contextmanager
+def attach_frame(spec):
+    shm_x, X = attach_array(spec["arrays"]["X"])
+    shm_y, y = attach_array(spec["arrays"]["y"])
+    try:
+        df = pd.DataFrame(X, columns=spec["columns"], copy=False)
+        df[spec["label"]] = y
+        df.attrs.update(spec["attrs"])
+        yield df
+    finally:
+        del X, y
+        shm_x.close()
+        shm_y.close()
+
+
+def _resolve(target):
+    module, func = target.split(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def _call(target, kwargs, name=None):
+    """Run a stage, capturing its output. Returns (ok, result, stdout, stderr)."""
+    out, err = io.StringIO(), io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err), span(name or target):
+            result = _resolve(target)(**kwargs)
+        return True, result, out.getvalue(), err.getvalue()
+    except BaseException:
+        err.write(traceback.format_exc())
+        return False, None, out.getvalue(), err.getvalue()
+
+
+def _call_in_worker(target, kwargs, frame_spec, name=None):
+    if frame_spec is None:
+        ok, _, out, err = _call(target, kwargs, name)
+        return ok, out, err
+    with attach_frame(frame_spec) as df:
+        ok, _, out, err = _call(target, {**kwargs, "df": df}, name)
+    return ok, out, err
+
+
+def _report(name, ok, out, err):
+    if ok:
+        return
+    print(out)
+    print(err, file=sys.stderr)
+    print(f"Stage '{name}' failed", file=sys.stderr)
+
+
+def _stage_inputs(stage, stages, kwargs, fingerprints):
+    # Values produced by dependencies are covered by the dependencies' fingerprints
+    from_deps = {stages[d].output for d in stage.deps}
+    return {
+        "code": manifest.code_digest(stage.target.split(":")[0]),
+        "params": {k: manifest.value_digest(v) for k, v in sorted(kwargs.items()) if k not in from_deps},
+        "deps": {d: fingerprints.get(d) for d in stage.deps},
+    }
+
+
+def run_pipeline(stages, context=None, max_workers=None, label="income_binary", manifest_dir=None, force=False):
+    """Run stages in dependency order. Returns the set of stage names that failed or were skipped.
+
+    With manifest_dir, stages whose recorded inputs and artifacts are unchanged are not rerun
+    (unless force); their dependents see the same fingerprint as before.
+    """
+    context = dict(context or {})
+    pending = dict(stages)
+    for name, stage in pending.items():
+        missing = [d for d in stage.deps if d not in stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+
+    done, failed = set(), set()
+    shared = None
+    running = {}
+    fingerprints, stage_inputs = {}, {}
+
+    def finish(name, ok):
+        if manifest_dir is None:
+            return
+        if ok:
+            fingerprints[name] = manifest.record(name, stage_inputs[name], stages[name].artifacts,
+                                                 manifest_dir)["fingerprint"]
+        else:
+            manifest.invalidate(name, manifest_dir)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            while pending or running:
+                # Skip stages whose dependencies failed, transitively
+                changed = True
+                while changed:
+                    changed = False
+                    for name, stage in list(pending.items()):
+                        if any(d in failed for d in stage.deps):
+                            print(f"-> {name} (skipped: dependency failed)")
+                            failed.add(name)
+                            del pending[name]
+                            changed = True
+                ready = [n for n, s in pending.items() if all(d in done for d in s.deps)]
+                for name in ready:
+                    stage = pending.pop(name)
+                    kwargs = {k: context[k] for k in stage.inputs}
+                    if manifest_dir is not None:
+                        stage_inputs[name] = _stage_inputs(stage, stages, kwargs, fingerprints)
+                        if not force and stage.memoize and manifest.is_current(name, stage_inputs[name],
+                                                                               manifest_dir):
+                            if stage.output is None or stage.restore is not None:
+                                print(f"-> {name} (unchanged, skipped)")
+                                if stage.output:
+                                    context[stage.output] = _resolve(stage.restore)()
+                                fingerprints[name] = manifest.fingerprint(name, manifest_dir)
+                                done.add(name)
+                                continue
+                    print("->", name)
+                    if stage.parallel:
+                        spec = None
+                        if "df" in kwargs:
+                            # Workers get the frame through shared memory, never pickled
+                            if shared is None:
+                                shared = SharedFrame(kwargs["df"], label)
+                            spec = shared.spec
+                            del kwargs["df"]
+                        running[pool.submit(_call_in_worker, stage.target, kwargs, spec, name)] = name
+                        continue
+                    ok, result, out, err = _call(stage.target, kwargs, name)
+                    _report(name, ok, out, err)
+                    finish(name, ok)
+                    if ok:
+                        done.add(name)
+                        if stage.output:
+                            context[stage.output] = result
+                    else:
+                        failed.add(name)
+                if ready:
+                    continue
+                if not running:
+                    if pending:
+                        # Nothing runnable and nothing in flight: remaining stages wait on each other
+                        raise ValueError(f"Dependency cycle among stages: {sorted(pending)}")
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    name = running.pop(fut)
+                    try:
+                        ok, out, err = fut.result()
+                    except Exception:
+                        ok, out, err = False, "", traceback.format_exc()
+                    _report(name, ok, out, err)
+                    finish(name, ok)
+                    (done if ok else failed).add(name)
+        finally:
+            if shared is not None:
+                shared.close()
+    return failed
@@ -0,0 +1,160 @@
+"""
+Content-addressed store of model predictions shared by the evaluation backends.
+
+Scores and hard labels are saved under cache/predictions/<model_hash>-<data_hash>/ as .npy files and
+memory-mapped on later reads, so the Fairlearn, AIF360 and Google-local scripts all read the same
+prediction vector and the model is only loaded and run once per (model file, dataset) pair. Linear models
+are scored with scripts.scoring.LinearScorer rather than predict_proba on the whole frame.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scripts import scoring
+from scripts.load_adult import LABEL, cache_key, load_adult_arrays
+from scripts.profiling import span
+
+MODEL_FILE = Path("models") / "logreg_adult.joblib"
+# Model trained on the sparse (CSR) encoding from load_adult_arrays(sparse=True)
+SPARSE_MODEL_FILE = Path("models") / "logreg_adult_sparse.joblib"
+STORE_DIR = Path("cache") / "predictions"
+_CHUNK = 1 << 20
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def array_hash(X):
+    """Hash the contents of a feature matrix (DataFrame or array), column by column."""
+    h = hashlib.sha256()
+    columns = list(getattr(X, "columns", []))
+    h.update(json.dumps([str(c) for c in columns]).encode())
+    values = X.to_numpy() if hasattr(X, "to_numpy") else np.asarray(X)
+    h.update(str((values.shape, values.dtype.str)).encode())
+    # Hash one column at a time so large column-major matrices are read sequentially
+    for j in range(values.shape[1] if values.ndim == 2 else 1):
+        col = values[:, j] if values.ndim == 2 else values
+        h.update(np.ascontiguousarray(col).tobytes())
+    return h.hexdigest()[:16]
+
+
+def data_key(X):
+    """Dataset key: the load_adult cache key when the frame is all of the cached rows, else a content hash.
+
+    attrs survive iloc, drop and sample, so the cache key is only trusted for a frame with every cached
+    row in the original order (a default RangeIndex of the cached length).
+    """
+    attrs = getattr(X, "attrs", {})
+    index = getattr(X, "index", None)
+    if (attrs.get("cache_key") and isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1
+            and len(index) == attrs.get("cache_rows")):
+        return attrs["cache_key"]
+    return array_hash(X)
+
+
+def model_key(model=None, model_path=MODEL_FILE):
+    """Model hash: of the given model, else of the file at model_path.
+
+    A model is hashed by its joblib serialization, which is the file's content when it was saved with
+    joblib.dump, so a model and the file it was saved to share stored predictions.
+    """
+    if model is not None:
+        buffer = io.BytesIO()
+        joblib.dump(model, buffer)
+        return hashlib.sha256(buffer.getvalue()).hexdigest()[:16]
+    if model_path is None or not Path(model_path).exists():
+        raise FileNotFoundError(f"No model at {model_path}")
+    return file_hash(model_path)
+
+
+def score_model(model, X):
+    """(scores, labels) for X: LinearScorer for linear models, the model's own methods otherwise."""
+    if scoring.supports(model):
+        # float64 so stored scores equal predict_proba up to summation order
+        scores = np.empty(X.shape[0], dtype=np.float64)
+        return scoring.LinearScorer.from_model(model).score(X, out=scores, dtype=np.float64)
+    if hasattr(model, "predict_proba"):
+        scores = np.asarray(model.predict_proba(X))[:, 1]
+    else:
+        scores = np.asarray(model.decision_function(X))
+    return scores, np.asarray(model.predict(X))
+
+
+def stored_predictions(model_hash, key, store_dir=None):
+    """Memory-mapped (scores, labels) stored for a model hash and dataset key, or None."""
+    path = Path(store_dir or STORE_DIR) / f"{model_hash}-{key}"
+    try:
+        return np.load(path / "scores.npy", mmap_mode="r"), np.load(path / "labels.npy", mmap_mode="r")
+    except OSError:
+        return None
+
+
+def get_predictions(X, model=None, model_path=MODEL_FILE, key=None, store_dir=None, model_hash=None):
+    """Return (scores, labels) for X, computing and persisting them on first use.
+
+    scores are positive-class probabilities (or decision_function values for models without
+    predict_proba); labels are model.predict(X). The model is loaded from model_path only when
+    the predictions are not stored yet. model_hash overrides model_key, e.g. with the hash of the
+    file an in-memory model was loaded from.
+    """
+    key = key or data_key(X)
+    model_hash = model_hash or model_key(model, model_path)
+    stored = stored_predictions(model_hash, key, store_dir)
+    if stored is not None:
+        return stored
+    path = Path(store_dir or STORE_DIR) / f"{model_hash}-{key}"
+
+    with span("predict", rows=X.shape[0]):
+        if model is None:
+            model = joblib.load(model_path)
+        scores, labels = score_model(model, X)
+        scores, labels = scores.astype(np.float64, copy=False), labels.astype(np.int64, copy=False)
+
+    tmp = path.parent / f".{path.name}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    np.save(tmp / "scores.npy", scores)
+    np.save(tmp / "labels.npy", labels)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        # Another backend stored the same predictions first
+        shutil.rmtree(tmp, ignore_errors=True)
+    return np.load(path / "scores.npy", mmap_mode="r"), np.load(path / "labels.npy", mmap_mode="r")
+
+
+def run_keys(X=None, model=None, model_path=MODEL_FILE, sparse=False):
+    """(model hash, dataset key) identifying an evaluation in scripts.run_history."""
+    if sparse:
+        return model_key(model, SPARSE_MODEL_FILE), cache_key(sparse=True)
+    return model_key(model, model_path), data_key(X)
+
+
+def store_predictions(df, model=None, label="income_binary"):
+    """Pipeline stage: precompute predictions for df once so parallel backends only read them."""
+    X = df.drop(columns=[label]) if label in df.columns else df
+    scores, _ = get_predictions(X, model)
+    print(f"Stored predictions for {len(scores)} rows")
+
+
+def sparse_inputs(model=None, attribute="sex"):
+    """(y, scores, labels, sensitive) for the CSR encoding and the model from train_model --sparse.
+
+    The sensitive column is the raw attribute stored next to the encoded matrix, not a one-hot column.
+    """
+    data = load_adult_arrays(sparse=True)
+    scores, labels = get_predictions(data.X, model, model_path=SPARSE_MODEL_FILE, key=data.key)
+    y = pd.Series(np.asarray(data.y), name=LABEL)
+    return y, scores, labels, pd.Series(np.asarray(data.sensitive[attribute]), name=attribute)
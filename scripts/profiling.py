@@ -0,0 +1,154 @@
+"""
+Lightweight per-stage instrumentation.
+
+Scripts wrap their stages and major sub-steps in `span(name, rows=...)`. When profiling is enabled
+(FAIRNESS_PROFILE=1 in the environment, or enable()) each span records wall time, CPU time (including
+finished child processes), the process peak RSS and rows processed, and appends one JSON line to
+outputs/profile_spans.jsonl, so pipeline workers and `python -m` subprocesses all report to the same
+file. Nested spans are named parent/child, across processes too when a subprocess is started with
+child_env(). write_profile() folds the lines into outputs/profile.json
+with per-span totals (calls, seconds, rows/sec), which aggregate_metrics renders in summary.md.
+
+FAIRNESS_PROFILE=cprofile additionally runs cProfile around every top-level span and dumps
+outputs/profile/<name>-<pid>.prof (inspect with `python -m pstats`).
+
+When profiling is off, span() returns a shared no-op context manager and costs one global lookup.
+"""
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+ENV_VAR = "FAIRNESS_PROFILE"
+PARENT_VAR = "FAIRNESS_PROFILE_PARENT"
+OUTDIR = Path("outputs")
+SPANS_FILE = OUTDIR / "profile_spans.jsonl"
+PROFILE_FILE = OUTDIR / "profile.json"
+CPROFILE_DIR = OUTDIR / "profile"
+
+_MODE = os.environ.get(ENV_VAR, "").strip().lower()
+_ENABLED = _MODE not in ("", "0", "false", "no")
+_NULL = contextlib.nullcontext({})
+_stack = [p for p in os.environ.get(PARENT_VAR, "").split("/") if p]
+_BASE_DEPTH = len(_stack)
+
+
+def enabled():
+    return _ENABLED
+
+
+def enable(cprofile=False):
+    """Turn profiling on for this process and, through the environment, for processes it starts."""
+    global _ENABLED, _MODE
+    _MODE = "cprofile" if cprofile else "1"
+    _ENABLED = True
+    os.environ[ENV_VAR] = _MODE
+
+
+def child_env():
+    """Environment for a subprocess whose spans should nest under this process's current span."""
+    return {**os.environ, PARENT_VAR: "/".join(_stack)}
+
+
+def reset():
+    """Drop spans recorded by earlier runs."""
+    for path in (SPANS_FILE, PROFILE_FILE):
+        path.unlink(missing_ok=True)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+
+def _cpu_seconds():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+@contextlib.contextmanager
+def _span(name, rows):
+    full = "/".join(_stack + [name])
+    record = {"name": full, "pid": os.getpid(), "rows": rows}
+    profiler = None
+    if _MODE == "cprofile" and len(_stack) == _BASE_DEPTH:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    _stack.append(name)
+    start, cpu = time.perf_counter(), _cpu_seconds()
+    record["start"] = time.time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        # Callers may fill in record["rows"] once the row count is known
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record["wall_seconds"] = time.perf_counter() - start
+        record["cpu_seconds"] = _cpu_seconds() - cpu
+        record["peak_rss_mb"] = peak_rss_mb()
+        _stack.pop()
+        SPANS_FILE.parent.mkdir(exist_ok=True)
+        # One short line per write, so concurrent appends from several processes don't interleave
+        with open(SPANS_FILE, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        if profiler is not None:
+            CPROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(CPROFILE_DIR / f"{full.replace('/', '.')}-{record['pid']}.prof")
+
+
+def span(name, rows=None):
+    """Context manager timing a stage or sub-step; yields a dict whose "rows" may be set inside."""
+    if not _ENABLED:
+        return _NULL
+    return _span(name, rows)
+
+
+def read_spans(path=SPANS_FILE):
+    path = Path(path)
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def summarize(spans):
+    """Totals per span name, in first-seen order: calls, wall/CPU seconds, peak RSS, rows and rows/sec."""
+    totals = {}
+    for s in spans:
+        t = totals.setdefault(s["name"], {"name": s["name"], "calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                          "peak_rss_mb": 0.0, "rows": None})
+        t["calls"] += 1
+        t["wall_seconds"] += s["wall_seconds"]
+        t["cpu_seconds"] += s["cpu_seconds"]
+        t["peak_rss_mb"] = max(t["peak_rss_mb"], s["peak_rss_mb"])
+        if s.get("rows") is not None:
+            t["rows"] = (t["rows"] or 0) + int(s["rows"])
+    for t in totals.values():
+        t["rows_per_second"] = t["rows"] / t["wall_seconds"] if t["rows"] and t["wall_seconds"] > 0 else None
+    return list(totals.values())
+
+
+def write_profile(path=PROFILE_FILE, spans_path=SPANS_FILE):
+    """Fold the recorded spans into outputs/profile.json; returns the written dict (None if nothing recorded)."""
+    spans = read_spans(spans_path)
+    if not spans:
+        return None
+    profile = {"spans": spans, "summary": summarize(spans)}
+    Path(path).write_text(json.dumps(profile, indent=2))
+    return profile
+
+
+if __name__ == "__main__":
+    profile = write_profile()
+    if profile is None:
+        print(f"No spans recorded; run with {ENV_VAR}=1")
+    else:
+        for t in profile["summary"]:
+            print(f"{t['name']:<40} {t['calls']:>5} {t['wall_seconds']:9.3f}s {t['cpu_seconds']:9.3f}s cpu")
+        print(f"Profile saved to {PROFILE_FILE}")
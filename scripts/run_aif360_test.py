@@ -1,38 +1,93 @@
 """
 Run a simple AIF360 fairness check (disparate impact) using the trained model.
-Note: Requires `aif360` package installed in the environment.
+Note: Requires `aif360` package installed in the environment, unless engine="numpy" is used.
+
+The four metrics only depend on the protected attribute, the label and the prediction, so the AIF360
+datasets are built from those columns alone; engine="numpy" computes the same values from
+scripts.group_metrics without AIF360.
 """
 import json
-import joblib
 import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from scripts import run_history
+from scripts.bootstrap import intervals, resample_counts, with_intervals
+from scripts.group_metrics import GroupCounts, label_fairness_from_counts
 from scripts.load_adult import load_adult
+from scripts.predictions import MODEL_FILE, get_predictions, run_keys, sparse_inputs
+from scripts.profiling import span
+
+ENGINES = ("aif360", "numpy")
+
+
+def _aif360_available():
+    # Only checks for the package; importing aif360 itself is slow and only done by aif360_metrics
+    import importlib.util
+
+    return importlib.util.find_spec("aif360") is not None
 
-try:
+
+def aif360_metrics(protected, y, preds, privileged=1, unprivileged=0, prot_name="sex_Male"):
+    """DI/SPD (dataset) and EOD/AOD (classification) from AIF360, built from the protected column and label only."""
     from aif360.datasets import BinaryLabelDataset
     from aif360.metrics import BinaryLabelDatasetMetric, ClassificationMetric
-except Exception as e:
-    BinaryLabelDataset = None
-    BinaryLabelDatasetMetric = None
-
-
-def run_aif360_check():
-    df = load_adult()
-    if "income_binary" not in df.columns:
-        raise RuntimeError("income_binary column required")
-    X = df.drop(columns=["income_binary"])
-    y = df["income_binary"]
-    model = joblib.load("models/logreg_adult.joblib")
-    preds = model.predict(X)
-
-    # Build aif360 dataset
-    if BinaryLabelDataset is None:
-        print("aif360 not available in this environment. Install aif360 to run this script.")
+
+    df_min = pd.DataFrame({prot_name: np.asarray(protected), "income_binary": np.asarray(y)})
+    dataset_true = BinaryLabelDataset(favorable_label=1,
+                                      unfavorable_label=0,
+                                      df=df_min,
+                                      label_names=["income_binary"],
+                                      protected_attribute_names=[prot_name])
+    # Predictions only replace the labels; no second DataFrame is needed
+    dataset_pred = dataset_true.copy()
+    dataset_pred.labels = np.asarray(preds, dtype=np.float64).reshape(-1, 1)
+
+    privileged_groups = [{prot_name: privileged}]
+    unprivileged_groups = [{prot_name: unprivileged}]
+    bl_metric = BinaryLabelDatasetMetric(dataset_true, privileged_groups=privileged_groups,
+                                         unprivileged_groups=unprivileged_groups)
+    cls_metric = ClassificationMetric(dataset_true, dataset_pred, unprivileged_groups=unprivileged_groups,
+                                      privileged_groups=privileged_groups)
+    return {
+        "disparate_impact": bl_metric.disparate_impact(),
+        "statistical_parity_difference": bl_metric.statistical_parity_difference(),
+        "equal_opportunity_difference": cls_metric.equal_opportunity_difference(),
+        "average_odds_difference": cls_metric.average_odds_difference()
+    }
+
+
+def numpy_metrics(protected, y, preds, privileged=1, unprivileged=0, counts=None):
+    """Same values as aif360_metrics from per-group confusion counts (DI is None where AIF360 gives NaN)."""
+    if counts is None:
+        counts = GroupCounts.from_arrays(protected, y, preds)
+    values = label_fairness_from_counts(counts.counts[counts.groups.index(unprivileged)],
+                                        counts.counts[counts.groups.index(privileged)])
+    return {k: (None if np.isnan(v) else float(v)) for k, v in values.items()}
+
+
+def run_aif360_check(df=None, model=None, bootstrap=0, seed=0, jobs=None, sparse=False, engine="aif360",
+                     model_path=MODEL_FILE):
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {list(ENGINES)}")
+    if sparse:
+        y, _, preds, sex = sparse_inputs(model)
+        # The AIF360 datasets only need the protected attribute, not the CSR features
+        X = pd.DataFrame({"sex_Male": (sex == "Male").astype(int)})
+    else:
+        if df is None:
+            df = load_adult()
+        if "income_binary" not in df.columns:
+            raise RuntimeError("income_binary column required")
+        X = df.drop(columns=["income_binary"])
+        y = df["income_binary"]
+        _, preds = get_predictions(X, model, model_path=model_path)
+
+    if engine == "aif360" and not _aif360_available():
+        print("aif360 not available in this environment. Install aif360 or use --engine numpy.")
         return
 
-    # Build BinaryLabelDataset from DataFrame; use 'sex_Male' one-hot as protected attr if present
+    # Use 'sex_Male' one-hot as protected attr if present
     prot_name = "sex_Male" if "sex_Male" in X.columns else ("sex" if "sex" in X.columns else None)
     if prot_name is None:
         # try infer any sex_* column
@@ -43,49 +98,44 @@ def run_aif360_check():
         print("No protected attribute found for AIF360 demo")
         return
 
-    df_all = pd.concat([X, y.rename("income_binary")], axis=1)
-    dataset_true = BinaryLabelDataset(favorable_label=1,
-                                      unfavorable_label=0,
-                                      df=df_all,
-                                      label_names=["income_binary"],
-                                      protected_attribute_names=[prot_name])
-
-    df_pred = df_all.copy()
-    df_pred["income_binary"] = preds
-    dataset_pred = BinaryLabelDataset(favorable_label=1,
-                                      unfavorable_label=0,
-                                      df=df_pred,
-                                      label_names=["income_binary"],
-                                      protected_attribute_names=[prot_name])
-
-    # dataset-level fairness
-    bl_metric = BinaryLabelDatasetMetric(
-        dataset_true,
-        privileged_groups=[{prot_name: 1}] if prot_name.endswith("_Male") else [{prot_name: "Male"}],
-        unprivileged_groups=[{prot_name: 0}] if prot_name.endswith("_Male") else [{prot_name: "Female"}]
-    )
-
-    # classification fairness metrics comparing true vs predicted
-    cls_metric = ClassificationMetric(
-        dataset_true,
-        dataset_pred,
-        unprivileged_groups=[{prot_name: 0}] if prot_name.endswith("_Male") else [{prot_name: "Female"}],
-        privileged_groups=[{prot_name: 1}] if prot_name.endswith("_Male") else [{prot_name: "Male"}],
-    )
-
-    results = {
-        "disparate_impact": bl_metric.disparate_impact(),
-        "statistical_parity_difference": bl_metric.statistical_parity_difference(),
-        "equal_opportunity_difference": cls_metric.equal_opportunity_difference(),
-        "average_odds_difference": cls_metric.average_odds_difference()
-    }
+    protected = X[prot_name]
+    priv = 1 if prot_name.endswith("_Male") else "Male"
+    unpriv = 0 if prot_name.endswith("_Male") else "Female"
+    counts = None
+    with span("metrics", rows=len(y)):
+        if engine == "numpy":
+            counts = GroupCounts.from_arrays(protected, y, preds)
+            results = numpy_metrics(protected, y, preds, priv, unpriv, counts=counts)
+        else:
+            results = aif360_metrics(protected, y, preds, priv, unpriv, prot_name=prot_name)
+    if bootstrap:
+        # Same definitions as above, resampled on (protected, label, prediction) counts
+        if counts is None:
+            counts = GroupCounts.from_arrays(protected, y, preds)
+        replicates = resample_counts(counts.counts, n_resamples=bootstrap, seed=seed, n_jobs=jobs)
+        cis = intervals(replicates, counts.groups, unpriv, priv, metrics=label_fairness_from_counts)
+        results = with_intervals(results, cis, bootstrap)
 
     outdir = Path("outputs")
     outdir.mkdir(exist_ok=True)
-    with open(outdir / "aif360_metrics.json", "w") as f:
+    with span("write"), open(outdir / "aif360_metrics.json", "w") as f:
         json.dump(results, f, indent=2)
     print("AIF360 metrics saved to outputs/aif360_metrics.json")
+    names = {1: "Male", 0: "Female"} if prot_name.endswith("_Male") else {}
+    fairness = {"unprivileged_group": names.get(unpriv, unpriv), "privileged_group": names.get(priv, priv), **results}
+    run_history.record("aif360", *run_keys(None if sparse else X, model, model_path, sparse), fairness=fairness)
 
 
 if __name__ == "__main__":
-    run_aif360_check()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="AIF360 fairness check of models/logreg_adult.joblib")
+    parser.add_argument("--bootstrap", type=int, default=0, help="bootstrap resamples for confidence intervals")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--sparse", action="store_true", help="evaluate the model trained with train_model --sparse")
+    parser.add_argument("--model", default=str(MODEL_FILE), help="model file, e.g. one saved by scripts.mitigate")
+    parser.add_argument("--engine", choices=ENGINES, default="aif360")
+    args = parser.parse_args()
+    run_aif360_check(bootstrap=args.bootstrap, seed=args.seed, jobs=args.jobs, sparse=args.sparse, engine=args.engine,
+                     model_path=args.model)
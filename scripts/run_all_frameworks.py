@@ -1,15 +1,69 @@
 """
 Run all three fairness frameworks (Fairlearn, AIF360, Google-local fallback) end-to-end,
 then regenerate the consolidated comparison summary.
+
+By default the stages run in-process through scripts.pipeline: the dataset is loaded once, the model
+is trained once, the dataset is scored once into the shared prediction store (scripts.predictions),
+and the three independent evaluations run in parallel worker processes. Pass --subprocess for the old one-`python -m`-per-step behaviour.
+With --profile every stage and sub-step is timed (scripts.profiling) into outputs/profile.json.
+
+Stages whose code, data, parameters and upstream artifacts are unchanged since the last run are skipped
+(manifests in cache/manifests/); --force reruns everything.
 """
+import argparse
 import subprocess
 import sys
 from pathlib import Path
 
+from scripts import profiling, run_history
+from scripts.manifest import MANIFEST_DIR
+from scripts.pipeline import Stage, run_pipeline
+
+OUT = "outputs"
+STAGES = {
+    # saves models/logreg_adult.joblib
+    "train": Stage("scripts.train_model:train_and_save", inputs=("df",), output="model",
+                   artifacts=("models/logreg_adult.joblib",), restore="scripts.train_model:load_model"),
+    # scores the dataset once into cache/predictions/ for all backends
+    "predict": Stage("scripts.predictions:store_predictions", deps=("train",), inputs=("df", "model")),
+    # saves outputs/fairlearn_*.csv
+    "fairlearn": Stage("scripts.run_fairlearn_test:run_fairlearn_check", deps=("predict",), parallel=True,
+                       inputs=("df",), artifacts=(f"{OUT}/fairlearn_by_group.csv", f"{OUT}/fairlearn_overall.csv",
+                                                  f"{OUT}/fairlearn_fairness.json")),
+    # saves outputs/aif360_metrics.json
+    "aif360": Stage("scripts.run_aif360_test:run_aif360_check", deps=("predict",), parallel=True,
+                    inputs=("df",), artifacts=(f"{OUT}/aif360_metrics.json",)),
+    # saves outputs/google_local_*.csv (no TFMA deps)
+    "google_local": Stage("scripts.run_google_local_metrics:main", deps=("predict",), parallel=True,
+                          inputs=("df",), artifacts=(f"{OUT}/google_local_by_group.csv",
+                                                     f"{OUT}/google_local_overall.csv",
+                                                     f"{OUT}/google_local_fairness.json",
+                                                     f"{OUT}/google_local_calibration.csv",
+                                                     f"{OUT}/google_local_reliability.csv")),
+    # saves outputs/counterfactual.csv (decisions that change when only sex_Male is flipped)
+    "counterfactual": Stage("scripts.counterfactual:main", deps=("train",), parallel=True, inputs=("df", "model"),
+                            artifacts=(f"{OUT}/counterfactual.csv",)),
+    # writes outputs/summary.md; always called, since it also reads the run history and the outputs of
+    # scripts run outside the pipeline (slices, mitigation, comparison, ...) and checks those itself
+    "aggregate": Stage("scripts.aggregate_metrics:main",
+                       deps=("fairlearn", "aif360", "google_local", "counterfactual"),
+                       artifacts=(f"{OUT}/summary.md",), memoize=False),
+}
+
+SUBPROCESS_MODULES = [
+    "scripts.train_model",
+    "scripts.run_fairlearn_test",
+    "scripts.run_aif360_test",
+    "scripts.run_google_local_metrics",
+    "scripts.counterfactual",
+    "scripts.aggregate_metrics",
+]
+
 
 def run_step(args):
     print("->", " ".join(args))
-    res = subprocess.run(args, capture_output=True, text=True)
+    with profiling.span(args[-1]):
+        res = subprocess.run(args, capture_output=True, text=True, env=profiling.child_env())
     if res.returncode != 0:
         print(res.stdout)
         print(res.stderr, file=sys.stderr)
@@ -17,25 +71,41 @@ def run_step(args):
     return res
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes for parallel stages")
+    parser.add_argument("--subprocess", action="store_true", help="run each stage as a separate python -m process")
+    parser.add_argument("--profile", action="store_true", help="record per-stage timings to outputs/profile.json")
+    parser.add_argument("--cprofile", action="store_true", help="--profile plus cProfile dumps in outputs/profile/")
+    parser.add_argument("--force", action="store_true", help="rerun stages even if their inputs are unchanged")
+    args = parser.parse_args(argv)
+
     # Ensure outputs directory exists
     Path("outputs").mkdir(exist_ok=True)
+    if args.profile or args.cprofile:
+        profiling.enable(cprofile=args.cprofile)
+    if profiling.enabled():
+        profiling.reset()
+    # One run id for every stage, so the run history groups their results
+    print(f"Run {run_history.new_run()}")
+    # Fold earlier runs' files into one per partition before this run appends its own
+    run_history.compact()
 
-    # 1) Train model
-    run_step([sys.executable, "-m", "scripts.train_model"])  # saves models/logreg_adult.joblib
-
-    # 2) Microsoft Fairlearn
-    run_step([sys.executable, "-m", "scripts.run_fairlearn_test"])  # saves outputs/fairlearn_*.csv
-
-    # 3) IBM AIF360
-    run_step([sys.executable, "-m", "scripts.run_aif360_test"])  # saves outputs/aif360_metrics.json
-
-    # 4) Google local fallback (no TFMA deps)
-    run_step([sys.executable, "-m", "scripts.run_google_local_metrics"])  # saves outputs/google_local_*.csv
+    if args.subprocess:
+        for module in SUBPROCESS_MODULES:
+            run_step([sys.executable, "-m", module])
+    else:
+        from scripts.load_adult import load_adult
 
-    # 5) Aggregate comparison summary
-    run_step([sys.executable, "-m", "scripts.aggregate_metrics"])  # writes outputs/comparison/summary_all.md
-    print("All frameworks executed. See outputs/comparison/summary_all.md")
+        # A profiled run measures every stage, so nothing is skipped
+        failed = run_pipeline(STAGES, context={"df": load_adult()}, max_workers=args.jobs, manifest_dir=MANIFEST_DIR,
+                              force=args.force or profiling.enabled())
+        if failed:
+            print(f"Failed stages: {', '.join(sorted(failed))}", file=sys.stderr)
+            raise SystemExit(1)
+    if profiling.enabled() and profiling.write_profile() is not None:
+        print("Stage timings saved to outputs/profile.json")
+    print("All frameworks executed. See outputs/summary.md")
 
 
 if __name__ == "__main__":
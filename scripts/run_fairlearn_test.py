@@ -1,28 +1,35 @@
 """
 Run a simple Fairlearn evaluation using metric_frame.
+With engine="counts" the same outputs are computed from scripts.group_metrics in a single pass.
 """
-import joblib
 import pandas as pd
-from fairlearn.metrics import MetricFrame, selection_rate, true_positive_rate, false_positive_rate
 from pathlib import Path
 
+from scripts import run_history
+from scripts.bootstrap import bootstrap_fairness
+from scripts.group_metrics import GroupCounts
 from scripts.load_adult import load_adult
+from scripts.predictions import MODEL_FILE, get_predictions, run_keys, sparse_inputs
+from scripts.profiling import span
 
+ENGINES = ("metricframe", "counts")
 
-def run_fairlearn_check():
-    df = load_adult()
+
+def _dense_inputs(df=None, model=None, model_path=MODEL_FILE):
+    if df is None:
+        df = load_adult()
     # features/labels
     X = df.drop(columns=["income_binary"]) if "income_binary" in df.columns else df
     y = df["income_binary"]
-    model = joblib.load("models/logreg_adult.joblib")
-    preds = model.predict(X)
+    # Shared with the other backends; the model is only loaded if predictions aren't stored yet
+    _, preds = get_predictions(X, model, model_path=model_path)
 
     # Choose a simple sensitive feature if available
     sensitive = None
     if "sex_Male" in X.columns:
         s = X["sex_Male"]
         # Map boolean or 0/1 encoding to human-readable labels
-        if s.dtype == bool or set(s.dropna().unique()).issubset({True, False}):
+        if s.dtype == bool:
             sensitive = s.map({True: "Male", False: "Female"})
         else:
             sensitive = s.map({1: "Male", 0: "Female"})
@@ -35,29 +42,52 @@ def run_fairlearn_check():
             c = sex_cols[0]
             grp = c.split("sex_")[1]
             sensitive = X[c].map({1: grp, 0: f"not_{grp}"})
+    return y, preds, sensitive, X
+
+
+def run_fairlearn_check(df=None, model=None, engine="metricframe", bootstrap=0, seed=0, jobs=None, sparse=False,
+                        model_path=MODEL_FILE):
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {list(ENGINES)}")
+    if sparse:
+        y, _, preds, sensitive = sparse_inputs(model)
+        X = None
+    else:
+        y, preds, sensitive, X = _dense_inputs(df, model, model_path)
 
     if sensitive is None:
         print("No sensitive attribute found for Fairlearn demo")
         return
 
-    mf = MetricFrame(metrics={
-        "selection_rate": selection_rate,
-        "tpr": true_positive_rate,
-        "fpr": false_positive_rate
-    },
-    y_true=y,
-    y_pred=preds,
-    sensitive_features=sensitive)
+    counts = None
+    with span("metrics", rows=len(y)):
+        if engine == "counts":
+            counts = GroupCounts.from_arrays(sensitive, y, preds)
+            by_group, overall = counts.by_group(), counts.overall()
+        else:
+            # Imported here: the counts engine does not need Fairlearn at all
+            from fairlearn.metrics import MetricFrame, selection_rate, true_positive_rate, false_positive_rate
+
+            mf = MetricFrame(metrics={
+                "selection_rate": selection_rate,
+                "tpr": true_positive_rate,
+                "fpr": false_positive_rate
+            },
+            y_true=y,
+            y_pred=preds,
+            sensitive_features=sensitive)
+            by_group, overall = mf.by_group, mf.overall
     # Ensure outputs directory exists and save results
     outdir = Path("outputs")
     outdir.mkdir(exist_ok=True)
-    mf.by_group.to_csv(outdir / "fairlearn_by_group.csv")
-    # overall is a Series of global metrics; save with a value column for clarity
-    pd.Series(mf.overall).to_frame("value").to_csv(outdir / "fairlearn_overall.csv")
+    with span("write"):
+        by_group.to_csv(outdir / "fairlearn_by_group.csv")
+        # overall is a Series of global metrics; save with a value column for clarity
+        pd.Series(overall).to_frame("value").to_csv(outdir / "fairlearn_overall.csv")
     print("By-group metrics saved to outputs/fairlearn_by_group.csv")
     print("Overall metrics saved to outputs/fairlearn_overall.csv")
     # Parse fairness measures: SPD, DI, EOD, AOD
-    by = mf.by_group
+    by = by_group
     try:
         sr = by["selection_rate"]
         tpr = by["tpr"]
@@ -82,10 +112,29 @@ def run_fairlearn_check():
             "equal_opportunity_difference": eod,
             "average_odds_difference": aod,
         }
+        if bootstrap:
+            if counts is None:
+                counts = GroupCounts.from_arrays(sensitive, y, preds)
+            fairness = bootstrap_fairness(counts, fairness, n_resamples=bootstrap, seed=seed, n_jobs=jobs)
         (outdir / "fairlearn_fairness.json").write_text(json.dumps(fairness, indent=2))
         print("Fairlearn fairness saved to outputs/fairlearn_fairness.json")
     except Exception as e:
         print(f"Could not compute Fairlearn fairness measures: {e}")
+        fairness = None
+    run_history.record("fairlearn", *run_keys(X, model, model_path, sparse), by_group=by_group, overall=overall,
+                       fairness=fairness)
+
 
 if __name__ == "__main__":
-    run_fairlearn_check()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fairlearn evaluation of models/logreg_adult.joblib")
+    parser.add_argument("--engine", choices=ENGINES, default="metricframe")
+    parser.add_argument("--bootstrap", type=int, default=0, help="bootstrap resamples for confidence intervals")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--sparse", action="store_true", help="evaluate the model trained with train_model --sparse")
+    parser.add_argument("--model", default=str(MODEL_FILE), help="model file, e.g. one saved by scripts.mitigate")
+    args = parser.parse_args()
+    run_fairlearn_check(engine=args.engine, bootstrap=args.bootstrap, seed=args.seed, jobs=args.jobs,
+                        sparse=args.sparse, model_path=args.model)
@@ -2,104 +2,149 @@
 Local fallback for Google fairness metrics (no TFMA/WIT deps).
 Computes selection rate, TPR, FPR by group (sex) and overall.
 This is provided to compare with Fairlearn and AIF360 when TFMA isn't runnable locally.
+With sweep=True it also writes fairness metrics at every threshold (scripts.threshold_sweep).
+Per-group calibration of the predicted probabilities (scripts.calibration) is written next to them, and
+its between-group differences are added to the fairness measures.
 """
 from pathlib import Path
 import json
 import numpy as np
 import pandas as pd
-import joblib
 
+from scripts import run_history
+from scripts.bootstrap import bootstrap_fairness
+from scripts.calibration import N_BINS, CalibrationCounts
+from scripts.group_metrics import GroupCounts
 from scripts.load_adult import load_adult
+from scripts.predictions import MODEL_FILE, get_predictions, run_keys, sparse_inputs
+from scripts.profiling import span
+from scripts.threshold_sweep import ThresholdSweep
 
 
-def _rates(y_true, y_pred):
-    y_true = np.asarray(y_true)
-    y_pred = np.asarray(y_pred)
-    pos = y_pred == 1
-    neg = y_pred == 0
-    tp = int(np.sum((y_true == 1) & pos))
-    fp = int(np.sum((y_true == 0) & pos))
-    fn = int(np.sum((y_true == 1) & neg))
-    tn = int(np.sum((y_true == 0) & neg))
-    selection = float(np.mean(pos)) if len(y_true) else 0.0
-    tpr = tp / (tp + fn + 1e-9)
-    fpr = fp / (fp + tn + 1e-9)
-    return selection, tpr, fpr
-
-
-def main():
+def main(df=None, model=None, threshold=None, sweep=False, grid=None, constraint="statistical_parity_difference",
+         bound=0.05, bootstrap=0, seed=0, jobs=None, sparse=False, model_path=MODEL_FILE, calibration_bins=N_BINS):
     out = Path("outputs")
     out.mkdir(exist_ok=True)
 
-    df = load_adult()
-    X = df.drop(columns=["income_binary"]) if "income_binary" in df.columns else df
-    y = df["income_binary"].astype(int)
-
-    model = joblib.load("models/logreg_adult.joblib")
-    probs = model.predict_proba(X)[:, 1] if hasattr(model, "predict_proba") else model.decision_function(X)
-    y_pred = (probs >= 0.5).astype(int)
-
-    # sensitive attribute mapping for sex
-    if "sex_Male" in X.columns:
-        s = X["sex_Male"]
-        if s.dtype == bool or set(s.dropna().unique()).issubset({True, False}):
-            sens = s.map({True: "Male", False: "Female"})
-        else:
-            sens = s.map({1: "Male", 0: "Female"})
+    if sparse:
+        y, probs, y_pred, sens = sparse_inputs(model)
+        X = None
     else:
-        cols = [c for c in X.columns if c.startswith("sex_")]
-        if cols:
-            grp = cols[0].split("sex_")[1]
-            sens = X[cols[0]].map({1: grp, 0: f"not_{grp}", True: grp, False: f"not_{grp}"})
+        if df is None:
+            df = load_adult()
+        X = df.drop(columns=["income_binary"]) if "income_binary" in df.columns else df
+        y = df["income_binary"].astype(int)
+
+        # Same stored labels as the Fairlearn and AIF360 backends (model.predict, i.e. probs > 0.5)
+        probs, y_pred = get_predictions(X, model, model_path=model_path)
+
+        # sensitive attribute mapping for sex
+        if "sex_Male" in X.columns:
+            s = X["sex_Male"]
+            if s.dtype == bool:
+                sens = s.map({True: "Male", False: "Female"})
+            else:
+                sens = s.map({1: "Male", 0: "Female"})
         else:
-            sens = pd.Series(["unknown"] * len(X))
+            cols = [c for c in X.columns if c.startswith("sex_")]
+            if cols:
+                grp = cols[0].split("sex_")[1]
+                sens = X[cols[0]].map({1: grp, 0: f"not_{grp}", True: grp, False: f"not_{grp}"})
+            else:
+                sens = pd.Series(["unknown"] * len(X))
 
-    rows = []
-    for g, idx in sens.groupby(sens).groups.items():
-        sel, tpr, fpr = _rates(y.loc[idx], y_pred[idx])
-        rows.append({"group": g, "selection_rate": sel, "tpr": tpr, "fpr": fpr})
+    if threshold is not None:
+        y_pred = (probs >= threshold).astype(int)
 
-    pd.DataFrame(rows).to_csv(out / "google_local_by_group.csv", index=False)
+    # One bincount pass gives every group's confusion counts (scripts.group_metrics)
+    with span("metrics", rows=len(y)):
+        counts = GroupCounts.from_arrays(sens, y, y_pred)
+    with span("write"):
+        counts.by_group().rename_axis("group").reset_index().to_csv(out / "google_local_by_group.csv", index=False)
 
-    # overall
-    sel_o, tpr_o, fpr_o = _rates(y, y_pred)
-    pd.Series({"selection_rate": sel_o, "tpr": tpr_o, "fpr": fpr_o}).to_frame("value").to_csv(out / "google_local_overall.csv")
+        # overall
+        pd.Series(counts.overall()).to_frame("value").to_csv(out / "google_local_overall.csv")
 
     print("Saved Google local fallback metrics to outputs/google_local_by_group.csv and outputs/google_local_overall.csv")
 
+    # Calibration of the scores themselves (only for probabilities, not decision_function values)
+    calibration = None
+    if len(probs) and np.min(probs) >= 0 and np.max(probs) <= 1:
+        with span("calibration", rows=len(y)):
+            calibration = CalibrationCounts.from_arrays(sens, y, probs, n_bins=calibration_bins)
+            calibration.metrics().rename_axis("group").reset_index().to_csv(out / "google_local_calibration.csv",
+                                                                            index=False)
+            calibration.reliability().to_csv(out / "google_local_reliability.csv", index=False)
+        print("Saved Google local calibration to outputs/google_local_calibration.csv and "
+              "outputs/google_local_reliability.csv")
+
     # Derive fairness measures (SPD, DI, EOD, AOD) similar to AIF360 definitions
     try:
-        df_by = pd.DataFrame(rows)
-        # Choose unprivileged/privileged groups
-        groups = list(df_by["group"].values)
-        unpriv = "Female" if "Female" in groups else df_by.loc[df_by["selection_rate"].idxmin(), "group"]
-        priv = "Male" if "Male" in groups else df_by.loc[df_by["selection_rate"].idxmax(), "group"]
-
-        sr_u = float(df_by.loc[df_by["group"] == unpriv, "selection_rate"].iloc[0])
-        sr_p = float(df_by.loc[df_by["group"] == priv, "selection_rate"].iloc[0])
-        tpr_u = float(df_by.loc[df_by["group"] == unpriv, "tpr"].iloc[0])
-        tpr_p = float(df_by.loc[df_by["group"] == priv, "tpr"].iloc[0])
-        fpr_u = float(df_by.loc[df_by["group"] == unpriv, "fpr"].iloc[0])
-        fpr_p = float(df_by.loc[df_by["group"] == priv, "fpr"].iloc[0])
-
-        spd = sr_u - sr_p
-        di = (sr_u / sr_p) if sr_p > 0 else None
-        eod = tpr_u - tpr_p
-        aod = 0.5 * ((fpr_u - fpr_p) + (tpr_u - tpr_p))
-
-        fairness = {
-            "unprivileged_group": unpriv,
-            "privileged_group": priv,
-            "statistical_parity_difference": float(spd),
-            "disparate_impact": float(di) if di is not None else None,
-            "equal_opportunity_difference": float(eod),
-            "average_odds_difference": float(aod),
-        }
+        fairness = counts.fairness()
+        if bootstrap:
+            fairness = bootstrap_fairness(counts, fairness, n_resamples=bootstrap, seed=seed, n_jobs=jobs)
+        if calibration is not None:
+            fairness.update(calibration.differences(fairness["unprivileged_group"], fairness["privileged_group"]))
         (out / "google_local_fairness.json").write_text(json.dumps(fairness, indent=2))
         print("Saved Google local fairness metrics to outputs/google_local_fairness.json")
     except Exception as e:
         print(f"Could not compute Google local fairness measures: {e}")
+        fairness = None
+    model_id, dataset_id = run_keys(X, model, model_path, sparse)
+    if threshold is not None:
+        # Labels come from the cut-off, not model.predict
+        model_id = f"{model_id}@{threshold:g}"
+    by_group, overall = counts.by_group(), counts.overall()
+    if calibration is not None:
+        metrics = calibration.metrics()[["ece", "mce", "brier"]]
+        by_group = by_group.join(metrics)
+        overall.update(metrics.loc["all"].to_dict())
+    run_history.record("google_local", model_id, dataset_id, by_group=by_group, overall=overall, fairness=fairness)
+    if fairness is None:
+        return
+
+    if sweep:
+        with span("threshold_sweep", rows=len(y)):
+            _sweep(out, sens, y, probs, fairness, grid=grid, constraint=constraint, bound=bound)
+
+
+def _sweep(out, sens, y, probs, fairness, grid=None, constraint="statistical_parity_difference", bound=0.05):
+    unpriv, priv = fairness["unprivileged_group"], fairness["privileged_group"]
+    result = ThresholdSweep.from_scores(sens, y, probs, grid=grid)
+    result.save(out / "google_local_threshold_sweep.npz")
+    best = result.best_threshold(unpriv, priv, constraint=constraint, bound=bound)
+    curves = {}
+    for g in result.groups:
+        _, _, auc = result.roc(g)
+        curves[str(g)] = {"roc_auc": auc}
+    summary = {
+        "thresholds": int(len(result.thresholds)),
+        "unprivileged_group": unpriv,
+        "privileged_group": priv,
+        "per_group": curves,
+        "best_threshold": best,
+    }
+    (out / "google_local_threshold_sweep.json").write_text(json.dumps(summary, indent=2))
+    print(f"Saved threshold sweep over {len(result.thresholds)} thresholds to outputs/google_local_threshold_sweep.npz")
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Google-local fairness metrics for models/logreg_adult.joblib")
+    parser.add_argument("--threshold", type=float, default=None, help="score cut-off instead of model.predict")
+    parser.add_argument("--sweep", action="store_true", help="also sweep all thresholds")
+    parser.add_argument("--grid", type=int, default=None, help="sweep a fixed grid of this many thresholds")
+    parser.add_argument("--constraint", default="statistical_parity_difference",
+                        help="fairness metric bounded when picking the best threshold")
+    parser.add_argument("--bound", type=float, default=0.05)
+    parser.add_argument("--bootstrap", type=int, default=0, help="bootstrap resamples for confidence intervals")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--sparse", action="store_true", help="evaluate the model trained with train_model --sparse")
+    parser.add_argument("--model", default=str(MODEL_FILE), help="model file, e.g. one saved by scripts.mitigate")
+    parser.add_argument("--calibration-bins", type=int, default=N_BINS, help="equal-width score bins for calibration")
+    args = parser.parse_args()
+    main(threshold=args.threshold, sweep=args.sweep, grid=args.grid, constraint=args.constraint, bound=args.bound,
+         bootstrap=args.bootstrap, seed=args.seed, jobs=args.jobs, sparse=args.sparse, model_path=args.model,
+         calibration_bins=args.calibration_bins)
@@ -0,0 +1,286 @@
+"""
+Columnar history of evaluation results across runs, models and datasets.
+
+Every backend run appends its metrics as typed rows (run id, time, model hash, dataset key, backend,
+kind, group, metric, value and bootstrap interval) to a Parquet dataset under outputs/history/, partitioned
+by month and backend (hive layout: month=YYYY-MM/backend=<name>/<run>-<pid>.parquet). Appends only add
+files, so concurrent backends never contend and a crashed run leaves earlier history intact.
+compact() (run at the start of run_all_frameworks) merges each partition's files into one, keeping the
+file count at about one per partition however many runs there are.
+
+Queries go through pyarrow.dataset: filters on month/backend skip whole partitions, other filters are
+pushed down to the Parquet row groups, and only the requested columns are read, so trends and diffs
+over thousands of runs never load the whole history. aggregate_metrics renders summary.md from it.
+
+All backends started by one run_all_frameworks call share a run id (FAIRNESS_RUN_ID in the
+environment); a standalone script gets a fresh one.
+"""
+import datetime
+import hashlib
+import os
+import secrets
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HISTORY_DIR = Path("outputs") / "history"
+RUN_VAR = "FAIRNESS_RUN_ID"
+COLUMNS = ("run_id", "timestamp", "model", "dataset", "backend", "kind", "group", "metric", "value", "ci_low",
+           "ci_high")
+# kind of a row: a per-group rate, an overall rate, or a fairness measure between two groups
+KINDS = ("group", "overall", "fairness")
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("run_id", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("model", pa.string()),
+        ("dataset", pa.string()),
+        ("kind", pa.dictionary(pa.int8(), pa.string())),
+        ("group", pa.string()),
+        ("metric", pa.string()),
+        ("value", pa.float64()),
+        ("ci_low", pa.float64()),
+        ("ci_high", pa.float64()),
+    ])
+
+
+def run_id():
+    """The current run id, created (and exported to child processes) on first use."""
+    if not os.environ.get(RUN_VAR):
+        os.environ[RUN_VAR] = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S-") \
+            + secrets.token_hex(3)
+    return os.environ[RUN_VAR]
+
+
+def new_run():
+    """Start a new run id for this process and the processes it starts."""
+    os.environ.pop(RUN_VAR, None)
+    return run_id()
+
+
+def _number(value):
+    if value is None or isinstance(value, (bool, str)):
+        return None
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def metric_rows(by_group=None, overall=None, fairness=None):
+    """Rows (kind, group, metric, value, ci_low, ci_high) from a backend's by-group frame, overall dict and
+    fairness dict.
+
+    Fairness measures are stored under the group "<unprivileged> vs <privileged>" with their
+    bootstrap interval (<metric>_ci_low/_ci_high) when present.
+    """
+    rows = []
+    if by_group is not None:
+        for group, values in by_group.iterrows():
+            rows += [("group", str(group), metric, _number(v), None, None) for metric, v in values.items()]
+    if overall is not None:
+        rows += [("overall", None, metric, _number(v), None, None) for metric, v in dict(overall).items()]
+    if fairness is not None:
+        pair = f"{fairness.get('unprivileged_group')} vs {fairness.get('privileged_group')}"
+        for metric, v in fairness.items():
+            if metric.endswith(("_ci_low", "_ci_high", "_group")) or metric in ("bootstrap_resamples", "ci_level"):
+                continue
+            rows.append(("fairness", pair, metric, _number(v), _number(fairness.get(f"{metric}_ci_low")),
+                         _number(fairness.get(f"{metric}_ci_high"))))
+    return rows
+
+
+def append(rows, backend, model, dataset, run=None, timestamp=None, directory=None):
+    """Write rows as one new Parquet file in the run's month/backend partition; returns its path."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if not rows:
+        return None
+    run = run or run_id()
+    timestamp = timestamp or datetime.datetime.now(datetime.timezone.utc)
+    kind, group, metric, value, ci_low, ci_high = (list(c) for c in zip(*rows))
+    n = len(rows)
+    table = pa.table({
+        "run_id": [run] * n,
+        "timestamp": [timestamp] * n,
+        "model": [model] * n,
+        "dataset": [dataset] * n,
+        "kind": kind,
+        "group": group,
+        "metric": metric,
+        "value": value,
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+    }, schema=_schema())
+    part = Path(directory or HISTORY_DIR) / f"month={timestamp:%Y-%m}" / f"backend={backend}"
+    part.mkdir(parents=True, exist_ok=True)
+    path = part / f"{run}-{os.getpid()}.parquet"
+    # Files starting with "." are ignored by readers until renamed
+    tmp = part / f".{path.name}.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def compact(directory=None):
+    """Merge the files of every partition holding more than one into a single file sorted by time.
+
+    Only the files listed at the start are replaced, so runs appending meanwhile are not lost; a reader
+    may briefly see a run twice between the merged file appearing and the originals being removed.
+    Returns the number of files removed.
+    """
+    import pyarrow.parquet as pq
+
+    removed = 0
+    root = Path(directory or HISTORY_DIR)
+    for part in sorted(root.glob("month=*/backend=*")) if root.exists() else []:
+        files = sorted(part.glob("*.parquet"))
+        if len(files) < 2:
+            continue
+        table = pq.ParquetDataset(files, partitioning=None).read().sort_by("timestamp")
+        path = part / f"compacted-{os.getpid()}-{secrets.token_hex(3)}.parquet"
+        tmp = part / f".{path.name}.tmp"
+        pq.write_table(table, tmp, row_group_size=1 << 16)
+        os.replace(tmp, path)
+        for f in files:
+            f.unlink()
+        removed += len(files) - 1
+    return removed
+
+
+def record(backend, model, dataset, by_group=None, overall=None, fairness=None, directory=None):
+    """Append one backend's results for the current run (see metric_rows)."""
+    path = append(metric_rows(by_group, overall, fairness), backend, model, dataset, directory=directory)
+    if path is not None:
+        print(f"Appended {backend} results of run {run_id()} to {Path(directory or HISTORY_DIR)}")
+    return path
+
+
+def _dataset(directory=None):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([("month", pa.string()), ("backend", pa.string())]), flavor="hive")
+    return ds.dataset(Path(directory or HISTORY_DIR), format="parquet", partitioning=partitioning,
+                      exclude_invalid_files=True)
+
+
+def _files(directory=None):
+    root = Path(directory or HISTORY_DIR)
+    return sorted(root.glob("month=*/backend=*/*.parquet")) if root.exists() else []
+
+
+def state(directory=None):
+    """Digest of the files in the store (files are never modified in place, so the names identify the content)."""
+    root = Path(directory or HISTORY_DIR)
+    return hashlib.sha256("\n".join(str(p.relative_to(root)) for p in _files(root)).encode()).hexdigest()[:16]
+
+
+def _utc(t):
+    t = pd.Timestamp(t)
+    return (t.tz_localize("UTC") if t.tzinfo is None else t.tz_convert("UTC")).to_pydatetime()
+
+
+def _filter(run=None, backend=None, model=None, dataset=None, kind=None, group=None, metric=None, since=None,
+            until=None):
+    import pyarrow.dataset as ds
+
+    conditions = []
+    for name, value in (("run_id", run), ("backend", backend), ("model", model), ("dataset", dataset),
+                        ("kind", kind), ("group", group), ("metric", metric)):
+        if value is not None:
+            conditions.append(ds.field(name).isin([value] if isinstance(value, str) else list(value)))
+    # The month conditions let whole months outside the range be skipped without opening their files
+    if since is not None:
+        since = _utc(since)
+        conditions.append((ds.field("month") >= f"{since:%Y-%m}") & (ds.field("timestamp") >= since))
+    if until is not None:
+        until = _utc(until)
+        conditions.append((ds.field("month") <= f"{until:%Y-%m}") & (ds.field("timestamp") < until))
+    expr = None
+    for cond in conditions:
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def query(columns=None, directory=None, **filters):
+    """Rows matching the filters (run, backend, model, dataset, kind, group, metric: a value or a list;
+    since/until: timestamps) with only the requested columns, as a DataFrame."""
+    if not _files(directory):
+        return pd.DataFrame(columns=list(columns or COLUMNS))
+    table = _dataset(directory).to_table(columns=list(columns or COLUMNS), filter=_filter(**filters))
+    return table.to_pandas()
+
+
+def runs(directory=None, **filters):
+    """One row per (run, backend): time, model and dataset, oldest first."""
+    columns = ["run_id", "backend", "timestamp", "model", "dataset"]
+    if not _files(directory):
+        return pd.DataFrame(columns=columns)
+    # Only these columns are read, and reduced in Arrow before converting to pandas
+    table = _dataset(directory).to_table(columns=columns, filter=_filter(**filters))
+    table = table.group_by(["run_id", "backend"], use_threads=False).aggregate(
+        [("timestamp", "min"), ("model", "first"), ("dataset", "first")])
+    df = table.to_pandas().rename(columns={"timestamp_min": "timestamp", "model_first": "model",
+                                           "dataset_first": "dataset"})
+    return df[columns].sort_values(["timestamp", "backend"], kind="stable").reset_index(drop=True)
+
+
+def latest_runs(directory=None, **filters):
+    """{backend: run id} of the most recent run of each backend."""
+    df = runs(directory=directory, **filters)
+    return {} if df.empty else df.groupby("backend")["run_id"].last().to_dict()
+
+
+def trend(metric, backend=None, group=None, last=None, directory=None, **filters):
+    """One metric across runs, oldest first: run_id, timestamp, backend, group, model, dataset, value, ci."""
+    df = query(["run_id", "timestamp", "backend", "group", "model", "dataset", "value", "ci_low", "ci_high"],
+               directory=directory, metric=metric, backend=backend, group=group, **filters)
+    df = df.sort_values(["timestamp", "backend", "group"], kind="stable").reset_index(drop=True)
+    if last is not None:
+        keep = df["run_id"].drop_duplicates().tail(last)
+        df = df[df["run_id"].isin(keep)].reset_index(drop=True)
+    return df
+
+
+def diff(run_a, run_b, backend=None, directory=None):
+    """Metrics of two runs side by side: backend, group, metric, a, b and b - a."""
+    df = query(["run_id", "backend", "group", "metric", "value"], directory=directory, run=[run_a, run_b],
+               backend=backend)
+    df["group"] = df["group"].fillna("(overall)")
+    wide = df.pivot_table(index=["backend", "group", "metric"], columns="run_id", values="value", aggfunc="last")
+    out = pd.DataFrame({"a": wide.get(run_a), "b": wide.get(run_b)}, index=wide.index)
+    out["delta"] = out["b"] - out["a"]
+    return out.reset_index()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the run history in outputs/history/")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("runs", help="list runs")
+    sub.add_parser("compact", help="merge each partition's files into one")
+    p = sub.add_parser("trend", help="one metric across runs")
+    p.add_argument("metric")
+    p.add_argument("--backend", default=None)
+    p.add_argument("--group", default=None)
+    p.add_argument("--last", type=int, default=20)
+    p = sub.add_parser("diff", help="compare two runs")
+    p.add_argument("run_a")
+    p.add_argument("run_b")
+    p.add_argument("--backend", default=None)
+    args = parser.parse_args()
+    with pd.option_context("display.width", 200, "display.max_rows", 500):
+        if args.command == "runs":
+            print(runs().to_string(index=False))
+        elif args.command == "compact":
+            print(f"Removed {compact()} files")
+        elif args.command == "trend":
+            print(trend(args.metric, backend=args.backend, group=args.group, last=args.last).to_string(index=False))
+        else:
+            print(diff(args.run_a, args.run_b, backend=args.backend).to_string(index=False))
@@ -0,0 +1,239 @@
+"""
+Intersectional slice discovery: which combinations of attributes (e.g. race x sex x age bucket) does the
+model treat worst?
+
+Every one-hot attribute of the encoded frame (race, sex, marital-status, education, native-country, ...)
+and a bucketed age become integer codes. The lattice of slices is walked depth first, each slice only
+extended with attributes after its last one, so every combination is visited once. A slice's children
+for one attribute are counted with a single bincount over the parent's rows (not the whole dataset),
+and the children's row sets are carved out of the parent's, so deeper levels get cheaper.
+
+A slice is dropped with its whole subtree when fewer than min_support rows fall in it (support only
+shrinks going down). Surviving slices are compared with their complement on one metric; the effect
+size is the gap over the pooled Bernoulli standard deviation. Effect size is not monotone in the
+lattice, so it only filters what is reported. The subtrees of the depth-1 slices are independent and
+run in parallel worker processes that share the codes through shared memory.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.group_metrics import fairness_from_counts, rates_from_counts
+from scripts.pipeline import attach_array, share_array
+from scripts.profiling import span
+
+AGE_BINS = (0, 25, 35, 45, 55, 65, np.inf)
+AGE_LABELS = ("<25", "25-34", "35-44", "45-54", "55-64", "65+")
+# Level of a one-hot attribute whose columns are all 0 (the level dropped by drop_first, or missing)
+OTHER = "other"
+# Rates whose gap to the complement is scored; the denominator of each is in _DENOMINATOR
+METRICS = ("selection_rate", "tpr", "fpr", "accuracy")
+_DENOMINATOR = {"selection_rate": (0, 1, 2, 3), "tpr": (2, 3), "fpr": (0, 1), "accuracy": (0, 1, 2, 3)}
+
+
+def slice_attributes(df, sensitive=None, age_bins=AGE_BINS, age_labels=AGE_LABELS, exclude=("income_binary",)):
+    """{attribute: (codes, levels)} for the one-hot prefixes of df plus bucketed age.
+
+    sensitive maps raw attribute names to categoricals (AdultArrays.sensitive); those replace the
+    one-hot reconstruction, so e.g. sex gets its real "Female" level instead of "other".
+    """
+    attributes = {}
+    prefixes = {}
+    for col in df.columns:
+        if "_" in col and col not in exclude:
+            prefix, level = col.split("_", 1)
+            prefixes.setdefault(prefix, []).append((col, level))
+    for prefix, cols in prefixes.items():
+        onehot = df[[c for c, _ in cols]].to_numpy() > 0
+        # Code 0 is OTHER, code i the i-th one-hot column
+        codes = np.where(onehot.any(axis=1), onehot.argmax(axis=1) + 1, 0)
+        attributes[prefix] = (codes.astype(np.int16), [OTHER] + [level for _, level in cols])
+    for name, values in (sensitive or {}).items():
+        cat = pd.Categorical(values)
+        codes = cat.codes.astype(np.int16)
+        levels = list(cat.categories)
+        if (codes < 0).any():
+            codes = np.where(codes < 0, len(levels), codes).astype(np.int16)
+            levels.append(OTHER)
+        attributes[name] = (codes, levels)
+    if "age" in df.columns and age_bins is not None:
+        age = pd.cut(df["age"], bins=list(age_bins), labels=list(age_labels), right=False)
+        attributes["age"] = (pd.Categorical(age).codes.astype(np.int16), list(age_labels))
+    return attributes
+
+
+def _effect(counts, complement, metric):
+    cols = list(_DENOMINATOR[metric])
+    p_s = rates_from_counts(counts)[metric]
+    p_c = rates_from_counts(complement)[metric]
+    n_s, n_c = counts[:, cols].sum(axis=1), complement[:, cols].sum(axis=1)
+    sd = np.sqrt((p_s * (1 - p_s) + p_c * (1 - p_c)) / 2)
+    effect = np.divide(p_s - p_c, sd, out=np.zeros(len(sd)), where=sd > 0)
+    # A rate with an empty denominator is undefined, not 0
+    effect[(n_s == 0) | (n_c == 0)] = 0.0
+    return p_s, p_c, effect
+
+
+def _explore(codes, cell, levels, roots, total, min_support, min_effect, max_depth, metric):
+    """Depth-first search below each (attribute index, level) root; returns the reported slices."""
+    found = []
+    stack = []
+    for j, level in roots:
+        rows = np.flatnonzero(codes[j] == level)
+        stack.append((((j, level),), rows))
+    while stack:
+        path, rows = stack.pop()
+        cell_rows = cell[rows]
+        for j in range(path[-1][0] + 1, len(levels)):
+            sub = codes[j][rows]
+            n_levels = len(levels[j])
+            counts = np.bincount(sub.astype(np.int64) * 4 + cell_rows, minlength=n_levels * 4)
+            counts = counts.reshape(n_levels, 4).astype(np.float64)
+            support = counts.sum(axis=1)
+            # Support pruning; a child covering all of its parent's rows adds nothing
+            keep = np.flatnonzero((support >= min_support) & (support < len(rows))
+                                  & (total.sum() - support >= min_support))
+            if not len(keep):
+                continue
+            found.extend(_report(path, j, keep, counts[keep], total, min_effect, metric))
+            if len(path) + 1 < max_depth and j + 1 < len(levels):
+                order = np.argsort(sub, kind="stable")
+                ends = np.cumsum(support.astype(np.int64))
+                for level in keep:
+                    stop = ends[level]
+                    stack.append((path + ((j, level),), rows[order[stop - int(support[level]):stop]]))
+    return found
+
+
+def _report(path, j, keep, counts, total, min_effect, metric):
+    complement = total - counts
+    p_s, p_c, effect = _effect(counts, complement, metric)
+    fairness = fairness_from_counts(counts, complement)
+    rates = rates_from_counts(counts)
+    for i in np.flatnonzero(np.abs(effect) >= min_effect):
+        yield {
+            "slice": path + ((j, int(keep[i])),),
+            "count": int(counts[i].sum()),
+            **{m: float(rates[m][i]) for m in METRICS},
+            "complement": float(p_c[i]),
+            "gap": float(p_s[i] - p_c[i]),
+            "effect_size": float(effect[i]),
+            **{k: float(v[i]) for k, v in fairness.items()},
+        }
+
+
+def _explore_shared(codes_spec, cell_spec, levels, roots, total, min_support, min_effect, max_depth, metric):
+    shm_codes, codes = attach_array(codes_spec)
+    shm_cell, cell = attach_array(cell_spec)
+    try:
+        return _explore(codes, cell, levels, roots, total, min_support, min_effect, max_depth, metric)
+    finally:
+        del codes, cell
+        shm_codes.close()
+        shm_cell.close()
+
+
+def find_slices(attributes, y_true, y_pred, min_support=0.01, min_effect=0.3, max_depth=3, metric="selection_rate",
+                top=None, jobs=None):
+    """Ranked DataFrame of slices whose `metric` differs from their complement by at least min_effect.
+
+    min_support is a row count, or a fraction of the rows when below 1. Slices are ranked by absolute
+    effect size; the fairness columns compare each slice (unprivileged) with its complement.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}")
+    names = list(attributes)
+    levels = [list(attributes[n][1]) for n in names]
+    codes = np.stack([np.asarray(attributes[n][0], dtype=np.int16) for n in names])
+    cell = (2 * np.asarray(y_true, dtype=np.int8) + np.asarray(y_pred, dtype=np.int8)).astype(np.int8)
+    n = len(cell)
+    min_support = min_support * n if min_support < 1 else min_support
+    total = np.bincount(cell, minlength=4).astype(np.float64)
+
+    with span("slices", rows=n):
+        # Depth-1 slices are scored here; each one that survives pruning roots an independent subtree
+        found, roots = [], []
+        for j in range(len(names)):
+            counts = np.bincount(codes[j].astype(np.int64) * 4 + cell, minlength=len(levels[j]) * 4)
+            counts = counts.reshape(len(levels[j]), 4).astype(np.float64)
+            support = counts.sum(axis=1)
+            keep = np.flatnonzero((support >= min_support) & (n - support >= min_support))
+            found.extend(_report((), j, keep, counts[keep], total, min_effect, metric))
+            if max_depth > 1:
+                roots.extend((j, int(level)) for level in keep)
+        args = (total, min_support, min_effect, max_depth, metric)
+        if jobs is None or jobs <= 1 or len(roots) <= 1:
+            found.extend(_explore(codes, cell, levels, roots, *args))
+        else:
+            handles = []
+            try:
+                shm, codes_spec = share_array(codes)
+                handles.append(shm)
+                shm, cell_spec = share_array(cell)
+                handles.append(shm)
+                # Largest subtrees first, dealt round-robin so workers get similar amounts of rows
+                roots.sort(key=lambda r: -int((codes[r[0]] == r[1]).sum()))
+                batches = [roots[i::jobs] for i in range(jobs)]
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    futures = [pool.submit(_explore_shared, codes_spec, cell_spec, levels, batch, *args)
+                               for batch in batches if batch]
+                    for fut in futures:
+                        found.extend(fut.result())
+            finally:
+                for shm in handles:
+                    shm.close()
+                    shm.unlink()
+
+    for record in found:
+        path = record.pop("slice")
+        record["slice"] = " & ".join(f"{names[j]}={levels[j][level]}" for j, level in path)
+        record["depth"] = len(path)
+        record["support"] = record["count"] / n
+    columns = ["slice", "depth", "count", "support", *METRICS, "complement", "gap", "effect_size",
+               "statistical_parity_difference", "disparate_impact", "equal_opportunity_difference",
+               "average_odds_difference"]
+    table = pd.DataFrame(found, columns=columns)
+    table = table.iloc[np.argsort(-table["effect_size"].abs().to_numpy(), kind="stable")].reset_index(drop=True)
+    return table if top is None else table.head(top)
+
+
+def main(df=None, model=None, attributes=None, min_support=0.01, min_effect=0.3, max_depth=3,
+         metric="selection_rate", top=50, jobs=None, out_path=Path("outputs") / "slices.csv"):
+    from scripts.load_adult import LABEL, load_adult, to_frame
+    from scripts.predictions import get_predictions
+
+    sensitive = None
+    if df is None:
+        arrays = load_adult(as_frame=False)
+        df, sensitive = to_frame(arrays), arrays.sensitive
+    X = df.drop(columns=[LABEL])
+    _, y_pred = get_predictions(X, model)
+    found = slice_attributes(df, sensitive=sensitive)
+    if attributes:
+        found = {a: found[a] for a in attributes}
+    table = find_slices(found, df[LABEL].to_numpy(), np.asarray(y_pred), min_support=min_support,
+                        min_effect=min_effect, max_depth=max_depth, metric=metric, top=top, jobs=jobs)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(exist_ok=True)
+    table.to_csv(out_path, index=False)
+    print(table.head(10)[["slice", "count", metric, "complement", "effect_size"]].to_string(index=False))
+    print(f"Saved {len(table)} slices to {out_path}")
+    return table
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Worst-disparity intersectional slices for models/logreg_adult.joblib")
+    parser.add_argument("--attributes", default=None, help="comma-separated attributes (default: all)")
+    parser.add_argument("--min-support", type=float, default=0.01, help="rows, or a fraction of rows when < 1")
+    parser.add_argument("--min-effect", type=float, default=0.3, help="minimum absolute effect size to report")
+    parser.add_argument("--max-depth", type=int, default=3, help="largest number of attributes combined")
+    parser.add_argument("--metric", choices=METRICS, default="selection_rate")
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+    main(attributes=args.attributes.split(",") if args.attributes else None, min_support=args.min_support,
+         min_effect=args.min_effect, max_depth=args.max_depth, metric=args.metric, top=args.top, jobs=args.jobs)
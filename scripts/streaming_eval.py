@@ -0,0 +1,154 @@
+"""
+Streaming fairness evaluation over chunked CSV/Parquet input.
+
+Each chunk holds the label, the sensitive attribute and either precomputed scores or the encoded feature
+columns the model was trained on. Chunks are scored, reduced to per-group confusion counts
+(scripts.group_metrics.GroupCounts) and merged, so peak memory is bounded by the chunk size rather than
+the number of rows. Files (or Parquet row groups) are spread over worker processes and their counts
+merged at the end. Writes the same <prefix>_by_group.csv / _overall.csv / _fairness.json artifacts as the
+Google-local script.
+"""
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scripts import scoring
+from scripts.group_metrics import GroupCounts
+from scripts.profiling import span
+
+
+def group_labels(values, column):
+    """Human-readable groups for a one-hot sex_* column (as in the other scripts), raw values otherwise."""
+    if column.startswith("sex_") and (values.dtype == bool or pd.api.types.is_numeric_dtype(values)):
+        grp = column.split("sex_")[1]
+        pos, neg = ("Male", "Female") if grp == "Male" else (grp, f"not_{grp}")
+        return np.where(values.astype(bool), pos, neg)
+    return values.astype(str).to_numpy()
+
+
+def align_features(chunk, features):
+    """chunk's columns in the model's feature order.
+
+    A missing one-hot column (prefix_level) is all zero, since get_dummies leaves out levels that do not
+    occur, as long as another level of the same prefix is present; any other missing feature raises KeyError.
+    """
+    missing = [f for f in features if f not in chunk.columns]
+    if missing:
+        prefixes = {c.split("_", 1)[0] for c in chunk.columns if "_" in c}
+        unknown = [f for f in missing if "_" not in f or f.split("_", 1)[0] not in prefixes]
+        if unknown:
+            raise KeyError(f"Model features missing from the input: {unknown}")
+    return chunk.reindex(columns=features, fill_value=0)
+
+
+def _parquet_file(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Reading Parquet requires pyarrow (pip install pyarrow)") from e
+    return pq.ParquetFile(path)
+
+
+def iter_chunks(path, columns=None, chunksize=100_000, row_groups=None):
+    """Yield DataFrames of at most chunksize rows from a CSV or Parquet file."""
+    path = Path(path)
+    if path.suffix in (".parquet", ".pq"):
+        pf = _parquet_file(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns, row_groups=row_groups):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+
+def _tasks(paths):
+    """Split the input into independent units of work: whole CSV files or single Parquet row groups."""
+    tasks = []
+    for path in paths:
+        if Path(path).suffix in (".parquet", ".pq"):
+            tasks.extend((str(path), [i]) for i in range(_parquet_file(path).num_row_groups))
+        else:
+            tasks.append((str(path), None))
+    return tasks
+
+
+def evaluate_file(path, row_groups=None, model_path=None, label="income_binary", sensitive="sex_Male",
+                  score_column=None, threshold=0.5, chunksize=100_000):
+    """Accumulate GroupCounts over one file (or some of its Parquet row groups)."""
+    if score_column is not None:
+        model, features, columns = None, [], [label, sensitive, score_column]
+    else:
+        # Read every column; the model's own feature list selects (and orders) what it scores
+        model = joblib.load(model_path)
+        features, columns = list(getattr(model, "feature_names_in_", [])), None
+        # Linear models are scored from the chunk's columns in float32, without building a float64 matrix
+        scorer = scoring.LinearScorer.from_model(model) if scoring.supports(model) else None
+    total = None
+    with span("evaluate_file") as record:
+        for chunk in iter_chunks(path, columns=columns, chunksize=chunksize, row_groups=row_groups):
+            if score_column is not None:
+                y_pred = (chunk[score_column].to_numpy() >= threshold).astype(np.int64)
+            else:
+                X = align_features(chunk, features) if features else chunk.drop(columns=[label])
+                y_pred = scorer.predict(X) if scorer is not None else np.asarray(model.predict(X))
+            counts = GroupCounts.from_arrays(group_labels(chunk[sensitive], sensitive), chunk[label], y_pred)
+            total = counts if total is None else total + counts
+        record["rows"] = 0 if total is None else int(total.counts.sum())
+    return total
+
+
+def evaluate(paths, model_path="models/logreg_adult.joblib", label="income_binary", sensitive="sex_Male",
+             score_column=None, threshold=0.5, chunksize=100_000, jobs=None):
+    """Merged GroupCounts over all inputs, computed in parallel across files/row groups."""
+    tasks = _tasks(paths)
+    kwargs = dict(model_path=model_path, label=label, sensitive=sensitive, score_column=score_column,
+                  threshold=threshold, chunksize=chunksize)
+    if jobs == 1 or len(tasks) == 1:
+        parts = [evaluate_file(path, groups, **kwargs) for path, groups in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(evaluate_file, path, groups, **kwargs) for path, groups in tasks]
+            parts = [f.result() for f in futures]
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        raise ValueError("No rows found in the input")
+    total = parts[0]
+    for part in parts[1:]:
+        total = total + part
+    total.name = sensitive
+    return total
+
+
+def write_outputs(counts, prefix="streaming", outdir="outputs"):
+    out = Path(outdir)
+    out.mkdir(exist_ok=True)
+    counts.by_group().rename_axis("group").reset_index().to_csv(out / f"{prefix}_by_group.csv", index=False)
+    pd.Series(counts.overall()).to_frame("value").to_csv(out / f"{prefix}_overall.csv")
+    (out / f"{prefix}_fairness.json").write_text(json.dumps(counts.fairness(), indent=2))
+    print(f"Saved streaming metrics for {int(counts.counts.sum())} rows to {out}/{prefix}_*")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunked fairness evaluation of large CSV/Parquet inputs")
+    parser.add_argument("inputs", nargs="+", help="CSV or Parquet files")
+    parser.add_argument("--model", default="models/logreg_adult.joblib")
+    parser.add_argument("--score-column", default=None, help="use precomputed scores instead of the model")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--label", default="income_binary")
+    parser.add_argument("--sensitive", default="sex_Male")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--prefix", default="streaming")
+    args = parser.parse_args(argv)
+    counts = evaluate(args.inputs, model_path=args.model, label=args.label, sensitive=args.sensitive,
+                      score_column=args.score_column, threshold=args.threshold, chunksize=args.chunksize,
+                      jobs=args.jobs)
+    write_outputs(counts, prefix=args.prefix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Offline generator of Adult-shaped data for benchmarks and tests.
+
+Rows follow the raw OpenML Adult layout (same column names, categorical columns with the full sorted
+category lists, missing workclass/occupation/native-country values, ">50K"/"<=50K" class), with marginal
+frequencies and the sex/race imbalance of the real data and a label that depends on education, age,
+hours, marriage, capital gain and sex. Encoding a synthetic frame with load_adult.encode_adult gives the
+same 98 columns as the real dataset.
+
+Rows are generated in fixed-size chunks with one seeded generator per chunk, so any number of rows
+(10^4 to 10^8) can be produced or streamed with bounded memory and reproducible output.
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.load_adult import encode_adult
+
+CHUNK_ROWS = 1_000_000
+
+# (category, probability) per categorical column; probabilities are renormalized
+WORKCLASS = {"Private": 0.694, "Self-emp-not-inc": 0.079, "Local-gov": 0.064, "State-gov": 0.041,
+             "Self-emp-inc": 0.035, "Federal-gov": 0.029, "Without-pay": 0.0004, "Never-worked": 0.0002}
+EDUCATION = {"Preschool": 0.002, "1st-4th": 0.005, "5th-6th": 0.010, "7th-8th": 0.020, "9th": 0.015,
+             "10th": 0.028, "11th": 0.037, "12th": 0.013, "HS-grad": 0.323, "Some-college": 0.223,
+             "Assoc-voc": 0.042, "Assoc-acdm": 0.033, "Bachelors": 0.164, "Masters": 0.054,
+             "Prof-school": 0.017, "Doctorate": 0.012}
+MARITAL = {"Married-civ-spouse": 0.458, "Never-married": 0.330, "Divorced": 0.136, "Separated": 0.031,
+           "Widowed": 0.031, "Married-spouse-absent": 0.013, "Married-AF-spouse": 0.001}
+# Share of each sex that is Married-civ-spouse (Husband/Wife are 40% / 5% of all Adult rows)
+MARRIED_BY_SEX = {"Male": 0.605, "Female": 0.145}
+OCCUPATION = {"Prof-specialty": 0.126, "Craft-repair": 0.125, "Exec-managerial": 0.125, "Adm-clerical": 0.115,
+              "Sales": 0.113, "Other-service": 0.101, "Machine-op-inspct": 0.062, "Transport-moving": 0.048,
+              "Handlers-cleaners": 0.042, "Farming-fishing": 0.031, "Tech-support": 0.030,
+              "Protective-serv": 0.020, "Priv-house-serv": 0.005, "Armed-Forces": 0.0003}
+# Relationship of rows that are not Married-civ-spouse (those are Husband/Wife by sex)
+RELATIONSHIP_OTHER = {"Not-in-family": 0.46, "Own-child": 0.28, "Unmarried": 0.19, "Other-relative": 0.07}
+RACE = {"White": 0.855, "Black": 0.096, "Asian-Pac-Islander": 0.031, "Amer-Indian-Eskimo": 0.010, "Other": 0.008}
+SEX = {"Male": 0.668, "Female": 0.332}
+_OTHER_COUNTRIES = [
+    "Philippines", "Germany", "Puerto-Rico", "Canada", "El-Salvador", "India", "Cuba", "England", "China",
+    "South", "Jamaica", "Italy", "Dominican-Republic", "Japan", "Guatemala", "Poland", "Vietnam", "Columbia",
+    "Haiti", "Portugal", "Taiwan", "Iran", "Greece", "Nicaragua", "Peru", "Ecuador", "France", "Ireland", "Hong",
+    "Thailand", "Cambodia", "Trinadad&Tobago", "Laos", "Yugoslavia", "Outlying-US(Guam-USVI-etc)", "Scotland",
+    "Honduras", "Hungary", "Holand-Netherlands",
+]
+NATIVE_COUNTRY = {"United-States": 0.913, "Mexico": 0.020,
+                  **{c: 0.067 * 0.85 ** i for i, c in enumerate(_OTHER_COUNTRIES)}}
+MISSING = {"workclass": 0.057, "occupation": 0.058, "native-country": 0.0175}
+
+COLUMNS = ["age", "workclass", "fnlwgt", "education", "education-num", "marital-status", "occupation",
+           "relationship", "race", "sex", "capital-gain", "capital-loss", "hours-per-week", "native-country",
+           "class"]
+# Chosen so about 24% of rows are >50K, 30% of men and 11% of women (as in Adult)
+_INTERCEPT = -3.0
+
+
+def _categorical(rng, spec, n, missing=0.0):
+    names = np.array(sorted(spec))
+    p = np.array([spec[c] for c in names], dtype=np.float64)
+    codes = rng.choice(len(names), size=n, p=p / p.sum())
+    if missing:
+        codes[rng.random(n) < missing] = -1
+    return pd.Categorical.from_codes(codes, categories=names)
+
+
+def _chunk(rng, n):
+    sex = _categorical(rng, SEX, n)
+    male = np.asarray(sex == "Male")
+    age = np.minimum(17 + rng.gamma(2.2, 9.8, n), 90).round()
+    education = _categorical(rng, EDUCATION, n)
+    # education-num is the rank of the education level, as in Adult
+    rank = {e: i + 1 for i, e in enumerate(EDUCATION)}
+    education_num = np.array([rank[c] for c in education.categories], dtype=np.float64)[education.codes]
+    married = rng.random(n) < np.where(male, MARRIED_BY_SEX["Male"], MARRIED_BY_SEX["Female"])
+    single = {k: v for k, v in MARITAL.items() if k != "Married-civ-spouse"}
+    marital = _categorical(rng, single, n)
+    marital = pd.Categorical(np.where(married, "Married-civ-spouse", np.asarray(marital, dtype=object)),
+                             categories=sorted(MARITAL))
+    other = _categorical(rng, RELATIONSHIP_OTHER, n)
+    relationship = np.where(married, np.where(male, "Husband", "Wife"), np.asarray(other, dtype=object))
+    hours = np.where(rng.random(n) < 0.47, 40.0, np.clip(rng.normal(40, 12, n), 1, 99).round())
+    gain = np.where(rng.random(n) < 0.083, np.minimum(rng.lognormal(8.5, 1.0, n), 99999).round(), 0.0)
+    loss = np.where(rng.random(n) < 0.047, np.clip(rng.normal(1870, 370, n), 155, 4356).round(), 0.0)
+
+    logit = (_INTERCEPT + 0.04 * np.minimum(age - 38, 20) + 0.33 * (education_num - 10) + 1.9 * married
+             + 0.03 * (hours - 40) + 0.6 * male + 2.5 * (gain > 5000))
+    positive = rng.random(n) < 1 / (1 + np.exp(-logit))
+    return pd.DataFrame({
+        "age": age,
+        "workclass": _categorical(rng, WORKCLASS, n, MISSING["workclass"]),
+        "fnlwgt": rng.lognormal(12.0, 0.5, n).round(),
+        "education": education,
+        "education-num": education_num,
+        "marital-status": marital,
+        "occupation": _categorical(rng, OCCUPATION, n, MISSING["occupation"]),
+        "relationship": pd.Categorical(relationship, categories=sorted([*RELATIONSHIP_OTHER, "Husband", "Wife"])),
+        "race": _categorical(rng, RACE, n),
+        "sex": sex,
+        "capital-gain": gain,
+        "capital-loss": loss,
+        "hours-per-week": hours,
+        "native-country": _categorical(rng, NATIVE_COUNTRY, n, MISSING["native-country"]),
+        "class": pd.Categorical.from_codes(positive.astype(np.int8), categories=["<=50K", ">50K"]),
+    }, columns=COLUMNS)
+
+
+def iter_synthetic(n_rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Yield raw Adult-shaped frames of at most chunk_rows rows, n_rows in total."""
+    for i, start in enumerate(range(0, int(n_rows), chunk_rows)):
+        rng = np.random.default_rng([seed, i])
+        df = _chunk(rng, min(chunk_rows, int(n_rows) - start))
+        df.index = pd.RangeIndex(start, start + len(df))
+        yield df
+
+
+def synthetic_adult(n_rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Return n_rows of raw Adult-shaped data (the layout of fetch_openml("adult").frame)."""
+    return pd.concat(iter_synthetic(n_rows, seed=seed, chunk_rows=chunk_rows))
+
+
+def write_synthetic(path, n_rows, seed=0, chunk_rows=CHUNK_ROWS, encoded=False):
+    """Write n_rows to a Parquet file with one row group per chunk; encoded=True applies encode_adult."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer, columns = None, None
+    try:
+        for chunk in iter_synthetic(n_rows, seed=seed, chunk_rows=chunk_rows):
+            if encoded:
+                chunk = encode_adult(chunk)
+                # Chunks missing a rare category would otherwise lose its column
+                columns = columns or list(chunk.columns)
+                chunk = chunk.reindex(columns=columns, fill_value=0).astype(np.float64)
+                chunk["income_binary"] = chunk["income_binary"].astype(np.int64)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    print(f"Wrote {int(n_rows)} synthetic rows to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic Adult-shaped data to Parquet")
+    parser.add_argument("rows", type=float, help="number of rows, e.g. 1e6")
+    parser.add_argument("--out", default="cache/synthetic_adult.parquet")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--encoded", action="store_true", help="write the encoded (one-hot) columns")
+    args = parser.parse_args()
+    write_synthetic(args.out, int(args.rows), seed=args.seed, chunk_rows=args.chunk_rows, encoded=args.encoded)
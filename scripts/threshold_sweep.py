@@ -0,0 +1,139 @@
+"""
+Fairness metrics at every decision threshold from a single sort of the scores.
+
+Scores are sorted once per group (one lexsort over all rows); cumulative positive/negative counts
+then give each group's TN/FP/FN/TP at any threshold by binary search, so a sweep over T thresholds
+costs O(n log n + G * T * log n) instead of T full recounts. The result is a (T, groups, 4) count array
+from which selection rate, TPR, FPR, SPD/DI/EOD/AOD, per-group ROC/PR curves and a constrained best
+threshold are derived.
+"""
+import numpy as np
+import pandas as pd
+
+from scripts.group_metrics import CELLS, fairness_from_counts, rates_from_counts
+
+
+class ThresholdSweep:
+    """Confusion counts per threshold and group; counts[t, g] holds (tn, fp, fn, tp) for score >= thresholds[t]."""
+
+    def __init__(self, thresholds, groups, counts, name=None):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.groups = list(groups)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.name = name
+
+    @classmethod
+    def from_scores(cls, groups, y_true, scores, thresholds=None, grid=None, sample_weight=None):
+        """Sweep all distinct score values (default), an explicit threshold list, or a grid of `grid` points."""
+        name = getattr(groups, "name", None)
+        if not isinstance(groups, (pd.Series, pd.Index, pd.Categorical)):
+            groups = np.asarray(groups)
+        codes, labels = pd.factorize(groups, sort=True)
+        if (codes < 0).any():
+            raise ValueError("groups contains missing values")
+        scores = np.asarray(scores, dtype=np.float64)
+        y_true = np.asarray(y_true).astype(np.float64)
+        w = np.ones_like(scores) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+
+        if thresholds is None:
+            if grid is not None:
+                lo, hi = (0.0, 1.0) if scores.min() >= 0 and scores.max() <= 1 else (scores.min(), scores.max())
+                thresholds = np.linspace(lo, hi, int(grid))
+            else:
+                thresholds = np.unique(scores)
+        thresholds = np.sort(np.asarray(thresholds, dtype=np.float64))
+
+        # One sort: by group, then by descending score within the group
+        order = np.lexsort((-scores, codes))
+        sorted_codes = codes[order]
+        neg_scores = -scores[order]
+        pos_w = (y_true * w)[order]
+        neg_w = ((1.0 - y_true) * w)[order]
+        bounds = np.searchsorted(sorted_codes, np.arange(len(labels) + 1))
+
+        counts = np.zeros((len(thresholds), len(labels), len(CELLS)))
+        for g in range(len(labels)):
+            lo, hi = bounds[g], bounds[g + 1]
+            cum_pos = np.concatenate(([0.0], np.cumsum(pos_w[lo:hi])))
+            cum_neg = np.concatenate(([0.0], np.cumsum(neg_w[lo:hi])))
+            # Rows with score >= t are a prefix of the descending segment
+            k = np.searchsorted(neg_scores[lo:hi], -thresholds, side="right")
+            tp, fp = cum_pos[k], cum_neg[k]
+            counts[:, g] = np.stack([cum_neg[-1] - fp, fp, cum_pos[-1] - tp, tp], axis=1)
+        return cls(thresholds, labels, counts, name=name)
+
+    def rates(self):
+        """Dict of (thresholds, groups) arrays, as returned by group_metrics.rates_from_counts."""
+        return rates_from_counts(self.counts)
+
+    def overall_rates(self):
+        """Same as rates() but pooled over all groups: (thresholds,) arrays."""
+        return rates_from_counts(self.counts.sum(axis=1))
+
+    def fairness(self, unprivileged, privileged):
+        """Dict of (thresholds,) arrays of SPD, DI, EOD and AOD."""
+        iu, ip = self.groups.index(unprivileged), self.groups.index(privileged)
+        return fairness_from_counts(self.counts[:, iu], self.counts[:, ip])
+
+    def roc(self, group):
+        """(fpr, tpr, auc) for one group, with the (0, 0) and (1, 1) end points added."""
+        r = rates_from_counts(self.counts[:, self.groups.index(group)])
+        fpr = np.concatenate(([1.0], r["fpr"], [0.0]))[::-1]
+        tpr = np.concatenate(([1.0], r["tpr"], [0.0]))[::-1]
+        auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+        return fpr, tpr, auc
+
+    def pr(self, group):
+        """(recall, precision) for one group; thresholds with no predicted positives are dropped."""
+        c = self.counts[:, self.groups.index(group)]
+        predicted = c[:, 1] + c[:, 3]
+        keep = predicted > 0
+        precision = c[keep, 3] / predicted[keep]
+        recall = rates_from_counts(c[keep])["tpr"]
+        return recall[::-1], precision[::-1]
+
+    def best_threshold(self, unprivileged, privileged, constraint="statistical_parity_difference", bound=0.05,
+                       objective="accuracy"):
+        """Threshold maximizing an overall rate (accuracy, tpr, ...) subject to |constraint| <= bound.
+
+        Returns a dict with the threshold, objective and fairness values, or None if no threshold qualifies.
+        """
+        fairness = self.fairness(unprivileged, privileged)
+        values = fairness[constraint]
+        # DI is a ratio, so its bound is the allowed distance from parity (1.0)
+        distance = np.abs(1.0 - values) if constraint == "disparate_impact" else np.abs(values)
+        feasible = np.nan_to_num(distance, nan=np.inf) <= bound
+        if not feasible.any():
+            return None
+        score = np.where(feasible, self.overall_rates()[objective], -np.inf)
+        t = int(np.argmax(score))
+        return {
+            "threshold": float(self.thresholds[t]),
+            "constraint": constraint,
+            "bound": bound,
+            objective: float(score[t]),
+            **{k: (None if np.isnan(v[t]) else float(v[t])) for k, v in fairness.items()},
+        }
+
+    def to_frame(self, unprivileged=None, privileged=None):
+        """Long table with one row per (threshold, group); fairness columns are added when groups are given."""
+        rates = self.rates()
+        df = pd.DataFrame({
+            "threshold": np.repeat(self.thresholds, len(self.groups)),
+            "group": np.tile(np.asarray(self.groups, dtype=object), len(self.thresholds)),
+            **{k: v.ravel() for k, v in rates.items()},
+        })
+        if unprivileged is not None and privileged is not None:
+            for k, v in self.fairness(unprivileged, privileged).items():
+                df[k] = np.repeat(v, len(self.groups))
+        return df
+
+    def save(self, path):
+        """Write the sweep as a single compressed .npz (thresholds, groups, counts)."""
+        np.savez_compressed(path, thresholds=self.thresholds, groups=np.asarray(self.groups, dtype=str),
+                            counts=self.counts, cells=np.asarray(CELLS))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["thresholds"], data["groups"].tolist(), data["counts"])
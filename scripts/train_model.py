@@ -1,20 +1,60 @@
 """
 Train a simple LogisticRegression on the Adult dataset and save the model.
+With --sparse the model is fit on the CSR encoding and the fitted encoder is saved next to it.
+With --sweep a grid of models is fit in parallel and scored for accuracy and group fairness.
 """
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from pathlib import Path
 
-from scripts.load_adult import load_adult
+from scripts.group_metrics import GroupCounts
+from scripts.load_adult import load_adult, load_adult_arrays
+from scripts.pipeline import attach_array, share_array
+from scripts.predictions import SPARSE_MODEL_FILE
+from scripts.profiling import span
 
 MODEL_PATH = Path("models")
 MODEL_PATH.mkdir(exist_ok=True)
+ENCODER_FILE = MODEL_PATH / "adult_encoder.joblib"
+
+
+def train_sparse_and_save():
+    data = load_adult_arrays(sparse=True)
+    # Same split as the dense path: identical row positions for the same random_state
+    train_idx, test_idx = train_test_split(np.arange(data.X.shape[0]), test_size=0.2, random_state=42)
+    clf = LogisticRegression(max_iter=1000)
+    with span("fit", rows=len(train_idx)):
+        clf.fit(data.X[train_idx], data.y[train_idx])
+    acc = accuracy_score(data.y[test_idx], clf.predict(data.X[test_idx]))
+    print(f"Test accuracy: {acc:.4f}")
+    # The CSR and dense encodings can have the same width, so the model records which one it was fit on
+    clf.encoding_ = "csr"
+    joblib.dump(clf, SPARSE_MODEL_FILE)
+    # Needed to encode new raw data: ENCODER.transform(load_adult.raw_features(raw))
+    joblib.dump(data.encoder, ENCODER_FILE)
+    print(f"Model saved to {SPARSE_MODEL_FILE}, encoder to {ENCODER_FILE}")
+    return clf
+
 
+def load_model():
+    """The model saved by train_and_save (used when the pipeline skips an unchanged train stage)."""
+    return joblib.load(MODEL_PATH / "logreg_adult.joblib")
 
-def train_and_save():
-    df = load_adult()
+
+def train_and_save(df=None, sparse=False):
+    if sparse:
+        return train_sparse_and_save()
+    if df is None:
+        df = load_adult()
     y = df["income_binary"]
     X = df.drop(columns=["income_binary"]) if "income_binary" in df.columns else df.drop(columns=["income_binary"]) 
     # If load_adult returned encoded features already including income_binary,
@@ -27,13 +67,155 @@ def train_and_save():
 
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     clf = LogisticRegression(max_iter=1000)
-    clf.fit(X_train, y_train)
+    with span("fit", rows=len(X_train)):
+        clf.fit(X_train, y_train)
     preds = clf.predict(X_test)
     acc = accuracy_score(y_test, preds)
     print(f"Test accuracy: {acc:.4f}")
     joblib.dump(clf, MODEL_PATH / "logreg_adult.joblib")
     print("Model saved to models/logreg_adult.joblib")
+    return clf
+
+
+# A chain is one estimator refit along a path of parameter settings with warm_start=True, so each
+# step starts from the previous solution. Chains are independent and run in parallel.
+# (name, base estimator, [step params, ...])
+QUICK_GRID = [
+    ("logreg_lbfgs", LogisticRegression(max_iter=1000, warm_start=True), [{"C": c} for c in (0.01, 0.1, 1.0)]),
+    ("logreg_lbfgs_balanced", LogisticRegression(max_iter=1000, warm_start=True, class_weight="balanced"),
+     [{"C": c} for c in (0.01, 0.1, 1.0)]),
+]
+FULL_GRID = [
+    (f"logreg_{solver}{'_balanced' if cw else ''}",
+     LogisticRegression(max_iter=1000, warm_start=True, solver=solver, class_weight=cw),
+     [{"C": c} for c in (0.001, 0.01, 0.1, 1.0, 10.0)])
+    for solver in ("lbfgs", "newton-cg")
+    for cw in (None, "balanced")
+]
+
+
+def extra_grid():
+    """SGD and random forest chains (--extra); built on demand so their modules are only imported then."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    return [
+        ("sgd_log", make_pipeline(StandardScaler(), SGDClassifier(loss="log_loss", warm_start=True, random_state=0)),
+         [{"sgdclassifier__alpha": a} for a in (1e-2, 1e-3, 1e-4)]),
+        # warm_start adds trees to the existing forest instead of refitting it
+        ("random_forest", RandomForestClassifier(warm_start=True, max_depth=12, random_state=0, n_jobs=1),
+         [{"n_estimators": n} for n in (25, 50, 100)]),
+    ]
+
+
+def _fit_chain(name, estimator, steps, specs, sensitive_col, deadline):
+    handles, arrays = [], {}
+    for key, spec in specs.items():
+        shm, arr = attach_array(spec)
+        handles.append(shm)
+        arrays[key] = arr
+    try:
+        groups = np.where(arrays["X_test"][:, sensitive_col] > 0, "Male", "Female") if sensitive_col is not None \
+            else np.zeros(len(arrays["y_test"]), dtype=int)
+        model = clone(estimator)
+        records = []
+        for params in steps:
+            if time.time() > deadline:
+                break
+            model.set_params(**params)
+            start = time.perf_counter()
+            model.fit(arrays["X_train"], arrays["y_train"])
+            seconds = time.perf_counter() - start
+            preds = model.predict(arrays["X_test"])
+            counts = GroupCounts.from_arrays(groups, arrays["y_test"], preds)
+            fairness = counts.fairness() if len(counts.groups) > 1 else {}
+            records.append({
+                "candidate": name,
+                "estimator": type(model[-1] if hasattr(model, "steps") else model).__name__,
+                "params": json.dumps(params, sort_keys=True),
+                "accuracy": float(accuracy_score(arrays["y_test"], preds)),
+                "fit_seconds": seconds,
+                **{k: v for k, v in fairness.items() if not k.endswith("_group")},
+            })
+        return records
+    finally:
+        del arrays
+        for shm in handles:
+            shm.close()
+
+
+def pareto_front(df, objective="accuracy", disparity="statistical_parity_difference"):
+    """Boolean mask of candidates not dominated on (higher objective, lower |disparity|)."""
+    acc = df[objective].to_numpy()
+    gap = df[disparity].abs().to_numpy()
+    dominated = np.zeros(len(df), dtype=bool)
+    for i in range(len(df)):
+        dominated[i] = np.any((acc >= acc[i]) & (gap <= gap[i]) & ((acc > acc[i]) | (gap < gap[i])))
+    return ~dominated
+
+
+def sweep(df=None, grid=None, jobs=None, time_budget=None, out_path=Path("outputs") / "model_sweep.csv"):
+    """Fit every chain of `grid` in parallel on a shared train/test split; write and return the results."""
+    grid = QUICK_GRID if grid is None else grid
+    if df is None:
+        df = load_adult()
+    features = [c for c in df.columns if c != "income_binary"]
+    X = df[features].to_numpy(dtype=np.float64, copy=False)
+    y = df["income_binary"].to_numpy()
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42)
+    sensitive_col = features.index("sex_Male") if "sex_Male" in features else None
+    deadline = time.time() + (time_budget if time_budget is not None else float("inf"))
+
+    handles, specs = [], {}
+    for key, arr in (("X_train", X[train_idx]), ("y_train", y[train_idx]), ("X_test", X[test_idx]),
+                     ("y_test", y[test_idx])):
+        # Workers attach to these blocks instead of receiving a pickled copy of the split
+        shm, specs[key] = share_array(arr)
+        handles.append(shm)
+    records = []
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(_fit_chain, name, est, steps, specs, sensitive_col, deadline): name
+                       for name, est, steps in grid}
+            for fut in as_completed(futures):
+                try:
+                    records.extend(fut.result())
+                except Exception as e:
+                    print(f"Sweep chain {futures[fut]} failed: {e}")
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame(records)
+    if results.empty:
+        print("No sweep candidates finished within the time budget")
+        return results
+    results = results.sort_values(["candidate", "params"]).reset_index(drop=True)
+    if "statistical_parity_difference" in results.columns:
+        results["pareto"] = pareto_front(results)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(exist_ok=True)
+    results.to_csv(out_path, index=False)
+    print(f"Sweep of {len(results)} candidates saved to {out_path}")
+    return results
 
 
 if __name__ == "__main__":
-    train_and_save()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the Adult LogisticRegression")
+    parser.add_argument("--sparse", action="store_true", help="fit on the CSR encoding and save the encoder")
+    parser.add_argument("--sweep", choices=["quick", "full"], default=None,
+                        help="fit a grid of candidates instead of the single model")
+    parser.add_argument("--extra", action="store_true", help="add SGD and random forest chains to the sweep")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--time-budget", type=float, default=None, help="seconds; later steps are skipped")
+    args = parser.parse_args()
+    if args.sweep:
+        grid = (FULL_GRID if args.sweep == "full" else QUICK_GRID) + (extra_grid() if args.extra else [])
+        sweep(grid=grid, jobs=args.jobs, time_budget=args.time_budget)
+    else:
+        train_and_save(sparse=args.sparse)
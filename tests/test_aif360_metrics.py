@@ -0,0 +1,39 @@
+"""
+The lean AIF360 path and its NumPy equivalent agree with each other and with the full-frame construction.
+"""
+import numpy as np
+import pandas as pd
+from aif360.datasets import BinaryLabelDataset
+from aif360.metrics import BinaryLabelDatasetMetric, ClassificationMetric
+
+from scripts.run_aif360_test import aif360_metrics, numpy_metrics
+
+
+def _data(n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    sex = rng.integers(0, 2, n)
+    y = (rng.random(n) < 0.15 + 0.2 * sex).astype(int)
+    preds = (rng.random(n) < 0.2 + 0.5 * y).astype(int)
+    return sex, y, preds, rng.normal(size=(n, 3))
+
+
+def test_lean_and_numpy_match_full_frame():
+    sex, y, preds, features = _data()
+    full = pd.DataFrame(features, columns=["a", "b", "c"]).assign(sex_Male=sex, income_binary=y)
+    kw = dict(favorable_label=1, unfavorable_label=0, label_names=["income_binary"],
+              protected_attribute_names=["sex_Male"])
+    true = BinaryLabelDataset(df=full, **kw)
+    pred = BinaryLabelDataset(df=full.assign(income_binary=preds), **kw)
+    groups = dict(privileged_groups=[{"sex_Male": 1}], unprivileged_groups=[{"sex_Male": 0}])
+    bl, cls = BinaryLabelDatasetMetric(true, **groups), ClassificationMetric(true, pred, **groups)
+    expected = {
+        "disparate_impact": bl.disparate_impact(),
+        "statistical_parity_difference": bl.statistical_parity_difference(),
+        "equal_opportunity_difference": cls.equal_opportunity_difference(),
+        "average_odds_difference": cls.average_odds_difference(),
+    }
+    lean = aif360_metrics(sex, y, preds)
+    fast = numpy_metrics(sex, y, preds)
+    for name, value in expected.items():
+        assert np.isclose(lean[name], value)
+        assert np.isclose(fast[name], value)
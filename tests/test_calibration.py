@@ -0,0 +1,40 @@
+"""
+Check the binned calibration metrics against scikit-learn and that chunked accumulators merge exactly.
+"""
+import numpy as np
+from sklearn.calibration import calibration_curve
+from sklearn.metrics import brier_score_loss
+
+from scripts.calibration import CalibrationCounts
+
+
+def test_matches_sklearn_and_merges():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    groups = np.where(rng.random(n) < 0.4, "Female", "Male")
+    scores = rng.random(n)
+    # Female scores are overconfident: the true rate is pulled towards 0.5
+    truth = np.where(groups == "Female", 0.5 + 0.5 * (scores - 0.5), scores)
+    y = (rng.random(n) < truth).astype(int)
+
+    cal = CalibrationCounts.from_arrays(groups, y, scores, n_bins=10)
+    metrics = cal.metrics()
+    curves = cal.reliability()
+    for g in ("Female", "Male"):
+        mask = groups == g
+        positive_rate, mean_score = calibration_curve(y[mask], scores[mask], n_bins=10)
+        curve = curves[curves["group"] == g]
+        np.testing.assert_allclose(curve["positive_rate"], positive_rate)
+        np.testing.assert_allclose(curve["mean_score"], mean_score)
+        np.testing.assert_allclose(metrics.loc[g, "brier"], brier_score_loss(y[mask], scores[mask]))
+        weights = curve["weight"] / mask.sum()
+        np.testing.assert_allclose(metrics.loc[g, "ece"], (weights * np.abs(mean_score - positive_rate)).sum())
+    assert metrics.loc["Female", "ece"] > metrics.loc["Male", "ece"]
+
+    # Chunks accumulated separately (in any group order) merge to the same sums
+    parts = [CalibrationCounts.from_arrays(groups[i::3], y[i::3], scores[i::3]) for i in range(3)]
+    merged = parts[2] + parts[0] + parts[1]
+    np.testing.assert_allclose(merged.sums[[merged.groups.index(g) for g in cal.groups]], cal.sums)
+    diffs = merged.differences("Female", "Male")
+    np.testing.assert_allclose(diffs["ece_difference"], metrics.loc["Female", "ece"] - metrics.loc["Male", "ece"])
+    assert diffs["max_bin_gap_difference"] > 0
@@ -0,0 +1,27 @@
+"""
+The CLI starts without importing the heavy libraries and reports import times.
+"""
+import subprocess
+import sys
+
+import pytest
+
+from scripts.cli import build_parser, import_time
+
+
+def test_cli_import_is_light():
+    code = ("import sys; heavy = ('pandas', 'sklearn', 'fairlearn', 'aif360'); before = set(sys.modules)\n"
+            "import scripts.cli; print(sorted(m for m in heavy if m in sys.modules and m not in before))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+
+def test_import_time_and_parser():
+    total, children = import_time("xml.dom.minidom")
+    assert total > 0 and any(name.startswith("xml.dom.") for name, _ in children)
+    assert import_time("no_such_module_xyz") == (None, [])
+    args = build_parser().parse_args(["evaluate", "--backend", "aif360", "--aif360-engine", "numpy"])
+    assert (args.backend, args.aif360_engine, args.func.__name__) == ("aif360", "numpy", "evaluate")
+    assert args.fairlearn_engine == "metricframe"
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["evaluate", "--backend", "all", "--aif360-engine", "counts"])
@@ -0,0 +1,47 @@
+"""
+Check the shared-index comparison against evaluating each model on its own.
+"""
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from scripts import compare_models
+from scripts.group_metrics import GroupCounts
+
+
+def test_compare_matches_per_model_counts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(0)
+    n = 3000
+    sex = (rng.random(n) < 0.6).astype(float)
+    x = rng.normal(size=n)
+    df = pd.DataFrame({"x": x, "z": rng.normal(size=n), "sex_Male": sex})
+    df["income_binary"] = (x + 1.5 * sex + rng.normal(size=n) > 1.0).astype(int)
+    monkeypatch.setattr(compare_models, "load_adult", lambda: df)
+
+    X, y = df.drop(columns=["income_binary"]), df["income_binary"].to_numpy()
+    (tmp_path / "models").mkdir()
+    # "array" has no feature names: it is still a dense model and scored on the frame
+    models = {"array": LogisticRegression(C=0.1).fit(X.to_numpy(), y), "logreg": LogisticRegression().fit(X, y),
+              "tree": DecisionTreeClassifier(max_depth=4).fit(X, y)}
+    for name, model in models.items():
+        joblib.dump(model, tmp_path / "models" / f"{name}.joblib")
+
+    table = compare_models.compare(split="all", jobs=2, record=False).set_index("model")
+    assert list(table.index) == ["array", "logreg", "tree"]
+    sex_labels = np.where(sex == 1, "Male", "Female")
+    for name, model in models.items():
+        y_pred = model.predict(X.to_numpy())
+        expected = GroupCounts.from_arrays(sex_labels, y, y_pred).fairness()
+        for metric in ("statistical_parity_difference", "disparate_impact", "equal_opportunity_difference"):
+            np.testing.assert_allclose(table.loc[name, metric], expected[metric])
+        assert table.loc[name, "accuracy"] == (y_pred == y).mean()
+    assert pd.read_csv(tmp_path / "outputs" / "model_comparison.csv").shape[0] == 3
+
+    # A model fit on some other layout is an error, not skipped or scored on the wrong columns
+    joblib.dump(LogisticRegression().fit(X.to_numpy()[:, :2], y), tmp_path / "narrow.joblib")
+    with pytest.raises(ValueError, match="unnamed features"):
+        compare_models.compare([tmp_path / "narrow.joblib"], split="all", record=False)
@@ -0,0 +1,63 @@
+"""
+Check the counterfactual flip test against copying the frame and predicting again.
+"""
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from scripts.counterfactual import flip_test, flip_test_file
+
+
+def _data(n=6000):
+    rng = np.random.default_rng(0)
+    race = rng.integers(0, 3, n)
+    X = pd.DataFrame({"age": rng.integers(17, 90, n), "sex_Male": rng.random(n) < 0.6,
+                      "race_Black": race == 1, "race_White": race == 2})
+    y = ((X["age"] - 40) / 10 + 1.5 * X["sex_Male"] + 0.5 * X["race_White"] + rng.normal(size=n) > 0.8)
+    return X, y.astype(int)
+
+
+def _brute_force(model, X, changed, groups):
+    before, after = model.predict(X), model.predict(changed)
+    shift = model.predict_proba(changed)[:, 1] - model.predict_proba(X)[:, 1]
+    return pd.DataFrame({"group": groups, "flip": before != after, "shift": shift}).groupby("group").agg(
+        flips=("flip", "sum"), mean_shift=("shift", "mean"))
+
+
+def test_linear_closed_form_and_fallback_match_rescoring():
+    X, y = _data()
+    toggled = X.assign(sex_Male=~X["sex_Male"])
+    sex = np.where(X["sex_Male"], "Male", "Female")
+    for model in (LogisticRegression(max_iter=1000).fit(X, y), DecisionTreeClassifier(max_depth=5).fit(X, y)):
+        # Several chunks, merged
+        table = flip_test(X, model, chunk_rows=1000).summary().set_index("group")
+        expected = _brute_force(model, X, toggled, sex)
+        assert table.loc[["Female", "Male"], "flips"].tolist() == expected["flips"].tolist()
+        np.testing.assert_allclose(table.loc[["Female", "Male"], "mean_shift"], expected["mean_shift"], atol=1e-9)
+        assert table.loc["all", "rows"] == len(X)
+
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    table = flip_test(X, model, group="race", to="White").summary().set_index("group")
+    moved = X.assign(race_Black=False, race_White=True)
+    race = np.select([X["race_Black"], X["race_White"]], ["Black", "White"], "(baseline)")
+    expected = _brute_force(model, X, moved, race)
+    assert table.loc[expected.index, "flips"].tolist() == expected["flips"].tolist()
+    assert table.loc["White", "flips"] == 0 and table.loc["White", "shift_p50"] == 0
+
+
+def test_file_needs_every_non_one_hot_feature(tmp_path):
+    X, y = _data(2000)
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    joblib.dump(model, tmp_path / "model.joblib")
+    # race_Black never occurs in this file, so its encoding has no column for it
+    part = X[~X["race_Black"]]
+    part.drop(columns=["race_Black"]).to_csv(tmp_path / "part.csv", index=False)
+    table = flip_test_file(tmp_path / "part.csv", model_path=tmp_path / "model.joblib").summary().set_index("group")
+    assert table.loc["all", "rows"] == len(part)
+
+    part.drop(columns=["age"]).to_csv(tmp_path / "no_age.csv", index=False)
+    with pytest.raises(KeyError, match="age"):
+        flip_test_file(tmp_path / "no_age.csv", model_path=tmp_path / "model.joblib")
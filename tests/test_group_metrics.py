@@ -0,0 +1,104 @@
+"""
+Cross-check the single-pass confusion-count engine against Fairlearn's MetricFrame.
+"""
+import numpy as np
+import pandas as pd
+from fairlearn.metrics import MetricFrame, selection_rate, true_positive_rate, false_positive_rate
+
+from scripts.group_metrics import GroupCounts
+
+
+def _data(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    groups = pd.Series(rng.choice(["a", "b", "c", "d"], n, p=[0.5, 0.3, 0.15, 0.05]), name="g")
+    y_true = rng.integers(0, 2, n)
+    y_pred = (rng.random(n) < 0.3 + 0.4 * y_true).astype(int)
+    return groups, y_true, y_pred, rng.random(n)
+
+
+def test_matches_metricframe_with_weights():
+    groups, y_true, y_pred, w = _data()
+    mf = MetricFrame(metrics={"selection_rate": selection_rate, "tpr": true_positive_rate, "fpr": false_positive_rate},
+                     y_true=y_true, y_pred=y_pred, sensitive_features=groups,
+                     sample_params={k: {"sample_weight": w} for k in ("selection_rate", "tpr", "fpr")})
+    counts = GroupCounts.from_arrays(groups, y_true, y_pred, sample_weight=w)
+    pd.testing.assert_frame_equal(counts.by_group(), mf.by_group, check_exact=False)
+    for name, value in counts.overall().items():
+        assert np.isclose(value, mf.overall[name])
+
+
+def test_merge_equals_single_pass_and_fairness():
+    groups, y_true, y_pred, _ = _data()
+    whole = GroupCounts.from_arrays(groups, y_true, y_pred)
+    # Chunks with different group sets, so merging must align groups by label
+    g = groups.to_numpy()
+    head = np.arange(len(g)) < 2500
+    chunks = [head, ~head & (g != "a"), ~head & (g == "a")]
+    merged = sum((GroupCounts.from_arrays(g[m], y_true[m], y_pred[m]) for m in chunks[1:]),
+                 GroupCounts.from_arrays(g[chunks[0]], y_true[chunks[0]], y_pred[chunks[0]]))
+    np.testing.assert_array_equal(merged.counts[np.argsort(merged.groups)], whole.counts)
+
+    by = whole.by_group()
+    fairness = whole.fairness("d", "a")
+    assert np.isclose(fairness["statistical_parity_difference"], by.loc["d", "selection_rate"] - by.loc["a", "selection_rate"])
+    assert np.isclose(fairness["disparate_impact"], by.loc["d", "selection_rate"] / by.loc["a", "selection_rate"])
+    assert np.isclose(fairness["average_odds_difference"],
+                      0.5 * (by.loc["d", "fpr"] - by.loc["a", "fpr"] + by.loc["d", "tpr"] - by.loc["a", "tpr"]))
+
+
+def test_threshold_sweep_matches_recount_and_roc():
+    from sklearn.metrics import roc_auc_score
+    from scripts.threshold_sweep import ThresholdSweep
+
+    groups, y_true, _, _ = _data()
+    rng = np.random.default_rng(1)
+    # Rounded scores so many rows tie at each threshold
+    scores = np.round(np.clip(0.3 * y_true + rng.random(len(y_true)) * 0.7, 0, 1), 2)
+    sweep = ThresholdSweep.from_scores(groups, y_true, scores)
+
+    for t in (0.0, 0.25, 0.5, 0.71, 1.0):
+        i = int(np.searchsorted(sweep.thresholds, t))
+        assert sweep.thresholds[i] == t
+        expected = GroupCounts.from_arrays(groups, y_true, (scores >= t).astype(int))
+        np.testing.assert_array_equal(sweep.counts[i], expected.counts)
+
+    g = groups.to_numpy()
+    for name in ("a", "d"):
+        _, _, auc = sweep.roc(name)
+        assert np.isclose(auc, roc_auc_score(y_true[g == name], scores[g == name]))
+
+    # Brute force over the swept counts: the most accurate threshold with |SPD| <= bound
+    bound = 0.02
+    candidates = []
+    for i, t in enumerate(sweep.thresholds):
+        counts = GroupCounts(sweep.groups, sweep.counts[i])
+        spd = counts.fairness("d", "a")["statistical_parity_difference"]
+        if abs(spd) <= bound:
+            candidates.append((counts.overall(columns=("accuracy",))["accuracy"], -i, t, spd))
+    accuracy, _, threshold, spd = max(candidates)
+    best = sweep.best_threshold("d", "a", bound=bound)
+    assert best is not None
+    # Not one of the trivial all-positive / all-negative thresholds, whose SPD is always 0
+    assert 0 < best["threshold"] < scores.max()
+    assert best["threshold"] == threshold
+    assert np.isclose(best["accuracy"], accuracy) and np.isclose(best["statistical_parity_difference"], spd)
+
+
+def test_bootstrap_is_seeded_and_brackets_estimate():
+    from scripts.bootstrap import bootstrap_fairness, intervals, poisson_resample_counts, resample_counts
+
+    groups, y_true, y_pred, w = _data()
+    counts = GroupCounts.from_arrays(groups, y_true, y_pred)
+    reps = resample_counts(counts.counts, n_resamples=250, seed=3)
+    assert reps.shape == (250, 4, 4)
+    assert np.all(reps.sum(axis=(1, 2)) == len(y_true))
+    np.testing.assert_array_equal(reps, resample_counts(counts.counts, n_resamples=250, seed=3, n_jobs=2))
+
+    fairness = bootstrap_fairness(counts, counts.fairness("d", "a"), n_resamples=500)
+    for name in ("statistical_parity_difference", "equal_opportunity_difference"):
+        assert fairness[f"{name}_ci_low"] <= fairness[name] <= fairness[f"{name}_ci_high"]
+
+    labels, weighted = poisson_resample_counts(groups, y_true, y_pred, sample_weight=w, n_resamples=200)
+    point = GroupCounts.from_arrays(groups, y_true, y_pred, sample_weight=w).fairness("d", "a")
+    low, high = intervals(weighted, labels, "d", "a")["average_odds_difference"]
+    assert low <= point["average_odds_difference"] <= high
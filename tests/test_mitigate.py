@@ -0,0 +1,59 @@
+"""
+Check that the parallel mitigation reduces the planted disparity and saves models the backends can score.
+"""
+import joblib
+import numpy as np
+import pandas as pd
+
+from scripts.mitigate import WarmStart, WarmStartClassifier, mitigate
+from scripts.predictions import get_predictions
+
+
+def _data(n=4000):
+    rng = np.random.default_rng(0)
+    sex = (rng.random(n) < 0.6).astype(float)
+    x = rng.normal(size=n)
+    df = pd.DataFrame({"x": x, "z": rng.normal(size=n), "sex_Male": sex})
+    df["income_binary"] = (x + 1.5 * sex + rng.normal(size=n) > 1.0).astype(int)
+    return df
+
+
+def test_mitigation_reduces_disparity(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = _data()
+    table = mitigate(df, methods=("gridsearch", "threshold"), grid_size=6, jobs=2).set_index("method")
+
+    spd = table["statistical_parity_difference"].abs()
+    assert spd["gridsearch"] < spd["baseline"] / 2
+    assert spd["threshold"] < spd["baseline"] / 2
+    for method in ("gridsearch", "threshold"):
+        model = joblib.load(table.loc[method, "model"])
+        X = df.drop(columns=["income_binary"])
+        scores, labels = get_predictions(X, model_path=table.loc[method, "model"])
+        assert scores.shape == labels.shape == (len(df),)
+        np.testing.assert_array_equal(labels, model.predict(X))
+
+
+def test_exponentiated_gradient_and_warm_start(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = _data()
+    table = mitigate(df, methods=("expgrad",), max_iter=20, jobs=1).set_index("method")
+    spd = table["statistical_parity_difference"].abs()
+    assert spd["expgrad"] < spd["baseline"] / 2
+
+    X = df.drop(columns=["income_binary"])
+    model = joblib.load(table.loc["expgrad", "model"])
+    proba = model.predict_proba(X)
+    assert proba.shape == (len(X), 2)
+    np.testing.assert_allclose(proba.sum(axis=1), 1)
+    scores, labels = get_predictions(X, model_path=table.loc["expgrad", "model"])
+    np.testing.assert_allclose(scores, proba[:, 1])
+
+    # Clones share their WarmStart, separate classifiers do not
+    from sklearn.base import clone
+    from sklearn.linear_model import LogisticRegression
+
+    first = WarmStartClassifier(LogisticRegression(), warm=WarmStart())
+    clone(first).fit(X, df["income_binary"])
+    assert first.warm.coef is not None
+    assert WarmStartClassifier(LogisticRegression(), warm=WarmStart()).warm.coef is None
@@ -0,0 +1,33 @@
+"""
+Parallel model sweep on a small synthetic encoded frame.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from scripts.train_model import extra_grid, pareto_front, sweep
+
+
+def _frame(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    sex = rng.integers(0, 2, n).astype(float)
+    x = rng.normal(size=(n, 3))
+    y = (x[:, 0] + 0.5 * sex + rng.normal(scale=0.5, size=n) > 0.3).astype(int)
+    return pd.DataFrame({"f0": x[:, 0], "f1": x[:, 1], "f2": x[:, 2], "sex_Male": sex, "income_binary": y})
+
+
+def test_sweep_records_every_step(tmp_path):
+    grid = [("logreg", LogisticRegression(max_iter=200, warm_start=True), [{"C": 0.01}, {"C": 1.0}])] + extra_grid()[:1]
+    out = tmp_path / "sweep.csv"
+    results = sweep(_frame(), grid=grid, jobs=2, out_path=out)
+    assert len(results) == 5 and out.exists()
+    assert {"accuracy", "statistical_parity_difference", "pareto"} <= set(results.columns)
+    assert results["accuracy"].between(0.5, 1.0).all()
+    assert results["pareto"].any()
+    # An exhausted budget skips every step instead of failing
+    assert sweep(_frame(), grid=grid, jobs=1, time_budget=-1, out_path=out).empty
+
+
+def test_pareto_front():
+    df = pd.DataFrame({"accuracy": [0.8, 0.7, 0.9, 0.6], "statistical_parity_difference": [-0.1, -0.05, -0.2, -0.1]})
+    assert pareto_front(df).tolist() == [True, True, True, False]
@@ -0,0 +1,73 @@
+"""
+Check the in-process DAG runner: shared-memory frames reach workers intact and failures are isolated.
+"""
+import numpy as np
+import pandas as pd
+
+from scripts.pipeline import Stage, run_pipeline
+
+
+def write_sum(df, path):
+    path.write_text(str(float(df.drop(columns=["label"]).to_numpy().sum() + df["label"].sum())))
+
+
+def boom():
+    raise RuntimeError("stage exploded")
+
+
+def test_parallel_stages_and_failure_isolation(tmp_path, capsys):
+    df = pd.DataFrame({"a": np.arange(10.0), "b": np.ones(10), "label": np.arange(10) % 2})
+    target = f"{__name__}:write_sum"
+    stages = {
+        "first": Stage(target, parallel=True, inputs=("df", "path")),
+        "broken": Stage(f"{__name__}:boom", parallel=True),
+        "after_broken": Stage(target, deps=("broken",), inputs=("df", "path")),
+    }
+    context = {"df": df, "path": tmp_path / "sum.txt"}
+
+    failed = run_pipeline(stages, context=context, max_workers=2, label="label")
+
+    assert failed == {"broken", "after_broken"}
+    assert float((tmp_path / "sum.txt").read_text()) == 45.0 + 10.0 + 5.0
+    captured = capsys.readouterr()
+    assert "stage exploded" in captured.err
+    assert "after_broken (skipped: dependency failed)" in captured.out
+
+
+def copy_file(path, copy):
+    copy.write_text(path.read_text())
+
+
+def test_unchanged_stages_are_skipped(tmp_path, capsys):
+    df = pd.DataFrame({"a": np.arange(10.0), "b": np.ones(10), "label": np.arange(10) % 2})
+    first, second = tmp_path / "sum.txt", tmp_path / "copy.txt"
+    stages = {
+        "first": Stage(f"{__name__}:write_sum", inputs=("df", "path"), artifacts=(first,)),
+        "second": Stage(f"{__name__}:copy_file", deps=("first",), inputs=("path", "copy"), artifacts=(second,)),
+    }
+    manifests = tmp_path / "manifests"
+
+    def run(frame=df):
+        capsys.readouterr()
+        context = {"df": frame, "path": first, "copy": second}
+        assert run_pipeline(stages, context=context, label="label", manifest_dir=manifests) == set()
+        return capsys.readouterr().out
+
+    assert "skipped" not in run()
+    out = run()
+    assert "first (unchanged, skipped)" in out and "second (unchanged, skipped)" in out
+    # A stage that opts out of memoization is always called
+    stages["second"] = stages["second"]._replace(memoize=False)
+    assert "-> second\n" in run()
+    stages["second"] = stages["second"]._replace(memoize=True)
+    run()
+
+    # A tampered artifact reruns its stage; the rewritten file is identical, so the dependent stays skipped
+    first.write_text("tampered")
+    out = run()
+    assert "-> first\n" in out and "second (unchanged, skipped)" in out
+
+    # A changed parameter reruns the stage, and its changed artifact reruns the dependent
+    out = run(df.assign(a=df["a"] + 1))
+    assert "-> first\n" in out and "-> second\n" in out
+    assert second.read_text() == first.read_text() == str(70.0)
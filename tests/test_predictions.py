@@ -0,0 +1,59 @@
+"""
+Check that the prediction store is keyed by model and dataset and is reused across calls.
+"""
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from scripts.predictions import data_key, get_predictions
+
+
+def test_store_reuses_and_invalidates(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(200, 3)), columns=["a", "b", "c"])
+    y = (X["a"] + rng.normal(scale=0.5, size=200) > 0).astype(int)
+    model = LogisticRegression().fit(X, y)
+    model_path = tmp_path / "model.joblib"
+    joblib.dump(model, model_path)
+    store = tmp_path / "store"
+
+    scores, labels = get_predictions(X, model_path=model_path, store_dir=store)
+    np.testing.assert_array_equal(labels, model.predict(X))
+    np.testing.assert_allclose(scores, model.predict_proba(X)[:, 1])
+
+    # Stored vectors are read back without loading the model, and the model the file holds shares them
+    again, _ = get_predictions(X, model_path=model_path, store_dir=store)
+    assert isinstance(again, np.memmap)
+    get_predictions(X, model=model, model_path=model_path, store_dir=store)
+    assert len(list(store.iterdir())) == 1
+
+    # A freshly fitted model is keyed by itself, not by the file at model_path
+    other = LogisticRegression(C=0.001).fit(X, y)
+    _, labels = get_predictions(X, model=other, model_path=model_path, store_dir=store)
+    np.testing.assert_array_equal(labels, other.predict(X))
+    assert len(list(store.iterdir())) == 2
+
+    # A different model file or dataset gets its own entry
+    joblib.dump(LogisticRegression(C=0.01).fit(X, y), model_path)
+    get_predictions(X, model_path=model_path, store_dir=store)
+    get_predictions(X.iloc[:100], model_path=model_path, store_dir=store)
+    assert len(list(store.iterdir())) == 4
+
+
+def test_cache_key_only_for_all_cached_rows(tmp_path):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(200, 3)), columns=["a", "b", "c"])
+    X.attrs.update(cache_key="adult-key", cache_rows=len(X))
+    model = LogisticRegression().fit(X, X["a"] > 0)
+    store = tmp_path / "store"
+
+    assert data_key(X) == "adult-key"
+    # attrs are copied to subsets and shuffles, which must not read the full dataset's predictions
+    for subset in (X.iloc[:50], X.sample(frac=1, random_state=0), X.drop(index=[3])):
+        assert subset.attrs["cache_key"] == "adult-key" and data_key(subset) != "adult-key"
+    get_predictions(X, model=model, store_dir=store)
+    shuffled = X.sample(frac=1, random_state=0)
+    for subset in (X.iloc[:50], shuffled):
+        _, labels = get_predictions(subset, model=model, store_dir=store)
+        np.testing.assert_array_equal(labels, model.predict(subset))
@@ -0,0 +1,27 @@
+"""
+Spans are recorded with nested names and rows only when profiling is enabled.
+"""
+from scripts import profiling
+
+
+def test_spans_and_summary(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with profiling.span("stage"):
+        pass
+    assert not profiling.SPANS_FILE.exists()
+
+    monkeypatch.setattr(profiling, "_ENABLED", True)
+    for _ in range(2):
+        with profiling.span("stage"):
+            with profiling.span("metrics", rows=1000):
+                sum(range(10000))
+            with profiling.span("load") as record:
+                record["rows"] = 500
+    profile = profiling.write_profile()
+    summary = {t["name"]: t for t in profile["summary"]}
+    assert list(summary) == ["stage/metrics", "stage/load", "stage"]
+    assert summary["stage/metrics"]["calls"] == 2 and summary["stage/metrics"]["rows"] == 2000
+    assert summary["stage/load"]["rows"] == 1000
+    assert summary["stage"]["rows_per_second"] is None
+    assert summary["stage"]["wall_seconds"] >= summary["stage/metrics"]["wall_seconds"]
+    assert profiling.PROFILE_FILE.exists()
@@ -0,0 +1,57 @@
+"""
+Check the run-history store: appends, filtered queries, trends and diffs, and summary.md rendered from it.
+"""
+import datetime
+
+import pandas as pd
+
+from scripts import aggregate_metrics, run_history
+
+
+def _fairness(spd):
+    return {"unprivileged_group": "Female", "privileged_group": "Male", "statistical_parity_difference": spd,
+            "disparate_impact": None, "statistical_parity_difference_ci_low": spd - 0.05,
+            "statistical_parity_difference_ci_high": spd + 0.05, "bootstrap_resamples": 100, "ci_level": 0.95}
+
+
+def test_store_queries_and_summary(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    start = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    for i in range(4):
+        by_group = pd.DataFrame({"selection_rate": [0.1 + i / 100, 0.3]}, index=["Female", "Male"])
+        rows = run_history.metric_rows(by_group, {"selection_rate": 0.2}, _fairness(-0.2 + i / 100))
+        for backend in ("fairlearn", "google_local"):
+            run_history.append(rows, backend, f"model{i // 2}", "data", run=f"run{i}",
+                               timestamp=start + datetime.timedelta(days=i))
+
+    runs = run_history.runs()
+    assert list(runs["run_id"].drop_duplicates()) == ["run0", "run1", "run2", "run3"]
+    assert run_history.latest_runs() == {"fairlearn": "run3", "google_local": "run3"}
+
+    rows = run_history.query(backend="fairlearn", metric="selection_rate", kind="group", since="2026-01-02",
+                             until="2026-01-04", columns=["run_id", "group", "value"])
+    assert sorted(rows["run_id"].unique()) == ["run1", "run2"]
+    assert len(rows) == 4
+    assert run_history.query(model="model1", backend="fairlearn")["run_id"].unique().tolist() == ["run2", "run3"]
+
+    trend = run_history.trend("statistical_parity_difference", backend="fairlearn", last=2)
+    assert trend["run_id"].tolist() == ["run2", "run3"]
+    assert trend["value"].round(6).tolist() == [-0.18, -0.17]
+    assert trend["ci_low"].round(3).tolist() == [-0.23, -0.22]
+    assert trend["group"].unique().tolist() == ["Female vs Male"]
+
+    diff = run_history.diff("run0", "run3", backend="fairlearn").set_index(["group", "metric"])
+    assert round(diff.loc[("Female", "selection_rate"), "delta"], 6) == 0.03
+    assert diff.loc[("(overall)", "selection_rate"), "delta"] == 0
+
+    # A live run goes to today's partition under the current run id
+    monkeypatch.setenv(run_history.RUN_VAR, "live")
+    run_history.record("aif360", "model1", "data", fairness=_fairness(-0.1))
+    assert run_history.latest_runs()["aif360"] == "live"
+
+    aggregate_metrics.main()
+    summary = (tmp_path / "outputs" / "summary.md").read_text()
+    assert "Run `run3`, model `model1`" in summary
+    assert "| Female | 0.13 |" in summary
+    assert "| Female vs Male | statistical_parity_difference | -0.1 |" in summary
+    assert "## Statistical parity difference, last 10 runs" in summary
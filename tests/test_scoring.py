@@ -0,0 +1,58 @@
+"""
+Check that LinearScorer reproduces sklearn's scores and labels for frames, arrays and sparse matrices.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from sklearn.linear_model import LogisticRegression
+from sklearn.svm import LinearSVC
+
+from scripts.scoring import LinearScorer, supports
+
+
+def _data(n=5000):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"age": rng.integers(17, 90, n), "hours": rng.normal(40, 10, n)})
+    for i in range(6):
+        X[f"cat_{i}"] = rng.random(n) < 0.3
+    y = ((X["age"] - 40) / 10 + X["cat_0"] - X["cat_3"] + rng.normal(size=n) > 0).astype(int)
+    return X, y
+
+
+def test_matches_sklearn_on_frames_arrays_and_sparse():
+    X, y = _data()
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    scorer = LinearScorer.from_model(model)
+    expected = model.predict_proba(X)[:, 1]
+    labels = model.predict(X)
+
+    # Columns are picked by name, so their order in the frame does not matter
+    shuffled = X[X.columns[::-1]]
+    out = np.empty(len(X), dtype=np.float32)
+    scores, pred = scorer.score(shuffled, out=out, jobs=4, block_rows=700)
+    assert scores is out
+    np.testing.assert_allclose(scores, expected, atol=1e-5)
+    np.testing.assert_array_equal(pred, labels)
+
+    scores, pred = scorer.score(X, dtype=np.float64, jobs=1)
+    np.testing.assert_allclose(scores, expected, rtol=1e-12)
+    np.testing.assert_array_equal(pred, labels)
+
+    dense = X.to_numpy(dtype=np.float64)
+    np.testing.assert_array_equal(scorer.predict(dense, block_rows=1024), labels)
+    np.testing.assert_allclose(scorer.predict_proba(sparse.csr_matrix(dense), dtype=np.float64), expected,
+                               rtol=1e-12)
+
+    with pytest.raises(KeyError):
+        scorer.score(X.drop(columns=["age"]).assign(other=0))
+
+
+def test_non_logistic_models_give_decision_values():
+    X, y = _data(1000)
+    model = LinearSVC().fit(X, y)
+    assert supports(model)
+    scores, pred = LinearScorer.from_model(model).score(X, dtype=np.float64)
+    np.testing.assert_allclose(scores, model.decision_function(X), rtol=1e-12)
+    np.testing.assert_array_equal(pred, model.predict(X))
+    assert not supports(LogisticRegression().fit(X, np.arange(len(X)) % 3))
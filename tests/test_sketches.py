@@ -0,0 +1,63 @@
+"""
+Check the mergeable sketches and the streaming dataset profile built from them.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.dataset_summary import profile_chunks
+from scripts.sketches import DistinctSketch, FrequencySketch, QuantileSketch
+
+
+def test_sketches_are_accurate_and_merge():
+    rng = np.random.default_rng(0)
+    x = rng.lognormal(size=400_000)
+    parts = [QuantileSketch(k=256, seed=i).update(x[i::4]) for i in range(4)]
+    merged = parts[0] + parts[1] + parts[2] + parts[3]
+    assert merged.count == len(x) and sum(len(level) for level in merged.levels) < 256 * 12
+    qs = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+    ranks = np.searchsorted(np.sort(x), merged.quantiles(qs)) / len(x)
+    assert np.abs(ranks - qs).max() < 0.01
+    assert merged.quantiles([0, 1]).tolist() == [x.min(), x.max()]
+
+    values = rng.integers(0, 50_000, 200_000)
+    distinct = DistinctSketch().update(values[:100_000]) + DistinctSketch().update(values[100_000:])
+    assert abs(distinct.estimate() / len(np.unique(values)) - 1) < 0.05
+    assert round(DistinctSketch().update(pd.Series(["a", "b", None, "a"])).estimate()) == 2
+    with pytest.raises(ValueError):
+        DistinctSketch(p=8)
+
+    words = pd.Series(list("aaaaabbbccd"))
+    exact = FrequencySketch(k=10).update(words[:6]) + FrequencySketch(k=10).update(words[6:])
+    pd.testing.assert_series_equal(exact.frequencies(), words.value_counts(normalize=True), check_names=False)
+    capped = FrequencySketch(k=2).update(words)
+    assert list(capped.frequencies().index) == ["a", "b"] and capped.total == len(words)
+
+
+def test_profile_reports_groups_and_drift():
+    rng = np.random.default_rng(1)
+
+    def chunk(n, shift):
+        return pd.DataFrame({"sex": rng.choice(["Female", "Male"], n, p=[0.3, 0.7]),
+                             "age": rng.normal(40 + shift, 10, n),
+                             "job": pd.Categorical(rng.choice(["a", "b", "c"], n))})
+
+    train = profile_chunks([chunk(20_000, 0), chunk(20_000, 0)], split="train")
+    evaluation = profile_chunks([chunk(10_000, 5)], split="eval")
+    profile = (train + evaluation).with_all_groups()
+    # Updating a merged profile leaves the profiles it was merged from alone
+    before = {key: p.rows for key, p in train.profiles.items()}
+    extra = chunk(1000, 0)
+    profile.update(extra.drop(columns=["sex"]), extra["sex"].to_numpy(), np.full(len(extra), "train"))
+    assert {key: p.rows for key, p in train.profiles.items()} == before
+    profile = (train + evaluation).with_all_groups()
+    groups = profile.groups().set_index("group")
+    assert groups.loc["Female", "train_rows"] + groups.loc["Male", "train_rows"] == 40_000
+    assert abs(groups.loc["Female", "eval_share"] - 0.3) < 0.02
+    drift = profile.drift().set_index(["column", "group"])
+    # Only age moved between the splits
+    assert drift.loc[("age", "all"), "psi"] > 0.1 and drift.loc[("job", "all"), "psi"] < 0.01
+    assert 0.15 < drift.loc[("age", "all"), "max_cdf_gap"] < 0.25
+    table = profile.table().set_index(["split", "group", "column"])
+    assert table.loc[("train", "all", "age"), "rows"] == 40_000
+    assert abs(table.loc[("eval", "all", "age"), "p50"] - 45) < 0.5
@@ -0,0 +1,63 @@
+"""
+Check the slice finder against a brute-force groupby over every attribute combination.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from scripts.slice_finder import find_slices, slice_attributes
+
+
+def _data(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "age": rng.integers(17, 90, n).astype(float),
+        "race_Black": (rng.random(n) < 0.2).astype(float),
+        "sex_Male": (rng.random(n) < 0.6).astype(float),
+        "marital-status_Married": (rng.random(n) < 0.4).astype(float),
+    })
+    df["marital-status_Never-married"] = ((df["marital-status_Married"] == 0) & (rng.random(n) < 0.5)).astype(float)
+    y = (rng.random(n) < 0.3).astype(int)
+    # Young unmarried women are selected far less often
+    p = np.where((df["sex_Male"] == 0) & (df["age"] < 25), 0.05, 0.4)
+    return df, y, (rng.random(n) < p).astype(int)
+
+
+def test_matches_brute_force_and_finds_planted_slice():
+    df, y, pred = _data()
+    attributes = slice_attributes(df)
+    assert attributes["marital-status"][1] == ["other", "Married", "Never-married"]
+    table = find_slices(attributes, y, pred, min_support=50, min_effect=0.0, max_depth=3)
+
+    frame = pd.DataFrame({name: np.asarray(levels)[codes] for name, (codes, levels) in attributes.items()})
+    rows = {}
+    for depth in (1, 2, 3):
+        for combo in itertools.combinations(frame.columns, depth):
+            for key, index in frame.groupby(list(combo)).indices.items():
+                rows[tuple(f"{a}={v}" for a, v in zip(combo, np.atleast_1d(key)))] = index
+    # A slice is reachable when it and every slice above it meet the support
+    expected = {" & ".join(name): (len(index), pred[index].mean()) for name, index in rows.items()
+                if 50 <= len(index) <= len(df) - 50
+                and all(len(rows[sub]) >= 50 for r in range(1, len(name)) for sub in itertools.combinations(name, r))}
+    got = table.set_index("slice")
+    # Slices identical to their parent are skipped, so compare on what was reported
+    assert set(got.index) <= set(expected)
+    assert len(got) > 0.9 * len(expected)
+    for name, row in got.iterrows():
+        assert row["count"] == expected[name][0]
+        assert np.isclose(row["selection_rate"], expected[name][1])
+
+    assert table.iloc[0]["effect_size"] < 0
+    assert set(table.iloc[0]["slice"].split(" & ")) >= {"sex=other", "age=<25"}
+
+
+def test_parallel_matches_serial_and_support_prunes():
+    df, y, pred = _data(seed=1)
+    attributes = slice_attributes(df)
+    serial = find_slices(attributes, y, pred, min_support=0.02, min_effect=0.1)
+    parallel = find_slices(attributes, y, pred, min_support=0.02, min_effect=0.1, jobs=2)
+    pd.testing.assert_frame_equal(serial.sort_values("slice").reset_index(drop=True),
+                                  parallel.sort_values("slice").reset_index(drop=True))
+    assert (serial["count"] >= 0.02 * len(df)).all()
+    assert (serial["effect_size"].abs() >= 0.1).all()
@@ -0,0 +1,48 @@
+"""
+Check that chunked, multi-process evaluation of CSV and Parquet files merges to the single-pass counts.
+"""
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from scripts.group_metrics import GroupCounts
+from scripts.streaming_eval import evaluate, group_labels
+
+
+def test_chunked_files_match_single_pass(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 5000
+    df = pd.DataFrame({"age": rng.integers(17, 90, n).astype(float), "hours": rng.normal(40, 10, n),
+                       "sex_Male": (rng.random(n) < 0.6).astype(float)})
+    # A level that never occurs in the Parquet part, whose encoding then has no column for it
+    df["job_a"] = (np.arange(n) < 2000) & (rng.random(n) < 0.5)
+    df["job_b"] = ~df["job_a"]
+    df["income_binary"] = ((df["age"] - 40) / 10 + df["sex_Male"] + rng.normal(size=n) > 0.5).astype(int)
+    X = df.drop(columns=["income_binary"])
+    model = LogisticRegression(max_iter=1000).fit(X, df["income_binary"])
+    model_path = tmp_path / "model.joblib"
+    joblib.dump(model, model_path)
+
+    df.iloc[:2000].to_csv(tmp_path / "part.csv", index=False)
+    pq.write_table(pa.Table.from_pandas(df.iloc[2000:].drop(columns=["job_a"]), preserve_index=False),
+                   tmp_path / "part.parquet", row_group_size=700)
+    assert pq.ParquetFile(tmp_path / "part.parquet").num_row_groups == 5
+
+    counts = evaluate([tmp_path / "part.csv", tmp_path / "part.parquet"], model_path=model_path, chunksize=300,
+                      jobs=2)
+    expected = GroupCounts.from_arrays(group_labels(df["sex_Male"], "sex_Male"), df["income_binary"],
+                                       model.predict(X))
+    assert sorted(counts.groups) == sorted(expected.groups)
+    for group in expected.groups:
+        np.testing.assert_array_equal(counts.counts[counts.groups.index(group)],
+                                      expected.counts[expected.groups.index(group)])
+    assert counts.fairness() == expected.fairness()
+
+    # A missing numeric feature is an error, not a column of zeros
+    df.drop(columns=["age"]).to_csv(tmp_path / "no_age.csv", index=False)
+    with pytest.raises(KeyError, match="age"):
+        evaluate([tmp_path / "no_age.csv"], model_path=model_path, jobs=1)
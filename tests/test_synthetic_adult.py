@@ -0,0 +1,36 @@
+"""
+Synthetic Adult-shaped data matches the real encoded layout; the benchmark reports and compares stages.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.benchmark import compare, run
+from scripts.load_adult import encode_adult
+from scripts.synthetic_adult import iter_synthetic, synthetic_adult
+
+
+def test_schema_imbalance_and_chunking():
+    df = encode_adult(synthetic_adult(20_000, seed=3))
+    real = json.loads((Path(__file__).parent.parent / "outputs" / "dataset_summary.json").read_text())
+    assert df.shape[1] == real["cols"]
+    assert list(df.columns[:len(real["columns"])]) == real["columns"]
+    assert abs(df["income_binary"].mean() - 0.24) < 0.02
+    rates = df.groupby("sex_Male")["income_binary"].mean()
+    assert rates[True] > 2 * rates[False]
+    # Chunks are independent of how many rows are requested after them
+    head = next(iter_synthetic(20_000, seed=3, chunk_rows=5_000))
+    pd.testing.assert_frame_equal(head, synthetic_adult(5_000, seed=3, chunk_rows=5_000))
+
+
+def test_benchmark_report_and_regressions():
+    report = run(sizes=[2_000], stages=["load_encode", "google_local", "stream"], max_in_memory=2_000)
+    assert [r["stage"] for r in report["results"]] == ["load_encode", "google_local", "stream"]
+    assert all(r["seconds"] > 0 and r["peak_mb"] > 0 for r in report["results"])
+    slower = {"results": [dict(r, seconds=r["seconds"] * 3 + 1) for r in report["results"]]}
+    assert not any(r["time_regression"] for r in compare(report, report))
+    assert all(r["time_regression"] for r in compare(slower, report))
+    assert np.isclose(compare(slower, report)[0]["time_ratio"], slower["results"][0]["seconds"]
+                      / report["results"][0]["seconds"])